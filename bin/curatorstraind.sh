@@ -0,0 +1,72 @@
+#!/bin/sh
+#
+# Purpose:
+#	start/stop/status of the curator strain watch daemon (curatorstrainload watch)
+#
+#	The daemon replaces the cron entry for curatorstrainload.sh: it polls
+#	INPUTDIR and loads each published create/update file as it appears,
+#	with the settings of straincreate.config/strainupdate.config (see
+#	lib/python/curatorstrainload/daemon.py).  Each file is a DLA job,
+#	started and ended by bin/curatorstraindjob.sh.
+#	Do not run both the daemon and the cron entry.
+#
+
+BINDIR=`dirname $0`
+COMMON_CONFIG=`cd ${BINDIR}/..; pwd`/curatorstrain.config
+USAGE="Usage: curatorstraind.sh start|stop|status"
+
+#
+# Make sure the common configuration file exists and source it.
+#
+if [ -f ${COMMON_CONFIG} ]
+then
+    . ${COMMON_CONFIG}
+else
+    echo "Missing configuration file: ${COMMON_CONFIG}"
+    exit 1
+fi
+
+LOG=${LOGDIR}/curatorstraind.log
+PIDFILE=${LOGDIR}/curatorstraind.pid
+
+isRunning ()
+{
+    [ -f ${PIDFILE} ] && kill -0 `cat ${PIDFILE}` 2>/dev/null
+}
+
+case "$1" in
+    start)
+        if isRunning
+        then
+            echo "curatorstraind is already running (pid `cat ${PIDFILE}`)"
+            exit 1
+        fi
+        nohup ${PYTHON} ${CURATORSTRAINLOAD}/bin/curatorstrainload watch >> ${LOG} 2>&1 &
+        echo $! > ${PIDFILE}
+        echo "curatorstraind started (pid `cat ${PIDFILE}`), log ${LOG}"
+        ;;
+    stop)
+        if isRunning
+        then
+            # the daemon finishes the file it is loading before it exits
+            kill `cat ${PIDFILE}`
+            echo "curatorstraind stopping (pid `cat ${PIDFILE}`)"
+        else
+            echo "curatorstraind is not running"
+        fi
+        rm -f ${PIDFILE}
+        ;;
+    status)
+        if isRunning
+        then
+            echo "curatorstraind is running (pid `cat ${PIDFILE}`)"
+        else
+            echo "curatorstraind is not running"
+            exit 1
+        fi
+        ;;
+    *)
+        echo ${USAGE}
+        exit 1
+        ;;
+esac
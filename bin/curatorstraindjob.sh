@@ -0,0 +1,82 @@
+#!/bin/sh
+#
+# Purpose:
+#	DLA job stream steps of a file the watch daemon loads
+#	(curatorstrainload watch; see lib/python/curatorstrainload/daemon.py):
+#	the steps straincreate.sh/strainupdate.sh run around their load
+#
+#	curatorstraindjob.sh start LOAD
+#		preload: archives OUTPUTDIR, starts the logs and the job;
+#		prints JOBKEY=<job key>
+#	curatorstraindjob.sh end LOAD JOBKEY STAT
+#		shutDown: ends the job with STAT, post-load cleanup and mail
+#
+#	LOAD is straincreate or strainupdate; the log is ${LOGDIR}/LOAD.sh.log,
+#	as with the wrappers.  The daemon runs it with the environment of the
+#	load's config.
+#
+
+USAGE="Usage: curatorstraindjob.sh start straincreate|strainupdate | end straincreate|strainupdate JOBKEY STAT"
+
+if [ $# -lt 2 ]
+then
+    echo ${USAGE}
+    exit 1
+fi
+
+#
+# Initialize the log file (at the start of the job only).
+#
+LOG=${LOGDIR}/$2.sh.log
+if [ "$1" = "start" ]
+then
+    rm -rf ${LOG}
+    touch ${LOG}
+fi
+
+#
+# Source the DLA library functions.
+#
+if [ "${DLAJOBSTREAMFUNC}" != "" ]
+then
+    if [ -r ${DLAJOBSTREAMFUNC} ]
+    then
+        . ${DLAJOBSTREAMFUNC}
+    else
+        echo "Cannot source DLA functions script: ${DLAJOBSTREAMFUNC}" | tee -a ${LOG}
+        exit 1
+    fi
+else
+    echo "Environment variable DLAJOBSTREAMFUNC has not been defined." | tee -a ${LOG}
+    exit 1
+fi
+
+case "$1" in
+    start)
+        #
+        # createArchive including OUTPUTDIR, startLog, getConfigEnv
+        # sets "JOBKEY"
+        #
+        preload ${OUTPUTDIR} >> ${LOG} 2>&1
+        echo "JOBKEY=${JOBKEY}"
+        ;;
+    end)
+        if [ $# -lt 4 ]
+        then
+            echo ${USAGE}
+            exit 1
+        fi
+        JOBKEY=$3
+        STAT=$4
+        #
+        # run postload cleanup and email logs
+        #
+        shutDown >> ${LOG} 2>&1
+        ;;
+    *)
+        echo ${USAGE}
+        exit 1
+        ;;
+esac
+
+exit 0
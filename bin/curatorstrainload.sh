@@ -34,6 +34,36 @@ LOG=${LOGDIR}/curatorstrainload.sh.log
 rm -rf ${LOG}
 touch ${LOG}
 
-${CURATORSTRAINLOAD}/bin/straincreate.sh | tee -a $LOG
-${CURATORSTRAINLOAD}/bin/strainupdate.sh | tee -a $LOG
+#
+# Run the create and update loads at the same time if their input files
+# touch different strains and alleles (LOAD_SCHEDULE=auto), else in order.
+#
+# At the same time: the DLA preloads (which archive the shared OUTPUTDIR
+# and LOGDIR) still run one after the other: strainupdate.sh waits for
+# the create preload, straincreate.sh waits for the update preload before
+# writing anything (PRELOAD_WAIT_BEFORE/PRELOAD_DONE/PRELOAD_WAIT_AFTER).
+#
+if [ "${LOAD_SCHEDULE}" = "auto" ] && \
+   ${PYTHON} ${CURATORSTRAINLOAD}/bin/curatorstrainload schedule \
+       ${INPUTDIR}/${STRAINCREATE_FILE_NAME} ${INPUTDIR}/${STRAINUPDATE_FILE_NAME} >> $LOG 2>&1
+then
+    BARRIER=`mktemp -d ${LOGDIR}/curatorstrainload.barrier.XXXXXX`
+    LOAD_CONCURRENT=1
+    export LOAD_CONCURRENT
+
+    PRELOAD_WAIT_BEFORE= PRELOAD_DONE=${BARRIER}/create PRELOAD_WAIT_AFTER=${BARRIER}/update \
+        ${CURATORSTRAINLOAD}/bin/straincreate.sh > ${BARRIER}/create.out 2>&1 &
+    CREATE_PID=$!
+    PRELOAD_WAIT_BEFORE=${BARRIER}/create PRELOAD_DONE=${BARRIER}/update PRELOAD_WAIT_AFTER= \
+        ${CURATORSTRAINLOAD}/bin/strainupdate.sh > ${BARRIER}/update.out 2>&1 &
+    UPDATE_PID=$!
+
+    wait ${CREATE_PID}
+    wait ${UPDATE_PID}
+    cat ${BARRIER}/create.out ${BARRIER}/update.out >> $LOG
+    rm -rf ${BARRIER}
+else
+    ${CURATORSTRAINLOAD}/bin/straincreate.sh | tee -a $LOG
+    ${CURATORSTRAINLOAD}/bin/strainupdate.sh | tee -a $LOG
+fi
 
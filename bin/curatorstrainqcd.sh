@@ -0,0 +1,69 @@
+#!/bin/sh
+#
+# Purpose:
+#	start/stop/status of the curator strain QC server (curatorstrainload qcserver)
+#
+#	runStrainCreateQC and runStrainUpdateQC send their files to the
+#	server when it is running (QC_SOCKET), and check them themselves
+#	when it is not.
+#
+
+BINDIR=`dirname $0`
+COMMON_CONFIG=`cd ${BINDIR}/..; pwd`/curatorstrain.config
+USAGE="Usage: curatorstrainqcd.sh start|stop|status"
+
+#
+# Make sure the common configuration file exists and source it.
+#
+if [ -f ${COMMON_CONFIG} ]
+then
+    . ${COMMON_CONFIG}
+else
+    echo "Missing configuration file: ${COMMON_CONFIG}"
+    exit 1
+fi
+
+LOG=${LOGDIR}/curatorstrainqcd.log
+PIDFILE=${LOGDIR}/curatorstrainqcd.pid
+
+isRunning ()
+{
+    [ -f ${PIDFILE} ] && kill -0 `cat ${PIDFILE}` 2>/dev/null
+}
+
+case "$1" in
+    start)
+        if isRunning
+        then
+            echo "curatorstrainqcd is already running (pid `cat ${PIDFILE}`)"
+            exit 1
+        fi
+        nohup ${PYTHON} ${CURATORSTRAINLOAD}/bin/curatorstrainload qcserver >> ${LOG} 2>&1 &
+        echo $! > ${PIDFILE}
+        echo "curatorstrainqcd started (pid `cat ${PIDFILE}`), log ${LOG}"
+        ;;
+    stop)
+        if isRunning
+        then
+            # the workers finish the requests they are running before they exit
+            kill `cat ${PIDFILE}`
+            echo "curatorstrainqcd stopping (pid `cat ${PIDFILE}`)"
+        else
+            echo "curatorstrainqcd is not running"
+        fi
+        rm -f ${PIDFILE}
+        ;;
+    status)
+        if isRunning
+        then
+            echo "curatorstrainqcd is running (pid `cat ${PIDFILE}`)"
+        else
+            echo "curatorstrainqcd is not running"
+            exit 1
+        fi
+        ;;
+    *)
+        echo ${USAGE}
+        exit 1
+        ;;
+esac
@@ -1,7 +1,7 @@
 #!/bin/sh
 #
 # Purpose:
-#	wrapper for strainupdate.py
+#	wrapper for curatorstrainload update
 #
 # History
 #
@@ -51,6 +51,25 @@ else
     exit 1
 fi
 
+#
+# When curatorstrainload.sh runs the create and update loads at the same
+# time, wait for the preload of the other load (its PRELOAD_DONE file);
+# give up after PRELOAD_TIMEOUT seconds.
+#
+waitForPreload ()
+{
+    if [ "$1" = "" ]
+    then
+        return
+    fi
+    WAITED=0
+    while [ ! -f $1 -a ${WAITED} -lt ${PRELOAD_TIMEOUT:-600} ]
+    do
+        sleep 1
+        WAITED=`expr ${WAITED} + 1`
+    done
+}
+
 #####################################
 #
 # Main
@@ -61,14 +80,32 @@ fi
 # updateArchive including OUTPUTDIR, startLog, getConfigEnv
 # sets "JOBKEY"
 #
+waitForPreload ${PRELOAD_WAIT_BEFORE}
 preload ${OUTPUTDIR}
+if [ "${PRELOAD_DONE}" != "" ]
+then
+    touch ${PRELOAD_DONE}
+fi
+waitForPreload ${PRELOAD_WAIT_AFTER}
+
+#
+# the published input file may be compressed (.gz or .zst)
+#
+INPUT_FILE=${INPUT_FILE_DEFAULT}
+for SUFFIX in .gz .zst
+do
+    if [ ! -f ${INPUT_FILE} -a -f ${INPUT_FILE_DEFAULT}${SUFFIX} ]
+    then
+        INPUT_FILE=${INPUT_FILE_DEFAULT}${SUFFIX}
+    fi
+done
 
 #
-# if INPUT_FILE_DEFAULT does not exist, then skip load
+# if INPUT_FILE does not exist, then skip load
 #
-if [ ! -f ${INPUT_FILE_DEFAULT} ]
+if [ ! -f ${INPUT_FILE} ]
 then
-        echo "Input file ${INPUT_FILE_DEFAULT} does not exist - skipping load" | tee -a ${LOG_PROC}
+        echo "Input file ${INPUT_FILE} does not exist - skipping load" | tee -a ${LOG_PROC}
         # set STAT for shutdown
         STAT=0
         echo 'shutting down'
@@ -85,7 +122,7 @@ fi
 LASTRUN_FILE=${INPUTDIR}/lastrunupdate
 if [ -f ${LASTRUN_FILE} ]
 then
-    if test ${LASTRUN_FILE} -nt ${INPUT_FILE_DEFAULT}
+    if test ${LASTRUN_FILE} -nt ${INPUT_FILE}
     then
         echo "Input file has not been updated - skipping load" | tee -a ${LOG_PROC}
         # set STAT for shutdown
@@ -97,7 +134,8 @@ then
 fi
 
 echo "Running strain/curator/update load" | tee -a ${LOG_DIAG}
-${PYTHON} ${CURATORSTRAINLOAD}/bin/strainupdate.py ${INPUT_FILE_DEFAULT} load | tee -a ${LOG_DIAG}
+# FANOUT_TARGETS: load the file into each of those databases at the same time
+${PYTHON} ${CURATORSTRAINLOAD}/bin/curatorstrainload update ${INPUT_FILE} ${FANOUT_TARGETS:+--fanout} | tee -a ${LOG_DIAG}
 STAT=$?
 checkStatus ${STAT} "curatorstrainload.py"
 
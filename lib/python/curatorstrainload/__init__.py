@@ -0,0 +1,36 @@
+#
+# Package: curatorstrainload
+#
+# Purpose:
+#
+#	Curator strain create/update loads
+#
+#	cli		command line (bin/curatorstrainload)
+#	curatorload	CuratorLoad: file handling, error file, bcp, exit status
+#	straincreate	StrainCreateLoad: new strains (straincreate.txt)
+#	strainupdate	StrainUpdateLoad: strain updates (strainupdate.txt)
+#	daemon		watch daemon (curatorstrainload watch)
+#	qcserver	QC server and client (curatorstrainload qcserver, qc)
+#	fanoutlib	one file loaded into several databases at once (--fanout, FANOUT_TARGETS)
+#	memorylib	memory budget (MEMORY_* config)
+#	profilelib	profiling switch (--profile, PROFILE config)
+#	compresslib	.gz/.zst input and compressed bcp output
+#	copylib		bcp output format: text or PostgreSQL binary COPY (BCP_FORMAT)
+#	strategylib	load strategy per bcp table: INSERT, COPY or bcpin.csh (LOAD_STRATEGY)
+#	staginglib	set-based validation against staging tables (VALIDATE_MODE)
+#	rulelib		row checks run cheapest first, with timings (RULE_SKIP_AFTER_ERROR)
+#	errorlib	error summary and row index (ERROR_REPORT; curatorstrainload errors)
+#	schedulelib	can the create and update loads run at the same time (curatorstrainload schedule)
+#	namelib		near-duplicate strain name index (NAME_CHECK; curatorstrainload nameindex)
+#	dblib		db with throttled, memoized, timed queries (QUERY_RATE, QUERY_CACHE_SIZE,
+#			SLOW_QUERY_MS)
+#	lazylib		lazy imports of db, mgi_utils, loadlib, accessionlib
+#
+#	Importing the package (or any of its modules) has no side effects:
+#	the configuration is read from the environment when a load runs.
+#
+#	In-process use:
+#
+#		from curatorstrainload.straincreate import StrainCreateLoad
+#		status = StrainCreateLoad('straincreate.txt', 'preview').run()
+#
@@ -0,0 +1,283 @@
+#
+# Program: cli.py
+#
+# Purpose:
+#
+#	Command line for the curator strain loads (bin/curatorstrainload)
+#
+#	curatorstrainload create inputFile [options] [--fanout]
+#		load new strains (straincreate.sh)
+#	curatorstrainload update inputFile [options] [--fanout]
+#		load strain updates (strainupdate.sh)
+#		--fanout: into every FANOUT_TARGETS database at the same
+#		time (see fanoutlib.py)
+#	curatorstrainload preview create|update inputFile [options]
+#		QC only; writes inputFile.error and inputFile.diagnostics
+#		(runStrainCreateQC, runStrainUpdateQC)
+#
+#	options:
+#		--profile			see profilelib.py
+#		--max-errors N			stop after N fatal errors (ERROR_BUDGET)
+#		--max-errors-per-category N	stop after N errors of one category
+#						(ERROR_BUDGET_CATEGORY)
+#		--fail-fast			stop at the first fatal error
+#		--staging			set-based validation (VALIDATE_MODE=staging)
+#	curatorstrainload watch
+#		watch daemon (curatorstraind.sh)
+#	curatorstrainload qcserver
+#		QC server (curatorstrainqcd.sh; see qcserver.py)
+#	curatorstrainload qc create|update inputFile [options]
+#		preview through the QC server; prints the error file
+#		(runStrainCreateQC, runStrainUpdateQC); exit 75 if the
+#		server cannot run it
+#	curatorstrainload schedule createFile updateFile
+#		exit 0 if the create and update loads can run at the same time
+#		(curatorstrainload.sh; see schedulelib.py)
+#	curatorstrainload nameindex [--rebuild]
+#		refreshes the near-duplicate strain name index (namelib.py)
+#	curatorstrainload benchmark [--sizes N,N,...] [--repeat N]
+#		times the INSERT/COPY/bcpin.csh load strategies and suggests
+#		LOAD_INSERT_MAX_ROWS and LOAD_COPY_MAX_ROWS (strategylib.py)
+#	curatorstrainload errors inputFile|errorFile [--row N] [--category C]
+#		errors of a row/category from the error index (errorlib.py)
+#
+#	The load modules (and db) are imported only for the command that
+#	needs them.
+#
+
+import sys
+import argparse
+from . import profilelib
+
+configNames = {'create' : 'straincreate.config', 'update' : 'strainupdate.config'}
+
+# Purpose: load class for a load name
+# Returns: StrainCreateLoad or StrainUpdateLoad
+# Assumes: nothing
+# Effects: imports the load module
+# Throws: nothing
+def loadClass(
+    loadName	# 'create' or 'update' (string)
+    ):
+
+    if loadName == 'create':
+        from .straincreate import StrainCreateLoad
+        return StrainCreateLoad
+
+    from .strainupdate import StrainUpdateLoad
+    return StrainUpdateLoad
+
+# Purpose: environment of a load's config file
+# Returns: dictionary
+# Assumes: nothing
+# Effects: runs sh to source the config
+# Throws: OSError, subprocess.CalledProcessError
+def readConfig(
+    configFile	# config file (string)
+    ):
+
+    import subprocess
+
+    output = subprocess.check_output(['sh', '-c', '. "$1" >/dev/null 2>&1; env -0', 'sh', configFile])
+
+    env = {}
+    for item in output.decode('utf-8', 'replace').split('\0'):
+        if '=' in item:
+            name, value = item.split('=', 1)
+            env[name] = value
+
+    return env
+
+# Purpose: runs one load
+# Returns: exit status
+# Assumes: the environment is set by straincreate.config/strainupdate.config
+# Effects: see CuratorLoad.run()
+# Throws: nothing
+def runLoad(
+    loadName,		# 'create' or 'update' (string)
+    inputFileName,	# input file (string)
+    mode,		# 'load' or 'preview' (string)
+    isProfiling = 0,	# 1 = --profile
+    maxErrors = None,		# --max-errors; None = ERROR_BUDGET
+    maxCategoryErrors = None,	# --max-errors-per-category; None = ERROR_BUDGET_CATEGORY
+    isStaging = None		# 1 = --staging; None = VALIDATE_MODE
+    ):
+
+    profilelib.configure(isProfiling)
+
+    curatorLoad = loadClass(loadName)(inputFileName, mode)
+    curatorLoad.maxErrors = maxErrors
+    curatorLoad.maxCategoryErrors = maxCategoryErrors
+    curatorLoad.isStaging = isStaging
+
+    return curatorLoad.run()
+
+# Purpose: prints entries of an error index
+# Returns: exit status: 0 if entries were found, else 1
+# Assumes: nothing
+# Effects: writes to stdout
+# Throws: nothing
+def showErrors(
+    fileName,		# input or error file (string)
+    row = None,		# --row
+    category = None	# --category
+    ):
+
+    from . import errorlib
+
+    try:
+        results = errorlib.query(errorlib.indexFileName(fileName), row, category)
+    except IOError as e:
+        sys.stderr.write('%s\n' % (e))
+        return 1
+
+    for r in results:
+        sys.stdout.write('%d\t%s\t%s\n' % (r[0], r[1], r[4]))
+
+    if len(results) == 0:
+        return 1
+
+    return 0
+
+# Purpose: command line parser
+# Returns: argparse.ArgumentParser
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def parser():
+
+    common = argparse.ArgumentParser(add_help = False)
+    common.add_argument('--profile', action = 'store_true',
+        help = 'write .pstats/.collapsed profile files to LOGDIR')
+    common.add_argument('--max-errors', type = int, metavar = 'N',
+        help = 'stop validating after N fatal errors (default: ERROR_BUDGET)')
+    common.add_argument('--max-errors-per-category', type = int, metavar = 'N',
+        help = 'stop validating after N errors of one category (default: ERROR_BUDGET_CATEGORY)')
+    common.add_argument('--fail-fast', action = 'store_true',
+        help = 'stop validating at the first fatal error')
+    common.add_argument('--staging', action = 'store_const', const = 1,
+        help = 'validate with set-based queries against staging tables (default: VALIDATE_MODE)')
+
+    p = argparse.ArgumentParser(prog = 'curatorstrainload',
+        description = 'Curator strain create/update loads')
+    commands = p.add_subparsers(dest = 'command', metavar = 'command')
+    commands.required = True
+
+    c = commands.add_parser('create', parents = [common], help = 'load new strains')
+    c.add_argument('inputFile')
+    c.add_argument('--fanout', action = 'store_true',
+        help = 'load into every FANOUT_TARGETS database at the same time')
+
+    c = commands.add_parser('update', parents = [common], help = 'load strain updates')
+    c.add_argument('inputFile')
+    c.add_argument('--fanout', action = 'store_true',
+        help = 'load into every FANOUT_TARGETS database at the same time')
+
+    c = commands.add_parser('preview', parents = [common], help = 'QC a create or update file')
+    c.add_argument('load', choices = ('create', 'update'))
+    c.add_argument('inputFile')
+
+    commands.add_parser('watch', help = 'watch INPUTDIR and load published files')
+
+    commands.add_parser('qcserver', help = 'serve QC requests on QC_SOCKET')
+
+    c = commands.add_parser('qc', help = 'QC a create or update file through the QC server')
+    c.add_argument('load', choices = ('create', 'update'))
+    c.add_argument('inputFile')
+    c.add_argument('options', nargs = argparse.REMAINDER, help = 'QC options (see preview)')
+
+    c = commands.add_parser('schedule', help = 'can the create and update loads run at the same time?')
+    c.add_argument('createFile')
+    c.add_argument('updateFile')
+
+    c = commands.add_parser('nameindex', help = 'refresh the near-duplicate strain name index')
+    c.add_argument('--rebuild', action = 'store_const', const = 1, default = 0,
+        help = 'rebuild the index from scratch')
+
+    c = commands.add_parser('benchmark', help = 'time the load strategies and suggest their thresholds')
+    c.add_argument('--sizes', default = '10,100,1000,10000',
+        help = 'comma-separated row counts (default: 10,100,1000,10000)')
+    c.add_argument('--repeat', type = int, default = 3,
+        help = 'runs per row count and strategy (default: 3)')
+
+    c = commands.add_parser('errors', help = 'look up the error index of a QC/load run')
+    c.add_argument('file', help = 'input file (QC) or error file (load)')
+    c.add_argument('--row', type = int, help = 'only this row')
+    c.add_argument('--category', help = 'only this category, e.g. "Invalid User"')
+
+    return p
+
+# Purpose: command line entry point
+# Returns: exit status
+# Assumes: nothing
+# Effects: runs the command
+# Throws: SystemExit on usage errors
+def main(
+    argv = None		# arguments; default sys.argv[1:]
+    ):
+
+    args = parser().parse_args(argv)
+
+    if args.command == 'watch':
+        from . import daemon
+        return daemon.watch()
+
+    if args.command == 'qcserver':
+        from . import qcserver
+        return qcserver.main()
+
+    if args.command == 'qc':
+        from . import qcserver
+        return qcserver.request(args.load, args.inputFile, args.options)
+
+    if args.command == 'schedule':
+        from . import schedulelib
+        return schedulelib.schedule(args.createFile, args.updateFile, sys.stdout)
+
+    if args.command == 'nameindex':
+        from . import namelib
+        return namelib.update(args.rebuild, sys.stdout)
+
+    if args.command == 'benchmark':
+        from . import strategylib
+        return strategylib.benchmark([int(x) for x in args.sizes.split(',')], args.repeat, sys.stdout)
+
+    if args.command == 'errors':
+        return showErrors(args.file, args.row, args.category)
+
+    maxErrors = args.max_errors
+    if args.fail_fast:
+        maxErrors = 1
+
+    if args.command == 'preview':
+        return runLoad(args.load, args.inputFile, 'preview', args.profile,
+            maxErrors, args.max_errors_per_category, args.staging)
+
+    if args.fanout:
+        from . import fanoutlib
+        return fanoutlib.run(args.command, args.inputFile, args.profile,
+            maxErrors, args.max_errors_per_category, args.staging)
+
+    return runLoad(args.command, args.inputFile, 'load', args.profile,
+        maxErrors, args.max_errors_per_category, args.staging)
+
+# Purpose: entry point of the old bin/straincreate.py and bin/strainupdate.py
+# Returns: exit status
+# Assumes: nothing
+# Effects: runs the load
+# Throws: nothing
+def legacyMain(
+    loadName,	# 'create' or 'update' (string)
+    argv	# inputFile mode [--profile]
+    ):
+
+    isProfiling = 0
+    if '--profile' in argv:
+        argv.remove('--profile')
+        isProfiling = 1
+
+    if len(argv) < 2:
+        sys.stderr.write('\nCould not open inputFileName=sys.argv[1] or mode=sys.argv[2]\n\n')
+        return 1
+
+    return runLoad(loadName, argv[0], argv[1], isProfiling)
@@ -0,0 +1,283 @@
+#
+# Program: compresslib.py
+#
+# Purpose:
+#
+#	Compressed input/output for the strain create and update loads
+#
+#	openInput	opens an input file; .gz and .zst files are decompressed
+#			transparently
+#	preload		reads an input file into memory once; openInput then
+#			reads it from there (the processes of a fan-out load
+#			share it; see fanoutlib.py)
+#	preloadFile	the same from a file the caller has opened (the QC
+#			server checks the file it opened, not the path)
+#	openOutput	opens a bcp output file, compressed per OUTPUT_COMPRESS
+#	bcpin		loads a bcp file with bcpin.csh; a compressed file is
+#			decompressed into a named pipe that bcpin.csh reads,
+#			so the uncompressed data never lands on disk
+#
+#	zstd uses the python "zstandard" package if it is installed, else the
+#	zstd command line tool.
+#
+# Environment:
+#
+#	OUTPUT_COMPRESS		none (default), gzip or zstd
+#	OUTPUT_COMPRESS_LEVEL	compression level (default: gzip 6, zstd 3)
+#
+
+import os
+import io
+import errno
+import gzip
+import time
+import shutil
+import tempfile
+import subprocess
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+suffixes = {'none' : '', 'gzip' : '.gz', 'zstd' : '.zst'}
+defaultLevels = {'none' : 0, 'gzip' : 6, 'zstd' : 3}
+
+compress = 'none'	# OUTPUT_COMPRESS
+level = 0		# OUTPUT_COMPRESS_LEVEL
+
+preloaded = {}		# input file name -> contents (preload())
+
+# Purpose: reads the output compression from the environment
+# Returns: nothing
+# Assumes: nothing
+# Effects: sets compress and level
+# Throws: ValueError if OUTPUT_COMPRESS is not none, gzip or zstd
+def configure():
+    global compress, level
+
+    compress = os.getenv('OUTPUT_COMPRESS', 'none')
+    if compress == '':
+        compress = 'none'
+    if compress not in suffixes:
+        raise ValueError('OUTPUT_COMPRESS must be none, gzip or zstd: %s' % (compress))
+
+    level = int(os.getenv('OUTPUT_COMPRESS_LEVEL', str(defaultLevels[compress])))
+
+#
+# PipeFile
+#
+# Text file object for a zstd command running in a pipe.
+# Closing it closes the pipe and waits for the command.
+#
+class PipeFile(io.TextIOWrapper):
+
+    def __init__(self, command, mode, encoding):
+
+        if mode == 'r':
+            self.process = subprocess.Popen(command, stdout = subprocess.PIPE)
+            io.TextIOWrapper.__init__(self, self.process.stdout, encoding = encoding)
+        else:
+            self.process = subprocess.Popen(command, stdin = subprocess.PIPE)
+            io.TextIOWrapper.__init__(self, self.process.stdin, encoding = encoding)
+
+    def close(self):
+
+        if self.closed:
+            return
+
+        io.TextIOWrapper.close(self)
+        if self.process.wait() != 0:
+            raise IOError('%s failed' % (' '.join(self.process.args)))
+
+# Purpose: opens an input file for reading
+# Returns: text file object
+# Assumes: nothing
+# Effects: .gz and .zst files are decompressed as they are read
+# Throws: IOError if the file cannot be opened
+def openInput(
+    fileName,			# input file name (string)
+    encoding = 'latin-1'	# input encoding (string)
+    ):
+
+    if fileName in preloaded:
+        return io.StringIO(preloaded[fileName])
+
+    if fileName.endswith('.gz'):
+        return gzip.open(fileName, 'rt', encoding = encoding)
+
+    if fileName.endswith('.zst'):
+        if zstandard is not None:
+            return zstandard.open(fileName, 'rt', encoding = encoding)
+        if not os.access(fileName, os.R_OK):
+            raise IOError('Cannot read %s' % (fileName))
+        return PipeFile(['zstd', '-q', '-d', '-c', fileName], 'r', encoding)
+
+    return open(fileName, 'r', encoding = encoding)
+
+# Purpose: reads an input file into memory
+# Returns: nothing
+# Assumes: nothing
+# Effects: openInput() of the file reads the contents from memory
+# Throws: IOError if the file cannot be read
+def preload(
+    fileName,			# input file name (string)
+    encoding = 'latin-1'	# input encoding (string)
+    ):
+
+    with openInput(fileName, encoding) as f:
+        preloaded[fileName] = f.read()
+
+# Purpose: reads an opened input file into memory
+# Returns: nothing
+# Assumes: nothing
+# Effects: openInput() of fileName reads the contents from memory
+# Throws: IOError if the file cannot be read or decompressed
+def preloadFile(
+    fileName,			# input file name; its suffix gives the compression (string)
+    f,				# the input file, opened in binary mode
+    encoding = 'latin-1'	# input encoding (string)
+    ):
+
+    if fileName.endswith('.gz'):
+        data = gzip.GzipFile(fileobj = f).read()
+    elif fileName.endswith('.zst'):
+        if zstandard is not None:
+            data = zstandard.ZstdDecompressor().stream_reader(f).read()
+        else:
+            process = subprocess.run(['zstd', '-q', '-d', '-c'], stdin = f, stdout = subprocess.PIPE)
+            if process.returncode != 0:
+                raise IOError('zstd -d %s failed' % (fileName))
+            data = process.stdout
+    else:
+        data = f.read()
+
+    # as openInput() reads it: universal line ends
+    preloaded[fileName] = io.TextIOWrapper(io.BytesIO(data), encoding = encoding).read()
+
+# Purpose: name of an output file after compression
+# Returns: fileName plus the OUTPUT_COMPRESS suffix
+# Assumes: configure() has been called
+# Effects: nothing
+# Throws: nothing
+def outputFileName(
+    fileName	# uncompressed file name (string)
+    ):
+
+    return fileName + suffixes[compress]
+
+# Purpose: opens a bcp output file for writing
+# Returns: text file object; the file name gets the OUTPUT_COMPRESS suffix
+# Assumes: configure() has been called
+# Effects: creates the file
+# Throws: IOError if the file cannot be opened
+def openOutput(
+    fileName	# uncompressed file name (string)
+    ):
+
+    fileName = outputFileName(fileName)
+
+    if compress == 'gzip':
+        return gzip.open(fileName, 'wt', compresslevel = level)
+
+    if compress == 'zstd':
+        if zstandard is not None:
+            return zstandard.open(fileName, 'wt', cctx = zstandard.ZstdCompressor(level = level))
+        return PipeFile(['zstd', '-q', '-f', '-%d' % (level), '-o', fileName], 'w', None)
+
+    return open(fileName, 'w')
+
+# Purpose: opens the write end of a named pipe once bcpin.csh is reading it
+# Returns: file descriptor, or -1 if the loader exited without opening the pipe
+# Assumes: nothing
+# Effects: nothing
+# Throws: OSError
+def openPipe(
+    pipeName,	# named pipe (string)
+    process	# subprocess.Popen running the loader
+    ):
+
+    # a blocking open would hang forever if the loader fails before reading
+    while 1:
+        try:
+            fd = os.open(pipeName, os.O_WRONLY | os.O_NONBLOCK)
+            os.set_blocking(fd, True)
+            return fd
+        except OSError as e:
+            if e.errno != errno.ENXIO:	# no reader yet
+                raise
+            if process.poll() is not None:
+                return -1
+            time.sleep(0.05)
+
+# Purpose: copies a compressed bcp file into a named pipe
+# Returns: nothing
+# Assumes: nothing
+# Effects: writes to fd
+# Throws: OSError, IOError
+def decompressTo(
+    fileName,	# compressed bcp file (string)
+    fd		# file descriptor of the pipe
+    ):
+
+    with os.fdopen(fd, 'wb') as pipe:
+
+        if fileName.endswith('.gz'):
+            with gzip.open(fileName, 'rb') as f:
+                shutil.copyfileobj(f, pipe, 1048576)
+
+        elif zstandard is not None:
+            with open(fileName, 'rb') as f:
+                zstandard.ZstdDecompressor().copy_stream(f, pipe)
+
+        else:
+            pipe.flush()
+            if subprocess.call(['zstd', '-q', '-d', '-c', fileName], stdout = pipe) != 0:
+                raise IOError('zstd -d %s failed' % (fileName))
+
+# Purpose: loads one bcp file with bcpin.csh
+# Returns: exit status of bcpin.csh
+# Assumes: configure() has been called; the output file is closed
+# Effects: loads the table; writes the bcp command to the diagnostics file
+# Throws: nothing
+def bcpin(
+    bcpCommand,	# path of bcpin.csh (string)
+    server,	# database server (string)
+    database,	# database (string)
+    table,	# table name (string)
+    outputDir,	# directory of the bcp file (string)
+    fileName,	# uncompressed bcp file name (string)
+    diagFile	# diagnostics file descriptor
+    ):
+
+    if compress == 'none':
+        bcp = '%s %s %s %s %s %s "|" "\\n" mgd' % \
+            (bcpCommand, server, database, table, outputDir, fileName)
+        diagFile.write('%s\n' % bcp)
+        return os.system(bcp)
+
+    # bcpin.csh reads <pipeDir>/<fileName>, which is fed from the compressed file
+    pipeDir = tempfile.mkdtemp(prefix = 'curatorstrainload.')
+    pipeName = os.path.join(pipeDir, fileName)
+    compressedName = os.path.join(outputDir, outputFileName(fileName))
+    os.mkfifo(pipeName, 0o600)
+
+    bcp = '%s %s %s %s %s %s "|" "\\n" mgd' % \
+        (bcpCommand, server, database, table, pipeDir, fileName)
+    diagFile.write('%s < %s\n' % (bcp, compressedName))
+    diagFile.flush()
+
+    try:
+        process = subprocess.Popen(bcp, shell = True)
+        try:
+            fd = openPipe(pipeName, process)
+            if fd >= 0:
+                decompressTo(compressedName, fd)
+        except (OSError, IOError) as e:
+            diagFile.write('Could not stream %s: %s\n' % (compressedName, e))
+            process.kill()
+        status = process.wait()
+    finally:
+        shutil.rmtree(pipeDir, ignore_errors = True)
+
+    return status
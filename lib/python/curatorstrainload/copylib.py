@@ -0,0 +1,276 @@
+#
+# Program: copylib.py
+#
+# Purpose:
+#
+#	Output format of the bcp files of the strain create and update loads
+#
+#	text	pipe-delimited text loaded by bcpin.csh (default)
+#	binary	PostgreSQL binary COPY format loaded by psql
+#		"\copy <table> from pstdin with (format binary)"
+#
+#	In binary format the server does not parse the keys and dates, and
+#	notes/names may contain "|" or newlines: each field carries its
+#	length, so there is no delimiter to collide with.
+#
+#	Both formats are written a row at a time with writeRow(); None and ''
+#	are written as null, as bcpin.csh does for an empty text field.
+#	Binary files are compressed per OUTPUT_COMPRESS like text files.
+#
+#	The binary column types are read from information_schema, so the
+#	files follow the mgd schema.
+#
+# Environment:
+#
+#	BCP_FORMAT	text (default) or binary
+#	PG_DBUSER	database user for psql (binary)
+#	PSQL		psql command (binary; default psql)
+#
+
+import os
+import struct
+import datetime
+from .dblib import db
+from . import compresslib
+
+formats = ('text', 'binary')
+
+bcpFormat = 'text'	# BCP_FORMAT
+
+header = b'PGCOPY\n\xff\r\n\0' + struct.pack('!ii', 0, 0)
+trailer = struct.pack('!h', -1)
+
+# postgres epoch of binary timestamps/dates
+epoch = datetime.datetime(2000, 1, 1)
+
+# information_schema.columns.data_type -> binary type
+dataTypes = {
+    'smallint' : 'int2',
+    'integer' : 'int4',
+    'bigint' : 'int8',
+    'text' : 'text',
+    'character varying' : 'text',
+    'character' : 'text',
+    'date' : 'date',
+    'timestamp without time zone' : 'timestamp',
+    }
+
+columnTypesDict = {}	# table -> tuple of binary types
+dateDict = {}		# date string -> datetime
+
+# Purpose: clears the table and date lookups
+# Returns: nothing
+# Assumes: nothing
+# Effects: the next load queries the column types again
+# Throws: nothing
+def clearCaches():
+    columnTypesDict.clear()
+    dateDict.clear()
+
+# Purpose: reads the output format from the environment
+# Returns: nothing
+# Assumes: nothing
+# Effects: sets bcpFormat
+# Throws: ValueError if BCP_FORMAT is not text or binary
+def configure():
+    global bcpFormat
+
+    bcpFormat = os.getenv('BCP_FORMAT', 'text')
+    if bcpFormat == '':
+        bcpFormat = 'text'
+    if bcpFormat not in formats:
+        raise ValueError('BCP_FORMAT must be text or binary: %s' % (bcpFormat))
+
+# Purpose: binary column types of a table
+# Returns: tuple of 'int2', 'int4', 'int8', 'text', 'date', 'timestamp'
+# Assumes: db connection
+# Effects: queries information_schema once per table
+# Throws: ValueError if the table is not found or has a column of another type
+def columnTypes(
+    table	# table name (string)
+    ):
+
+    if table in columnTypesDict:
+        return columnTypesDict[table]
+
+    results = db.sql('''select column_name, data_type
+        from information_schema.columns
+        where table_schema = current_schema() and table_name = lower('%s')
+        order by ordinal_position
+        ''' % (table), 'auto')
+
+    if len(results) == 0:
+        raise ValueError('No columns found for table %s' % (table))
+
+    types = []
+    for r in results:
+        if r['data_type'] not in dataTypes:
+            raise ValueError('%s.%s: no binary format for %s' % (table, r['column_name'], r['data_type']))
+        types.append(dataTypes[r['data_type']])
+
+    columnTypesDict[table] = tuple(types)
+    return columnTypesDict[table]
+
+# Purpose: parses a date as written by the loads (mgi_utils.date('%m/%d/%Y'))
+# Returns: datetime
+# Assumes: nothing
+# Effects: nothing
+# Throws: ValueError if the date has another format
+def parseDate(
+    value	# date string
+    ):
+
+    if value in dateDict:
+        return dateDict[value]
+
+    for f in ('%m/%d/%Y', '%Y-%m-%d', '%Y-%m-%d %H:%M:%S'):
+        try:
+            dateDict[value] = datetime.datetime.strptime(value, f)
+            return dateDict[value]
+        except ValueError:
+            pass
+
+    raise ValueError('Invalid date: %s' % (value))
+
+# Purpose: binary representation of one field
+# Returns: bytes (without the length)
+# Assumes: value is not null
+# Effects: nothing
+# Throws: ValueError
+def encodeField(
+    fieldType,	# binary type (string)
+    value	# field value
+    ):
+
+    if fieldType == 'int4':
+        return struct.pack('!i', int(value))
+
+    if fieldType == 'int2':
+        return struct.pack('!h', int(value))
+
+    if fieldType == 'int8':
+        return struct.pack('!q', int(value))
+
+    if fieldType == 'timestamp':
+        delta = parseDate(value) - epoch
+        return struct.pack('!q', (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds)
+
+    if fieldType == 'date':
+        return struct.pack('!i', (parseDate(value) - epoch).days)
+
+    return str(value).encode('utf-8')
+
+#
+# TextCopyFile
+#
+# Pipe-delimited bcp file (bcpin.csh).
+#
+class TextCopyFile:
+
+    def __init__(self, f):
+        self.file = f		# text file object from compresslib.openOutput
+
+    def writeRow(
+        self,
+        fields		# field values (tuple)
+        ):
+
+        self.file.write('|'.join(['' if v is None else str(v) for v in fields]) + '\n')
+
+    def close(self):
+        self.file.close()
+
+#
+# BinaryCopyFile
+#
+# PostgreSQL binary COPY file.  The bytes go to the byte stream under the
+# text file object from compresslib.openOutput (plain, gzip or zstd).
+#
+class BinaryCopyFile:
+
+    def __init__(self, f, table):
+
+        self.file = f
+        self.table = table
+        self.types = columnTypes(table)
+        self.count = struct.pack('!h', len(self.types))
+        self.file.buffer.write(header)
+
+    def writeRow(
+        self,
+        fields		# field values (tuple), in column order
+        ):
+
+        if len(fields) != len(self.types):
+            raise ValueError('%s: %d fields, %d columns' % (self.table, len(fields), len(self.types)))
+
+        data = [self.count]
+        for fieldType, value in zip(self.types, fields):
+            if value is None or value == '':
+                data.append(struct.pack('!i', -1))
+            else:
+                b = encodeField(fieldType, value)
+                data.append(struct.pack('!i', len(b)))
+                data.append(b)
+
+        self.file.buffer.write(b''.join(data))
+
+    def close(self):
+
+        if self.file.closed:
+            return
+
+        self.file.buffer.write(trailer)
+        self.file.close()
+
+# Purpose: opens a bcp output file in the BCP_FORMAT format
+# Returns: TextCopyFile or BinaryCopyFile
+# Assumes: configure() and compresslib.configure() have been called
+# Effects: creates the file
+# Throws: IOError; ValueError (binary column types)
+def openOutput(
+    fileName,	# uncompressed file name (string)
+    table	# table name (string)
+    ):
+
+    if bcpFormat == 'binary':
+        return BinaryCopyFile(compresslib.openOutput(fileName), table)
+
+    return TextCopyFile(compresslib.openOutput(fileName))
+
+# Purpose: loads one bcp file with psql (binary files; text files for
+#	LOAD_STRATEGY copy, see strategylib.py)
+# Returns: exit status of psql
+# Assumes: compresslib.configure() has been called; the output file is closed
+# Effects: loads the table; writes the psql command to the diagnostics file
+# Throws: nothing
+def copyin(
+    server,	# database server (string)
+    database,	# database (string)
+    table,	# table name (string)
+    outputDir,	# directory of the bcp file (string)
+    fileName,	# uncompressed bcp file name (string)
+    diagFile	# diagnostics file descriptor
+    ):
+
+    fileName = os.path.join(outputDir, compresslib.outputFileName(fileName))
+
+    if bcpFormat == 'binary':
+        options = 'format binary'
+    else:
+        options = "delimiter '|', null ''"
+
+    psql = '%s -h %s -d %s -U %s -v ON_ERROR_STOP=1 -c "\\copy %s from pstdin with (%s)"' % \
+        (os.getenv('PSQL', 'psql'), server, database, os.getenv('PG_DBUSER', 'mgd_dbo'), table, options)
+
+    if compresslib.compress == 'gzip':
+        copy = 'gzip -dc %s | %s' % (fileName, psql)
+    elif compresslib.compress == 'zstd':
+        copy = 'zstd -q -dc %s | %s' % (fileName, psql)
+    else:
+        copy = '%s < %s' % (psql, fileName)
+
+    diagFile.write('%s\n' % copy)
+    diagFile.flush()
+
+    return os.system(copy)
@@ -0,0 +1,565 @@
+#
+# Program: curatorload.py
+#
+# Purpose:
+#
+#	CuratorLoad: the parts shared by the strain create and update loads
+#
+#	- opening the input, diagnostics, error and bcp output files
+#	- collecting errors and warnings (see errorlib.py) and the end-of-run
+#	  "Sanity check" summary and exit status
+#	- verifying users
+#	- running the row checks of a load as a rule pipeline, cheapest
+#	  first (see rulelib.py)
+#	- loading the bcp tables: INSERTs, psql COPY or bcpin.csh depending
+#	  on their size (see strategylib.py and copylib.py)
+#
+#	A load runs in two modes:
+#
+#	preview		QC only: the diagnostics/error files go next to the
+#			input file (<input>.diagnostics, <input>.error) and
+#			nothing is written to the database
+#	load		the diagnostics/error files are LOG_DIAG/LOG_ERROR and
+#			the bcp files in OUTPUTDIR are loaded if the file has
+#			no fatal errors
+#
+#	run() returns the exit status instead of exiting, so a load can be
+#	run in-process (the watch daemon, other tools).
+#
+#	VALIDATE_MODE=staging (or --staging) validates the whole file with a
+#	few set-based queries against staging tables before processFile runs
+#	(see staginglib.py and the loads' stageInput()); the error file is
+#	the same as with row-at-a-time validation (both also report a new
+#	strain that is on more than one row of the file).
+#
+#	Queries go through the throttle of dblib.py (QUERY_RATE etc.), which
+#	paces them and backs off while the database is slow, and its query
+#	slots (QUERY_CONCURRENCY), shared with the other load.
+#
+#	LOAD_CONCURRENT=1 (set by curatorstrainload.sh when the create and
+#	update loads run at the same time; see schedulelib.py): keys of
+#	sequences both loads use are reserved with reserveKeys().
+#
+#	Error budget: validation stops once the file has ERROR_BUDGET fatal
+#	errors, or ERROR_BUDGET_CATEGORY errors of one category (e.g. the same
+#	bad login on every row); the error file then says where it stopped.
+#	0 = no limit.  --max-errors, --max-errors-per-category and --fail-fast
+#	(= --max-errors 1) override the config.
+#
+
+import sys
+import os
+import io
+import traceback
+from .lazylib import mgi_utils, loadlib
+from .dblib import db
+from . import memorylib
+from . import profilelib
+from . import compresslib
+from . import copylib
+from . import staginglib
+from . import errorlib
+from . import dblib
+from . import strategylib
+from . import rulelib
+
+#
+# LoadExit
+#
+# Raised by CuratorLoad.exit() to end the run; CuratorLoad.run() returns
+# its status.
+#
+class LoadExit(Exception):
+
+    def __init__(self, status):
+        Exception.__init__(self, status)
+        self.status = status
+
+#
+# CuratorLoad
+#
+# Subclasses set loadName, bcpTables and rules and provide setPrimaryKeys(),
+# processFile() and bcpFiles().
+#
+class CuratorLoad:
+
+    loadName = ''	# name used in the diagnostics and profile files (string)
+
+    # bcp output files written in load mode: (attribute, table, bcp file name)
+    bcpTables = ()
+
+    # row checks run by processFile() through the pipeline: (name, rulelib cost, method name)
+    rules = ()
+
+    def __init__(
+        self,
+        inputFileName,		# input file name (string)
+        mode,			# 'load' or 'preview' (string)
+        diagFileName = None,	# default: LOG_DIAG, or <input>.diagnostics in preview mode
+        errorFileName = None	# default: LOG_ERROR, or <input>.error in preview mode
+        ):
+
+        self.inputFileName = inputFileName
+        self.mode = mode
+        self.isSanityCheck = 0
+        self.lineNum = 0
+        self.hasFatalError = 0
+        self.hasWarningError = 0
+
+        self.diagFileName = diagFileName
+        self.errorFileName = errorFileName
+        self.outputDir = ''
+
+        self.diagFile = None	# diagnostic file descriptor
+        self.errorFile = None	# error file descriptor
+        self.inputFile = None	# input file descriptor
+
+        self.cdate = ''		# current date
+
+        # 0 = leave the db connection open at exit (watch daemon)
+        self.closeConnection = 1
+
+        # error budget; None = ERROR_BUDGET/ERROR_BUDGET_CATEGORY
+        self.maxErrors = None
+        self.maxCategoryErrors = None
+        self.errorCounts = {}	# category -> number of fatal errors
+        self.stopMessage = None	# set once the error budget is exhausted
+        self.stopRow = None	# last row validated when the error budget was exhausted
+
+        self.errors = None	# errorlib.ErrorCollector once init() runs
+        self.pipeline = None	# rulelib.Pipeline of rules once init() runs
+
+        # 1 = another load may take keys at the same time (LOAD_CONCURRENT)
+        self.isConcurrent = 0
+
+        # set-based validation; None = VALIDATE_MODE
+        self.isStaging = None
+        self.userDict = None	# login -> user key, from the staging tables
+
+        if mode == 'preview':
+            self.isSanityCheck = 1
+
+    # Purpose: prints error message and ends the run
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: writes the sanity check summary; closes the files
+    # Throws: LoadExit with the exit status
+    def exit(
+        self,
+        status,          # numeric exit status (integer)
+        message = None   # exit message (string)
+        ):
+
+        if message is not None:
+            sys.stderr.write('\n' + str(message) + '\n')
+
+        try:
+            if self.pipeline is not None:
+                self.pipeline.report(self.diagFile)
+            dblib.report(self.diagFile)
+            self.diagFile.write('\n\nEnd Date/Time: %s\n' % (mgi_utils.date()))
+
+            if self.errors is not None:
+                self.errors.writeSummary(self.errorFile)
+                self.errors.writeIndex(self.errorFileName, self.inputFileName, self.stopRow)
+
+            if self.hasFatalError == 0 and status == 0:
+                    self.errorFile.write("\nSanity check : successful\n")
+            else:
+                    self.errorFile.write("\nSanity check : failed")
+                    self.errorFile.write("\nErrors must be fixed before file is published.\n")
+
+            self.errorFile.write('\n\nEnd Date/Time: %s\n' % (mgi_utils.date()))
+            self.diagFile.close()
+            self.errorFile.close()
+            self.inputFile.close()
+        except:
+            pass
+
+        if self.closeConnection == 1:
+            db.useOneConnection(0)
+
+        raise LoadExit(status)
+
+    # Purpose: opens the files
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: initializes the file descriptors
+    #          exits if files cannot be opened
+    # Throws: LoadExit
+    def init(self):
+
+        memorylib.configure()
+        compresslib.configure()
+        copylib.configure()
+        dblib.configure()
+        strategylib.configure()
+        rulelib.configure()
+        self.errors = errorlib.ErrorCollector(errorlib.reportFormat())
+        self.pipeline = rulelib.Pipeline(self, self.rules)
+
+        # DB_TRACE=1 in the config turns on db.setTrace()
+        if os.getenv('DB_TRACE', '0') == '1':
+            db.setTrace()
+
+        self.cdate = mgi_utils.date('%m/%d/%Y')
+
+        if self.maxErrors is None:
+            self.maxErrors = int(os.getenv('ERROR_BUDGET', '0'))
+        if self.maxCategoryErrors is None:
+            self.maxCategoryErrors = int(os.getenv('ERROR_BUDGET_CATEGORY', '0'))
+        if self.isStaging is None:
+            self.isStaging = staginglib.isStaging()
+        if os.getenv('LOAD_CONCURRENT', '0') == '1':
+            self.isConcurrent = 1
+
+        # place diag/error file in current directory
+        if self.isSanityCheck == 1:
+            if self.diagFileName is None:
+                self.diagFileName = self.inputFileName + '.diagnostics'
+            if self.errorFileName is None:
+                self.errorFileName = self.inputFileName + '.error'
+        else:
+            if self.diagFileName is None:
+                self.diagFileName = os.environ['LOG_DIAG']
+            if self.errorFileName is None:
+                self.errorFileName = os.environ['LOG_ERROR']
+            self.outputDir = os.environ['OUTPUTDIR']
+
+        try:
+            if self.isSanityCheck == 1:
+                self.diagFile = open(self.diagFileName, 'w')
+            else:
+                self.diagFile = open(self.diagFileName, 'a')
+        except:
+            self.exit(1, 'Could not open file diagFile: %s\n' % self.diagFileName)
+
+        try:
+            self.errorFile = open(self.errorFileName, 'w')
+        except:
+            self.exit(1, 'Could not open file errorFile: %s\n' % self.errorFileName)
+
+        try:
+            self.inputFile = compresslib.openInput(self.inputFileName)
+        except:
+            self.exit(1, 'Could not open file inputFileName: %s\n' % self.inputFileName)
+
+        if self.isSanityCheck == 0:
+            for attr, table, fileName in self.bcpTables:
+                try:
+                    setattr(self, attr, strategylib.Output(self.outputDir + '/' + fileName, table))
+                except:
+                    self.exit(1, 'Could not open file %s\n' % fileName)
+
+        # Log all SQL
+        db.set_sqlLogFunction(db.sqlLogAll)
+
+        # slow statements (SLOW_QUERY_MS) go to the diagnostics file
+        dblib.logTo(self.diagFile)
+
+        self.diagFile.write('Start Date/Time: %s\n' % (mgi_utils.date()))
+        self.diagFile.write('Server: %s\n' % (db.get_sqlServer()))
+        self.diagFile.write('Database: %s\n' % (db.get_sqlDatabase()))
+
+        self.errorFile.write('Start Date/Time: %s\n\n' % (mgi_utils.date()))
+
+    # Purpose:  reports a fatal error of the current row
+    # Returns:  nothing
+    # Assumes:  init() has been called
+    # Effects:  records the error (see errorlib.py); counts it against its category
+    # Throws:   nothing
+    def error(
+        self,
+        category,	# error category, e.g. 'Invalid Species' (string)
+        value,		# offending value; None if the category says it all
+        message		# per-row error file line (string)
+        ):
+
+        self.errors.add(self.errorFile, self.lineNum, 'error', category, value, message)
+
+        self.hasFatalError += 1
+        self.errorCounts[category] = self.errorCounts.get(category, 0) + 1
+
+    # Purpose:  reports a warning of the current row
+    # Returns:  nothing
+    # Assumes:  init() has been called
+    # Effects:  records the warning (see errorlib.py)
+    # Throws:   nothing
+    def warning(
+        self,
+        category,	# warning category (string)
+        value,		# offending value (string)
+        message		# per-row error file line (string)
+        ):
+
+        self.errors.add(self.errorFile, self.lineNum, 'warning', category, value, message)
+        self.hasWarningError += 1
+
+    # Purpose:  checks the error budget; called before each row
+    # Returns:  1 if validation should stop, else 0
+    # Assumes:  init() has been called
+    # Effects:  writes where validation stopped to the error file (once)
+    # Throws:   nothing
+    def isOverBudget(self):
+
+        if self.stopMessage is not None:
+            return 1
+
+        if self.maxErrors > 0 and self.hasFatalError >= self.maxErrors:
+            self.stopMessage = '%d fatal errors (error budget %d)' \
+                % (self.hasFatalError, self.maxErrors)
+
+        elif self.maxCategoryErrors > 0:
+            for category in self.errorCounts:
+                if self.errorCounts[category] >= self.maxCategoryErrors:
+                    self.stopMessage = '%d "%s" errors (error budget per category %d)' \
+                        % (self.errorCounts[category], category, self.maxCategoryErrors)
+                    break
+
+        if self.stopMessage is None:
+            return 0
+
+        self.stopRow = self.lineNum
+
+        self.errorFile.write('\nValidation stopped after row %d: %s.\n' % (self.lineNum, self.stopMessage))
+        self.errorFile.write('Rows after row %d were not checked; this report is partial.\n' % (self.lineNum))
+        self.diagFile.write('Validation stopped after row %d: %s\n' % (self.lineNum, self.stopMessage))
+
+        return 1
+
+    # Purpose:  verify user
+    # Returns:  user key if the user is valid, else 0
+    # Assumes:  nothing
+    # Effects:  looks the user up through db.sql (throttled, cached);
+    #	records loadlib.verifyUser's error if the user is invalid
+    # Throws:   nothing
+    def verifyUser(
+        self,
+        user	# user login (string)
+        ):
+
+        if self.userDict is not None and user in self.userDict:
+            return self.userDict[user]
+
+        results = db.sql('select _User_key from MGI_User where login = %s' % (staginglib.quote(user)), 'auto')
+        if len(results) > 0:
+            return results[0]['_User_key']
+
+        message = io.StringIO()
+        userKey = loadlib.verifyUser(user, self.lineNum, message)
+
+        if userKey == 0:
+            self.error('Invalid User', user, message.getvalue())
+
+        return userKey
+
+    # Purpose:  closes the bcp outputs
+    # Returns:  nothing
+    # Assumes:  load mode
+    # Effects:  chooses each table's load strategy (see strategylib.py);
+    #	close (not just flush) so compressed files are complete
+    # Throws:   nothing
+    def closeOutput(self):
+
+        for attr, table, fileName in self.bcpTables:
+            getattr(self, attr).close()
+
+    # Purpose:  loads one bcp file
+    # Returns:  exit status of bcpin.csh (psql for BCP_FORMAT=binary)
+    # Assumes:  the bcp file is closed
+    # Effects:  BCPs the data into the database
+    # Throws:   nothing
+    def bcpin(
+        self,
+        table,		# table name (string)
+        fileName	# bcp file name (string)
+        ):
+
+        if copylib.bcpFormat == 'binary':
+            return copylib.copyin(db.get_sqlServer(), db.get_sqlDatabase(),
+                table, self.outputDir, fileName, self.diagFile)
+
+        bcpCommand = os.environ['PG_DBUTILS'] + '/bin/bcpin.csh'
+
+        return compresslib.bcpin(bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(),
+            table, self.outputDir, fileName, self.diagFile)
+
+    # Purpose:  loads one bcp table with the strategy chosen by closeOutput()
+    # Returns:  exit status of psql/bcpin.csh (0 for insert and skip)
+    # Assumes:  closeOutput() has been called
+    # Effects:  loads the table; writes the strategy and the reason to the
+    #	diagnostics file
+    # Throws:   nothing
+    def loadTable(
+        self,
+        attr		# output attribute, e.g. 'strainFile' (string)
+        ):
+
+        output = getattr(self, attr)
+        fileName = os.path.basename(output.fileName)
+
+        self.diagFile.write('%s: %s (%s)\n' % (output.table, output.strategy, output.reason))
+
+        if output.strategy == 'skip':
+            return 0
+
+        if output.strategy == 'insert':
+            strategylib.insert(output.table, output.rows)
+            db.commit()
+            return 0
+
+        if output.strategy == 'copy':
+            return copylib.copyin(db.get_sqlServer(), db.get_sqlDatabase(),
+                output.table, self.outputDir, fileName, self.diagFile)
+
+        return self.bcpin(output.table, fileName)
+
+    # Purpose:  set-based validation of the whole file (VALIDATE_MODE=staging)
+    # Returns:  nothing
+    # Assumes:  init() has been called
+    # Effects:  keeps one db connection for the temporary tables;
+    #	stageInput() fills the lookups the verify methods read;
+    #	reopens the input for processFile()
+    # Throws:   LoadExit
+    def stageFile(self):
+
+        db.useOneConnection(1)
+
+        stage = staginglib.Stage()
+        self.stageInput(stage)
+        stage.report(self.diagFile)
+
+        self.inputFile.close()
+        try:
+            self.inputFile = compresslib.openInput(self.inputFileName)
+        except:
+            self.exit(1, 'Could not open file inputFileName: %s\n' % self.inputFileName)
+
+    # Purpose:  stages the users of a staging table column
+    # Returns:  nothing
+    # Assumes:  the staging table is closed
+    # Effects:  sets userDict; verifyUser() reads it
+    # Throws:   nothing
+    def stageUsers(
+        self,
+        stage,		# staginglib.Stage
+        table,		# staging table (StagingTable)
+        column		# column of user logins (string)
+        ):
+
+        self.userDict = {}
+
+        for r in stage.check('users', '''select distinct s.%s as login, u._User_key
+            from %s s, MGI_User u
+            where u.login = s.%s
+            and s.row between {first} and {last}
+            ''' % (column, table.name, column), table):
+            self.userDict[r['login']] = r['_User_key']
+
+    def stageInput(self, stage):
+        pass
+
+    # Purpose:  number of values in a pipe-delimited column of the input
+    # Returns:  integer (an upper bound: the header and invalid rows count too)
+    # Assumes:  nothing
+    # Effects:  reads the input file
+    # Throws:   IOError
+    def countValues(
+        self,
+        column		# column (integer, from 0)
+        ):
+
+        count = 0
+
+        with compresslib.openInput(self.inputFileName) as f:
+            for line in f:
+                tokens = line.rstrip('\n').split('\t')
+                if len(tokens) > column and len(tokens[column]) > 0:
+                    count = count + len(tokens[column].split('|'))
+
+        return count
+
+    # Purpose:  first key of a sequence
+    # Returns:  key (integer)
+    # Assumes:  nothing
+    # Effects:  isConcurrent == 0: nextval(), as before
+    #	isConcurrent == 1: reserves a key per value of the input column
+    #	under an advisory lock, so the keys this load numbers from the
+    #	first key are its own
+    # Throws:   nothing
+    def reserveKeys(
+        self,
+        sequence,	# sequence name (string)
+        column		# input column with one value per key (integer)
+        ):
+
+        if self.isConcurrent == 0:
+            results = db.sql(''' select nextval('%s') as maxKey ''' % (sequence), 'auto')
+            return results[0]['maxKey']
+
+        count = self.countValues(column)
+
+        db.useOneConnection(1)
+        db.sql(''' select pg_advisory_lock(hashtext('%s')) ''' % (sequence), 'auto')
+        results = db.sql(''' select setval('%s', nextval('%s') + %d) as maxKey ''' \
+            % (sequence, sequence, max(count, 1) - 1), 'auto')
+        db.sql(''' select pg_advisory_unlock(hashtext('%s')) ''' % (sequence), 'auto')
+        db.commit()
+
+        firstKey = results[0]['maxKey'] - max(count, 1) + 1
+        self.diagFile.write('Reserved %s keys %d-%d\n' % (sequence, firstKey, results[0]['maxKey']))
+
+        return firstKey
+
+    def setPrimaryKeys(self):
+        pass
+
+    def processFile(self):
+        pass
+
+    def bcpFiles(self):
+        pass
+
+    # Purpose:  runs the load
+    # Returns:  nothing
+    # Assumes:  nothing
+    # Effects:  see processFile() and bcpFiles()
+    # Throws:   LoadExit
+    def main(self):
+
+        self.init()
+        memorylib.reportPhase(self.diagFile, 'init')
+        self.setPrimaryKeys()
+        if self.isStaging == 1:
+            self.stageFile()
+            memorylib.reportPhase(self.diagFile, 'stageFile')
+        self.processFile()
+        memorylib.reportPhase(self.diagFile, 'processFile')
+        self.bcpFiles()
+        memorylib.reportPhase(self.diagFile, 'bcpFiles')
+
+    # Purpose:  runs the load, under the profiler if profiling is enabled
+    # Returns:  exit status (1 if the load raised an exception)
+    # Assumes:  nothing
+    # Effects:  see main(); an exception is written to the diagnostics
+    #	and error files and the run ends with exit(1), so the summary
+    #	and "Sanity check" are still written
+    # Throws:   nothing
+    def run(self):
+
+        try:
+            profilelib.run(self.main, self.loadName)
+            profilelib.report(self.diagFile)
+            self.exit(0)
+        except LoadExit as e:
+            return e.status
+        except Exception as e:
+            try:
+                self.diagFile.write('\n%s' % (traceback.format_exc()))
+                self.errorFile.write('\nLoad failed (see %s): %s\n' % (self.diagFileName, e))
+            except:
+                pass
+            try:
+                self.exit(1, 'Load failed: %s' % (e))
+            except LoadExit as stop:
+                return stop.status
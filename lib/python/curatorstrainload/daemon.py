@@ -0,0 +1,280 @@
+#
+# Program: daemon.py
+#
+# Purpose:
+#
+#	Watch daemon for the curator strain loads
+#	(curatorstrainload watch; see bin/curatorstraind.sh)
+#
+#	Polls INPUTDIR for newly published straincreate/strainupdate input
+#	files (as published by publishStrainCreate/publishStrainUpdate,
+#	optionally .gz or .zst) and loads each one as soon as it appears,
+#	in the same order as curatorstrainload.sh: create, then update.
+#
+#	The daemon keeps one database connection and the vocabulary lookups
+#	of the create load warm between files, so a published file is loaded
+#	within seconds instead of at the next cron run.  Nothing else is
+#	kept: copylib's table and date lookups are cleared for each file,
+#	and after a file fails (non-zero status or an exception) the
+#	connection is closed, which rolls back what the load left open, and
+#	opened again.
+#
+#	Each file is one DLA job, as with the cron wrappers: before the load
+#	bin/curatorstraindjob.sh runs preload (archive, logs, job start) and
+#	after it shutDown with the load's status (job end, cleanup, mail).
+#
+#	Each file is loaded with the environment of its load's config
+#	(straincreate.config or strainupdate.config in CURATORSTRAINLOAD,
+#	sourced with sh when the daemon first needs it and again whenever
+#	the file changes), as straincreate.sh/strainupdate.sh do: its
+#	LOG_DIAG, LOG_ERROR, OUTPUTDIR and load settings, not those of
+#	curatorstrain.config.
+#
+#	A file is loaded once it is newer than its lastrun file (lastruncreate,
+#	lastrunupdate; the same files the cron wrappers use) and has not
+#	changed for WATCH_SETTLE seconds (so a copy still in progress is not
+#	picked up).
+#
+#	SIGTERM/SIGINT stop the daemon after the file being loaded is done.
+#
+# Environment:
+#
+#	INPUTDIR			see curatorstrain.config
+#	CURATORSTRAINLOAD		install directory (straincreate.config, strainupdate.config)
+#	STRAINCREATE_FILE_NAME		create input file name (straincreate.txt)
+#	STRAINUPDATE_FILE_NAME		update input file name (strainupdate.txt)
+#	WATCH_INTERVAL			seconds between polls
+#	WATCH_SETTLE			seconds a file must be unchanged before loading
+#	WATCH_CACHE_TTL			seconds before the vocabulary lookups are reloaded
+#
+
+import sys
+import os
+import re
+import time
+import signal
+import subprocess
+from .lazylib import mgi_utils
+from .dblib import db
+from . import cli
+from . import copylib
+from . import straincreate
+
+isStopping = 0
+
+configs = {}	# config file -> (mtime, environment)
+
+# Purpose: writes a message to stdout (curatorstraind.sh sends it to the daemon log)
+# Returns: nothing
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def log(
+    message	# message (string)
+    ):
+
+    sys.stdout.write('%s %s\n' % (mgi_utils.date(), message))
+    sys.stdout.flush()
+
+# Purpose: signal handler for SIGTERM/SIGINT
+# Returns: nothing
+# Assumes: nothing
+# Effects: the daemon stops after the current file
+# Throws: nothing
+def stop(signum, frame):
+    global isStopping
+
+    isStopping = 1
+    log('stopping (signal %d)' % (signum))
+
+# Purpose: finds the published input file of a load
+# Returns: path of the input file (plain, .gz or .zst), or None
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def findInput(
+    inputDir,	# input directory (string)
+    fileName	# input file name (string)
+    ):
+
+    for suffix in ('', '.gz', '.zst'):
+        path = os.path.join(inputDir, fileName + suffix)
+        if os.path.isfile(path):
+            return path
+
+    return None
+
+# Purpose: decides whether an input file needs loading
+# Returns: 1 if the file is newer than the lastrun file and has settled, else 0
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def isReady(
+    path,	# input file (string)
+    lastRun,	# lastrun file (string)
+    settle	# seconds the file must be unchanged (integer)
+    ):
+
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return 0
+
+    if os.path.exists(lastRun) and os.stat(lastRun).st_mtime > mtime:
+        return 0
+
+    if time.time() - mtime < settle:
+        return 0
+
+    return 1
+
+# Purpose: environment of a load's config file (re-read if it changed)
+# Returns: dictionary
+# Assumes: nothing
+# Effects: may run sh
+# Throws: OSError, subprocess.CalledProcessError
+def environment(
+    configFile	# config file (string)
+    ):
+
+    mtime = os.stat(configFile).st_mtime
+
+    if configFile not in configs or configs[configFile][0] != mtime:
+        configs[configFile] = (mtime, cli.readConfig(configFile))
+
+    return configs[configFile][1]
+
+# Purpose: runs a DLA job stream step of a file (bin/curatorstraindjob.sh)
+# Returns: output of the step
+# Assumes: os.environ is that of the load's config
+# Effects: see curatorstraindjob.sh
+# Throws: OSError, subprocess.CalledProcessError
+def jobStep(
+    configDir,	# install directory (string)
+    args	# arguments of curatorstraindjob.sh (list)
+    ):
+
+    return subprocess.run([os.path.join(configDir, 'bin', 'curatorstraindjob.sh')] + args,
+        stdout = subprocess.PIPE, universal_newlines = True, check = True).stdout
+
+# Purpose: loads one input file
+# Returns: nothing
+# Assumes: the db connection is open
+# Effects: sets the environment to baseEnv and the load's config;
+#	runs the load between the DLA preload and shutDown; touches the
+#	lastrun file; reconnects after a failed load
+# Throws: nothing
+def load(
+    loadName,	# 'create' or 'update' (string)
+    path,	# input file (string)
+    lastRun,	# lastrun file (string)
+    configDir,	# directory of the load configs (string)
+    baseEnv	# environment of the daemon (dictionary)
+    ):
+
+    configFile = os.path.join(configDir, cli.configNames[loadName])
+
+    try:
+        env = environment(configFile)
+    except Exception as e:
+        log('%s: not loading %s: cannot read %s: %s' % (loadName, path, configFile, e))
+        return
+
+    # the load's config, and nothing left over from the previous file
+    os.environ.clear()
+    os.environ.update(baseEnv)
+    os.environ.update(env)
+
+    loadClass = cli.loadClass(loadName)
+
+    # if the job cannot start, the file is tried again at the next poll
+    try:
+        output = jobStep(configDir, ['start', loadClass.loadName])
+        jobKey = re.search(r'^JOBKEY=(.*)$', output, re.MULTILINE).group(1)
+    except Exception as e:
+        log('%s: not loading %s: preload failed: %s' % (loadName, path, e))
+        return
+
+    log('%s: loading %s (job %s)' % (loadClass.loadName, path, jobKey))
+    startTime = time.time()
+
+    copylib.clearCaches()
+
+    # LOG_DIAG and LOG_ERROR of the config
+    curatorLoad = loadClass(path, 'load')
+    curatorLoad.closeConnection = 0
+
+    try:
+        status = curatorLoad.run()
+    except Exception as e:
+        status = 1
+        log('%s: %s' % (loadName, e))
+
+    # start the next file on a new connection, without the failed load's transaction
+    if status != 0:
+        db.useOneConnection(0)
+        db.useOneConnection(1)
+
+    # like the cron wrappers, a failed file is not retried until it is republished
+    with open(lastRun, 'a'):
+        os.utime(lastRun, None)
+
+    try:
+        jobStep(configDir, ['end', loadClass.loadName, jobKey, str(status)])
+    except Exception as e:
+        log('%s: shutDown failed: %s' % (loadName, e))
+
+    log('%s: done, status %s, %d fatal error(s), %.1f s' \
+        % (loadClass.loadName, status, curatorLoad.hasFatalError, time.time() - startTime))
+
+# Purpose: runs the watch daemon until SIGTERM/SIGINT
+# Returns: exit status
+# Assumes: the environment is set by curatorstrain.config
+# Effects: loads published files
+# Throws: nothing
+def watch():
+
+    inputDir = os.environ['INPUTDIR']
+    configDir = os.getenv('CURATORSTRAINLOAD', os.getcwd())
+    baseEnv = dict(os.environ)
+
+    watchInterval = int(os.getenv('WATCH_INTERVAL', '10'))
+    watchSettle = int(os.getenv('WATCH_SETTLE', '5'))
+    cacheTTL = int(os.getenv('WATCH_CACHE_TTL', '3600'))
+
+    # (load, input file name, lastrun file name)
+    loads = (
+        ('create', os.getenv('STRAINCREATE_FILE_NAME', 'straincreate.txt'), 'lastruncreate'),
+        ('update', os.getenv('STRAINUPDATE_FILE_NAME', 'strainupdate.txt'), 'lastrunupdate'),
+        )
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    db.useOneConnection(1)
+    log('watching %s every %d s' % (inputDir, watchInterval))
+    cacheTime = 0
+
+    while isStopping == 0:
+
+        if time.time() - cacheTime > cacheTTL:
+            straincreate.clearCaches()
+            cacheTime = time.time()
+
+        for loadName, fileName, lastRunName in loads:
+
+            if isStopping == 1:
+                break
+
+            path = findInput(inputDir, fileName)
+            lastRun = os.path.join(inputDir, lastRunName)
+
+            if path is not None and isReady(path, lastRun, watchSettle) == 1:
+                load(loadName, path, lastRun, configDir, baseEnv)
+
+        time.sleep(watchInterval)
+
+    db.useOneConnection(0)
+    log('stopped')
+
+    return 0
@@ -0,0 +1,683 @@
+#
+# Program: dblib.py
+#
+# Purpose:
+#
+#	Database access of the strain create and update loads
+#
+#	The modules of this package use
+#
+#		from .dblib import db
+#
+#	which is the MGI db module (see lazylib.py) with a throttled sql():
+#	a large file runs thousands of per-row queries against the production
+#	database the web tier reads from, so (QUERY_RATE > 0) each query
+#	first waits for a token: at most QUERY_RATE queries per second, with
+#	bursts of QUERY_BURST (token bucket), and its latency is measured
+#	(moving average).  Once a second the rate is adjusted: halved while
+#	the average latency is over QUERY_LATENCY_MS (not below
+#	QUERY_RATE_MIN), otherwise raised by QUERY_RATE_STEP back up to
+#	QUERY_RATE.  A busy server thus slows the load down instead of the
+#	load slowing the server down.
+#
+#	With LOAD_CONCURRENT=1 the create and update loads run at the same
+#	time and each gets half of QUERY_RATE.
+#
+#	QUERY_CONCURRENCY > 0 caps the queries running at the same time
+#	across all processes (the create and update loads, the watch daemon,
+#	the QC server workers): each query holds an flock on one of
+#	QUERY_CONCURRENCY slot files in QUERY_SLOT_DIR (QuerySlots).
+#
+#	The loads' own lookups all go through sql(), including the user
+#	lookup of curatorload.verifyUser; only loadlib.verifyUser's query for
+#	the error message of an invalid user bypasses the throttle and the
+#	cache (accessionlib.split_accnum runs no query).
+#
+#	Read-only lookups are memoized (QUERY_CACHE_SIZE > 0): the same
+#	allele, term or logical DB queried on many rows goes to the database
+#	once.  A query is cached if it is a select run with the 'auto' parser
+#	that calls no volatile function (nextval, setval, ACC_setMax, ...);
+#	its key is the query with the whitespace outside string literals
+#	collapsed.  The cache is a memorylib.LRUCache of QUERY_CACHE_SIZE
+#	entries; an entry expires after QUERY_CACHE_TTL seconds (0 = never);
+#	results of more than QUERY_CACHE_MAX_ROWS rows are not kept.  Any
+#	other statement (insert, update, setval, ...) may change what a
+#	lookup returns, so it clears the cache.  Statements other processes
+#	run do not go through sql(), so the cache is off unless
+#	QUERY_CACHE_SIZE is set.
+#
+#	Statements are timed (SLOW_QUERY_MS > 0).  A statement that takes
+#	SLOW_QUERY_MS or longer is written to the diagnostics file with its
+#	duration and call site; the first slow statement of each query shape
+#	also gets its plan, so a missing index shows up in the load's own log:
+#
+#	SLOW_QUERY_EXPLAIN=1		EXPLAIN (the statement is not run again)
+#	SLOW_QUERY_EXPLAIN=analyze	EXPLAIN (ANALYZE, BUFFERS) for selects,
+#					which runs the select again; other
+#					statements and selects that call a
+#					volatile function get plain EXPLAIN
+#
+#	pages() runs a select that returns a large table (all strain names)
+#	pageSize rows at a time (keyset pagination), so the whole result is
+#	never held in memory at once.
+#
+#	report() writes the number of queries, the time spent waiting and the
+#	backoffs, the cache hits and misses, and the slowest statements by
+#	query shape (literals replaced by ?) to the diagnostics file.
+#
+# Environment:
+#
+#	QUERY_RATE		queries per second; 0 = no throttling (default)
+#	QUERY_RATE_MIN		lowest rate after backoffs (default 10)
+#	QUERY_RATE_STEP		rate increase per second below the latency target (default 10)
+#	QUERY_BURST		queries allowed at once after an idle period (default 10)
+#	QUERY_LATENCY_MS	latency target (default 100)
+#	QUERY_CONCURRENCY	queries at a time across processes; 0 = no limit (default)
+#	QUERY_SLOT_DIR		directory of the slot files (default: LOGDIR)
+#	QUERY_CACHE_SIZE	cached lookups; 0 = no cache (default)
+#	QUERY_CACHE_TTL		seconds a lookup is cached; 0 = the whole run (default)
+#	QUERY_CACHE_MAX_ROWS	largest result cached (default 100)
+#	SLOW_QUERY_MS		slow statement threshold; unset or 0 = no timing (default)
+#	SLOW_QUERY_EXPLAIN	1 = capture the plan of slow statements (default),
+#				analyze = with EXPLAIN ANALYZE for selects, 0 = no plans
+#
+
+import os
+import re
+import time
+import fcntl
+import traceback
+import threading
+from . import lazylib
+from . import memorylib
+
+pageSize = 10000		# rows per query of pages()
+
+alpha = 0.2		# weight of the latest query in the latency average
+adjustInterval = 1.0	# seconds between rate adjustments
+
+slotFileName = 'curatorstrainload.query.%d.lock'
+slotPoll = 0.005	# seconds between tries while all slots are taken
+
+#
+# Throttle
+#
+# Token bucket with AIMD rate control (per process; see QuerySlots for
+# the cap shared across processes).
+#
+class Throttle:
+
+    def __init__(
+        self,
+        rate,		# queries per second (float)
+        minRate,	# lowest rate (float)
+        step,		# additive increase per adjustment (float)
+        burst,		# bucket size (integer)
+        latency		# latency target in seconds (float)
+        ):
+
+        self.maxRate = rate
+        self.rate = rate
+        self.minRate = min(minRate, rate)
+        self.step = step
+        self.burst = max(1, burst)
+        self.latency = latency
+
+        self.lock = threading.Lock()
+
+        self.tokens = float(self.burst)
+        self.lastFill = time.monotonic()
+        self.lastAdjust = self.lastFill
+        self.average = None		# latency moving average (seconds)
+
+        self.queries = 0
+        self.waited = 0.0		# seconds spent waiting for tokens
+        self.backoffs = 0
+        self.lowestRate = rate
+
+    # Purpose: waits until a query may run
+    # Returns: nothing
+    # Assumes: release() is called when the query is done
+    # Effects: takes a token; sleeps if none is left
+    # Throws: nothing
+    def acquire(self):
+
+        startTime = time.monotonic()
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.lastFill) * self.rate)
+                self.lastFill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.queries += 1
+                    self.waited += now - startTime
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    # Purpose: records the latency of a query
+    # Returns: nothing
+    # Assumes: acquire() was called
+    # Effects: adjusts the rate once per adjustInterval
+    # Throws: nothing
+    def release(
+        self,
+        latency		# seconds the query took (float)
+        ):
+
+        with self.lock:
+            if self.average is None:
+                self.average = latency
+            else:
+                self.average += alpha * (latency - self.average)
+
+            now = time.monotonic()
+            if now - self.lastAdjust < adjustInterval:
+                return
+            self.lastAdjust = now
+
+            if self.average > self.latency:
+                self.rate = max(self.minRate, self.rate / 2)
+                self.backoffs += 1
+                self.lowestRate = min(self.lowestRate, self.rate)
+            else:
+                self.rate = min(self.maxRate, self.rate + self.step)
+
+#
+# QuerySlots
+#
+# At most len(fds) queries at a time across the processes that use the
+# same slot files: a query holds an exclusive flock on one of them.
+#
+class QuerySlots:
+
+    def __init__(
+        self,
+        directory,	# directory of the slot files (string)
+        count		# number of slots (integer)
+        ):
+
+        self.fds = []
+        for i in range(count):
+            self.fds.append(os.open(os.path.join(directory, slotFileName % (i)), os.O_RDWR | os.O_CREAT, 0o664))
+
+        self.queries = 0
+        self.waits = 0			# queries that found every slot taken
+        self.waited = 0.0		# seconds spent waiting for a slot
+
+    # Purpose: waits for a free slot
+    # Returns: file descriptor of the slot; release() frees it
+    # Assumes: nothing
+    # Effects: locks the slot file
+    # Throws: OSError
+    def acquire(self):
+
+        startTime = time.monotonic()
+        isWaiting = 0
+
+        while True:
+            for fd in self.fds:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self.queries += 1
+                self.waits += isWaiting
+                self.waited += time.monotonic() - startTime
+                return fd
+            isWaiting = 1
+            time.sleep(slotPoll)
+
+    def release(self, fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def close(self):
+        for fd in self.fds:
+            os.close(fd)
+        self.fds = []
+
+# string literals, and whitespace outside them
+literals = re.compile(r"('(?:[^']|'')*')|\s+")
+numbers = re.compile(r'\b\d+\b')
+
+# statements that have a plan (EXPLAIN)
+explainable = re.compile(r'(select|insert|update|delete)\b', re.IGNORECASE)
+
+# statements that are not cached even if they are selects
+volatile = re.compile(r'\b(nextval|setval|currval|lastval|pg_advisory\w*|random|clock_timestamp|\w+_setmax)\s*\(',
+    re.IGNORECASE)
+
+maxShapes = 10		# query shapes in the cache report
+
+# Purpose: cache key of a query
+# Returns: the query with the whitespace outside string literals collapsed
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def normalize(
+    cmd		# query (string)
+    ):
+
+    return literals.sub(lambda m: m.group(1) or ' ', cmd).strip()
+
+# Purpose: shape of a normalized query, for the cache report
+# Returns: the query with string and number literals replaced by ?
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def shape(
+    key		# normalized query (string)
+    ):
+
+    return numbers.sub('?', literals.sub(lambda m: '?' if m.group(1) else ' ', key))
+
+#
+# QueryCache
+#
+# Memoized read-only lookups: normalized query -> (time, results).
+#
+class QueryCache:
+
+    def __init__(
+        self,
+        size,		# entries (integer)
+        ttl,		# seconds an entry is valid; 0 = no expiry (float)
+        maxRows		# largest result kept (integer)
+        ):
+
+        self.entries = memorylib.LRUCache(size)
+        self.ttl = ttl
+        self.maxRows = maxRows
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.shapes = {}	# shape -> [hits, misses]
+
+    # Purpose: cache key of a statement
+    # Returns: normalized query, or None if the statement is not a cacheable lookup
+    # Assumes: nothing
+    # Effects: nothing
+    # Throws: nothing
+    def key(
+        self,
+        cmd,		# statement (string or list)
+        parser		# db.sql parser
+        ):
+
+        if parser != 'auto' or not isinstance(cmd, str):
+            return None
+
+        key = normalize(cmd)
+        if key[:6].lower() != 'select' or volatile.search(key) is not None:
+            return None
+
+        return key
+
+    # Purpose: looks up a query
+    # Returns: a copy of the cached results, or None
+    # Assumes: nothing
+    # Effects: counts the hit or miss
+    # Throws: nothing
+    def get(
+        self,
+        key		# normalized query (string)
+        ):
+
+        with self.lock:
+            counts = self.shapes.setdefault(shape(key), [0, 0])
+
+            if key in self.entries:
+                cached, results = self.entries[key]
+                if self.ttl == 0 or time.monotonic() - cached < self.ttl:
+                    self.hits += 1
+                    counts[0] += 1
+                    return [dict(r) for r in results]
+                del self.entries[key]
+
+            self.misses += 1
+            counts[1] += 1
+
+        return None
+
+    # Purpose: caches the results of a query
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: stores a copy of the results unless there are too many rows
+    # Throws: nothing
+    def put(
+        self,
+        key,		# normalized query (string)
+        results		# db.sql results (list of dictionaries)
+        ):
+
+        if not isinstance(results, list) or len(results) > self.maxRows:
+            return
+
+        with self.lock:
+            self.entries[key] = (time.monotonic(), [dict(r) for r in results])
+
+    # Purpose: drops all cached results (a statement may have changed them)
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: clears the cache
+    # Throws: nothing
+    def clear(self):
+
+        with self.lock:
+            if len(self.entries) > 0:
+                self.entries.clear()
+                self.invalidations += 1
+
+#
+# QueryTiming
+#
+# Time per statement and query shape; slow statements are written to the
+# diagnostics file (logTo()).
+#
+class QueryTiming:
+
+    def __init__(
+        self,
+        threshold,	# slow statement threshold in seconds (float)
+        isExplain,	# '1' = capture the plan of slow statements, 'analyze' = with
+        		# EXPLAIN ANALYZE for selects, '0' = no plans
+        explain		# runs an explain statement: function(cmd) -> results
+        ):
+
+        self.threshold = threshold
+        self.isExplain = isExplain
+        self.explain = explain
+        self.out = None
+        self.lock = threading.Lock()
+
+        self.statements = 0
+        self.total = 0.0
+        self.slow = 0
+        self.shapes = {}	# shape -> [statements, seconds, slowest]
+        self.explained = set()	# shapes with a captured plan
+
+    # Purpose: records the time of a statement
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: writes slow statements (and the plan of the first slow
+    #	statement of a shape) to the diagnostics file
+    # Throws: nothing
+    def record(
+        self,
+        cmd,		# statement (string or list)
+        elapsed		# seconds (float)
+        ):
+
+        if isinstance(cmd, str):
+            key = normalize(cmd)
+        else:
+            key = normalize('; '.join(cmd))
+        q = shape(key)
+
+        with self.lock:
+            self.statements += 1
+            self.total += elapsed
+            counts = self.shapes.setdefault(q, [0, 0.0, 0.0])
+            counts[0] += 1
+            counts[1] += elapsed
+            counts[2] = max(counts[2], elapsed)
+
+            if elapsed < self.threshold or self.out is None:
+                return
+
+            self.slow += 1
+            plan = None
+            if self.isExplain != '0' and q not in self.explained and isinstance(cmd, str) \
+               and explainable.match(key) is not None and ';' not in key.rstrip(';'):
+                plan = 'explain '
+                if self.isExplain == 'analyze' and key[:6].lower() == 'select' \
+                   and volatile.search(key) is None:
+                    plan = 'explain (analyze, buffers) '
+                self.explained.add(q)
+
+        self.out.write('Slow query: %.1f ms at %s\n    %s\n' % (elapsed * 1000, callSite(), key[:500]))
+
+        if plan is not None:
+            try:
+                for r in self.explain(plan + key):
+                    self.out.write('    | %s\n' % (list(r.values())[0]))
+            except Exception as e:
+                self.out.write('    (no plan: %s)\n' % (str(e).strip()))
+
+        self.out.flush()
+
+# Purpose: where a statement was run from
+# Returns: the two innermost frames outside this module, e.g.
+#	'strainupdate.py:210 verifyAllele < strainupdate.py:330 processFile'
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def callSite():
+
+    frames = [f for f in traceback.extract_stack()
+        if os.path.basename(f.filename) != 'dblib.py']
+
+    return ' < '.join(['%s:%d %s' % (os.path.basename(f.filename), f.lineno, f.name)
+        for f in reversed(frames[-2:])])
+
+#
+# Database
+#
+# The MGI db module with a throttled, memoized, timed sql(); everything
+# else is passed through.
+#
+class Database:
+
+    def __init__(self, module):
+        self.__dict__['_module'] = module
+        self.__dict__['throttle'] = None
+        self.__dict__['slots'] = None
+        self.__dict__['cache'] = None
+        self.__dict__['timing'] = None
+
+    # Purpose: runs a query (see db.sql)
+    # Returns: db.sql results
+    # Assumes: nothing
+    # Effects: answers cached lookups; clears the cache for other statements;
+    #	waits for the throttle and a query slot if they are configured;
+    #	times the statement
+    # Throws: whatever db.sql throws
+    def sql(self, cmd, parser = 'auto', **kw):
+
+        cache = self.cache
+        key = None
+
+        if cache is not None:
+            key = cache.key(cmd, parser)
+            if key is None:
+                cache.clear()
+            else:
+                results = cache.get(key)
+                if results is not None:
+                    return results
+
+        throttle = self.throttle
+        if throttle is not None:
+            throttle.acquire()
+
+        slots = self.slots
+        slot = None
+        if slots is not None:
+            slot = slots.acquire()
+
+        startTime = time.monotonic()
+        try:
+            results = self._module.sql(cmd, parser, **kw)
+        finally:
+            elapsed = time.monotonic() - startTime
+            if slot is not None:
+                slots.release(slot)
+            if throttle is not None:
+                throttle.release(elapsed)
+
+        if self.timing is not None:
+            self.timing.record(cmd, elapsed)
+
+        if key is not None:
+            cache.put(key, results)
+
+        return results
+
+    def __getattr__(self, attr):
+        return getattr(self._module, attr)
+
+    def __setattr__(self, attr, value):
+        if attr in self.__dict__:
+            self.__dict__[attr] = value
+        else:
+            setattr(self._module, attr, value)
+
+db = Database(lazylib.db)
+
+# Purpose: runs a select pageSize rows at a time
+# Returns: generator of the result rows, in key order
+# Assumes: the key is a unique integer (a primary key)
+# Effects: one query per page
+# Throws: whatever db.sql throws
+def pages(
+    cmd,	# select whose where clause has a {page} condition (string)
+    keyColumn,	# column the pages are ordered by, e.g. 's._Strain_key' (string)
+    keyName	# name of that column in the results, e.g. 'key' (string)
+    ):
+
+    last = None
+
+    while True:
+        if last is None:
+            condition = 'true'
+        else:
+            condition = '%s > %d' % (keyColumn, last)
+
+        results = db.sql('%s order by %s limit %d' % (cmd.replace('{page}', condition), keyColumn, pageSize), 'auto')
+
+        for r in results:
+            yield r
+
+        if len(results) < pageSize:
+            return
+
+        last = results[-1][keyName]
+
+# Purpose: reads the throttle, cache and timing configuration from the environment
+# Returns: nothing
+# Assumes: nothing
+# Effects: sets db.timing (None if SLOW_QUERY_MS is 0), db.cache (None
+#	if QUERY_CACHE_SIZE is 0), db.slots (None if QUERY_CONCURRENCY is 0)
+#	and db.throttle (None if QUERY_RATE is 0)
+# Throws: ValueError if a setting is not a number; OSError if the slot
+#	files cannot be opened
+def configure():
+
+    threshold = float(os.getenv('SLOW_QUERY_MS') or '0')
+
+    if threshold > 0:
+        isExplain = os.getenv('SLOW_QUERY_EXPLAIN') or '1'
+        if isExplain not in ('0', '1', 'analyze'):
+            raise ValueError('SLOW_QUERY_EXPLAIN must be 0, 1 or analyze: %s' % (isExplain))
+        db.timing = QueryTiming(threshold / 1000, isExplain,
+            lambda cmd: db._module.sql(cmd, 'auto'))
+    else:
+        db.timing = None
+
+    size = int(os.getenv('QUERY_CACHE_SIZE', '0'))
+
+    if size > 0:
+        db.cache = QueryCache(size,
+            float(os.getenv('QUERY_CACHE_TTL', '0')),
+            int(os.getenv('QUERY_CACHE_MAX_ROWS', '100')))
+    else:
+        db.cache = None
+
+    # a daemon or QC worker configures each load
+    if db.slots is not None:
+        db.slots.close()
+        db.slots = None
+
+    concurrency = int(os.getenv('QUERY_CONCURRENCY') or '0')
+
+    if concurrency > 0:
+        db.slots = QuerySlots(os.getenv('QUERY_SLOT_DIR') or os.getenv('LOGDIR', '.'), concurrency)
+
+    rate = float(os.getenv('QUERY_RATE', '0'))
+
+    if rate <= 0:
+        db.throttle = None
+        return
+
+    # the create and update loads share the rate when they run at the same time
+    if os.getenv('LOAD_CONCURRENT', '0') == '1':
+        rate = rate / 2
+
+    db.throttle = Throttle(rate,
+        float(os.getenv('QUERY_RATE_MIN', '10')),
+        float(os.getenv('QUERY_RATE_STEP', '10')),
+        int(os.getenv('QUERY_BURST', '10')),
+        float(os.getenv('QUERY_LATENCY_MS', '100')) / 1000)
+
+# Purpose: sets the file slow statements are written to
+# Returns: nothing
+# Assumes: configure() has been called
+# Effects: nothing
+# Throws: nothing
+def logTo(
+    diagFile	# diagnostics file descriptor
+    ):
+
+    if db.timing is not None:
+        db.timing.out = diagFile
+
+# Purpose: reports the timing, the throttle and the cache
+# Returns: nothing
+# Assumes: nothing
+# Effects: writes to the diagnostics file
+# Throws: nothing
+def report(
+    diagFile	# diagnostics file descriptor
+    ):
+
+    timing = db.timing
+    if timing is not None:
+        diagFile.write('\nQuery timing: %d statements, %.1f s, %d slow (>= %.0f ms)\n' \
+            % (timing.statements, timing.total, timing.slow, timing.threshold * 1000))
+
+        shapes = sorted(timing.shapes.items(), key = lambda s: -s[1][1])
+        for q, counts in shapes[:maxShapes]:
+            diagFile.write('    %6d x %8.1f ms (slowest %7.1f ms)  %s\n' \
+                % (counts[0], counts[1] * 1000, counts[2] * 1000, q[:160]))
+
+    cache = db.cache
+    if cache is not None:
+        diagFile.write('\nQuery cache: %d hits (round-trips saved), %d misses, %d evictions, %d invalidations\n' \
+            % (cache.hits, cache.misses, cache.entries.evictions, cache.invalidations))
+
+        # lookups that missed the most still cost one round-trip per row
+        shapes = sorted(cache.shapes.items(), key = lambda s: -s[1][1])
+        for q, counts in shapes[:maxShapes]:
+            diagFile.write('    %6d hits %6d misses  %s\n' % (counts[0], counts[1], q[:160]))
+
+    slots = db.slots
+    if slots is not None:
+        diagFile.write('\nQuery slots: %d queries, %d waited for one of %d slots, %.1f s waiting\n' \
+            % (slots.queries, slots.waits, len(slots.fds), slots.waited))
+
+    throttle = db.throttle
+    if throttle is None:
+        return
+
+    average = 0.0
+    if throttle.average is not None:
+        average = throttle.average * 1000
+
+    diagFile.write('\nQuery throttle: %d queries, %.1f s waiting, %d backoffs, ' \
+        'rate %.0f/s (lowest %.0f/s, limit %.0f/s), latency %.1f ms\n' \
+        % (throttle.queries, throttle.waited, throttle.backoffs,
+           throttle.rate, throttle.lowestRate, throttle.maxRate, average))
@@ -0,0 +1,219 @@
+#
+# Program: errorlib.py
+#
+# Purpose:
+#
+#	Error collector of the strain create and update loads
+#
+#	Errors and warnings are grouped by cause (category + offending value)
+#	and written once, at the end of the run:
+#
+#	<error file>		ERROR_REPORT=row (default): the per-row lines,
+#				as the loads have always written them
+#				ERROR_REPORT=summary: one line per cause with
+#				its row count and row ranges, e.g.
+#				    Invalid User: bad  (25 rows: 2-26)
+#	<error file>.tsv	row, severity, category, value, message
+#	<error file>.json	{"rows": {row: [errors]}, "groups": [...]}
+#
+#	so in summary mode a bad file gives a report proportional to its
+#	distinct problems, and the QC scripts can look up a row
+#	(curatorstrainload errors).
+#
+# Environment:
+#
+#	ERROR_REPORT		row (default) or summary ("full" = row)
+#
+
+import os
+import json
+
+reports = ('row', 'summary')
+
+maxRanges = 10		# row ranges shown per cause in the summary
+maxMessage = 200	# characters of a message kept in the index (some echo the whole row)
+
+# Purpose: error report format from the environment
+# Returns: 'row' or 'summary'
+# Assumes: nothing
+# Effects: nothing
+# Throws: ValueError if ERROR_REPORT is not row or summary
+def reportFormat():
+
+    report = os.getenv('ERROR_REPORT', 'row')
+    if report == '' or report == 'full':
+        report = 'row'
+    if report not in reports:
+        raise ValueError('ERROR_REPORT must be row or summary: %s' % (report))
+
+    return report
+
+# Purpose: row ranges of a sorted list of rows
+# Returns: string, e.g. '2-26, 30, 41-43'
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def rowRanges(
+    rows,		# sorted row numbers (list)
+    limit = maxRanges	# number of ranges shown (integer; 0 = all)
+    ):
+
+    ranges = []
+    start = end = rows[0]
+
+    for row in rows[1:]:
+        if row <= end + 1:
+            end = row
+            continue
+        ranges.append((start, end))
+        start = end = row
+    ranges.append((start, end))
+
+    text = [str(s) if s == e else '%d-%d' % (s, e) for s, e in ranges]
+    if limit > 0 and len(text) > limit:
+        text = text[:limit] + ['... (%d more)' % (len(text) - limit)]
+
+    return ', '.join(text)
+
+#
+# ErrorCollector
+#
+class ErrorCollector:
+
+    def __init__(
+        self,
+        report = 'row'	# 'row' or 'summary'
+        ):
+
+        self.report = report
+        self.entries = []	# (row, severity, category, value, message)
+        self.groups = {}	# (severity, category, value) -> rows
+
+    # Purpose: records an error or warning
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: in 'row' mode the message is written to errorFile at once
+    # Throws: nothing
+    def add(
+        self,
+        errorFile,	# error file descriptor
+        row,		# input row (integer)
+        severity,	# 'error' or 'warning'
+        category,	# e.g. 'Invalid User' (string)
+        value,		# offending value; None = the category is the cause
+        message		# per-row error file line (string)
+        ):
+
+        if value is None:
+            value = ''
+
+        self.entries.append((row, severity, category, value, message.rstrip('\n')[:maxMessage]))
+        self.groups.setdefault((severity, category, value), []).append(row)
+
+        if self.report == 'row':
+            errorFile.write(message)
+
+    # Purpose: writes the summary (ERROR_REPORT=summary)
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: writes one line per cause to errorFile, errors first
+    # Throws: nothing
+    def writeSummary(
+        self,
+        errorFile	# error file descriptor
+        ):
+
+        if self.report != 'summary' or len(self.groups) == 0:
+            return
+
+        for severity, title in (('error', 'Errors'), ('warning', 'Warnings')):
+
+            keys = sorted([k for k in self.groups if k[0] == severity], key = lambda k: self.groups[k][0])
+            if len(keys) == 0:
+                continue
+
+            errorFile.write('%s (%d rows, %d distinct):\n\n' \
+                % (title, sum([len(self.groups[k]) for k in keys]), len(keys)))
+
+            for k in keys:
+                rows = sorted(set(self.groups[k]))
+                cause = k[1]
+                if k[2] != '':
+                    cause = '%s: %s' % (k[1], k[2])
+                errorFile.write('    %s  (%d row%s: %s)\n' \
+                    % (cause, len(rows), '' if len(rows) == 1 else 's', rowRanges(rows)))
+
+            errorFile.write('\n')
+
+    # Purpose: writes <errorFileName>.tsv and <errorFileName>.json
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: creates/overwrites the index files
+    # Throws: IOError
+    def writeIndex(
+        self,
+        errorFileName,		# error file name (string)
+        inputFileName,		# input file name (string)
+        stoppedAt = None	# row where validation stopped (error budget)
+        ):
+
+        with open(errorFileName + '.tsv', 'w') as f:
+            f.write('row\tseverity\tcategory\tvalue\tmessage\n')
+            for row, severity, category, value, message in self.entries:
+                f.write('%d\t%s\t%s\t%s\t%s\n' % (row, severity, category,
+                    value.replace('\t', ' '), message.replace('\t', ' ')))
+
+        rows = {}
+        for row, severity, category, value, message in self.entries:
+            rows.setdefault(str(row), []).append(
+                {'severity' : severity, 'category' : category, 'value' : value, 'message' : message})
+
+        groups = []
+        for (severity, category, value), r in self.groups.items():
+            r = sorted(set(r))
+            groups.append({'severity' : severity, 'category' : category, 'value' : value,
+                'count' : len(r), 'rows' : rowRanges(r, 0)})
+
+        with open(errorFileName + '.json', 'w') as f:
+            json.dump({'input' : inputFileName, 'stoppedAt' : stoppedAt,
+                'groups' : groups, 'rows' : rows}, f, indent = 1)
+
+# Purpose: finds the error index of an input or error file
+# Returns: <file>.error.tsv (preview) or <file>.tsv (an error file)
+# Assumes: nothing
+# Effects: nothing
+# Throws: IOError if there is no index
+def indexFileName(
+    fileName	# input file or error file (string)
+    ):
+
+    for name in (fileName + '.error.tsv', fileName + '.tsv', fileName):
+        if name.endswith('.tsv') and os.path.isfile(name):
+            return name
+
+    raise IOError('No error index for %s' % (fileName))
+
+# Purpose: looks up the error index of a file (curatorstrainload errors)
+# Returns: list of (row, severity, category, value, message)
+# Assumes: the index was written by ErrorCollector.writeIndex()
+# Effects: nothing
+# Throws: IOError if there is no index
+def query(
+    indexFileName,	# <error file>.tsv (string)
+    row = None,		# only this row (integer)
+    category = None	# only this category (string)
+    ):
+
+    results = []
+
+    with open(indexFileName, 'r') as f:
+        f.readline()
+        for line in f:
+            tokens = line.rstrip('\n').split('\t')
+            if row is not None and int(tokens[0]) != row:
+                continue
+            if category is not None and tokens[2] != category:
+                continue
+            results.append((int(tokens[0]), tokens[1], tokens[2], tokens[3], tokens[4]))
+
+    return results
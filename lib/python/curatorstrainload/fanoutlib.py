@@ -0,0 +1,224 @@
+#
+# Program: fanoutlib.py
+#
+# Purpose:
+#
+#	Fan-out load: one input file loaded into several databases
+#	(curatorstrainload create|update inputFile --fanout)
+#
+#	The same curator file is loaded into production MGD and into a
+#	staging/test database.  Instead of running the jobstream once per
+#	database, the load reads the input file once (compresslib.preload)
+#	and forks one process per FANOUT_TARGETS entry; the processes run at
+#	the same time, each with:
+#
+#	- its own database connection: the rows are validated against that
+#	  database (vocabularies, users, existing strains)
+#	- its own keys (setPrimaryKeys against that database's sequences)
+#	- its own bcp files (OUTPUTDIR/<target>) and diagnostics/error files
+#	  (LOG_DIAG and LOG_ERROR with .<target> before the suffix)
+#	- its own status: a target that fails (bad rows for that database,
+#	  a lost connection, a failed bcp) does not stop or roll back the
+#	  others
+#
+#	The status of each target is written to stdout when the load ends;
+#	the exit status is 0 if every target's load exited 0.
+#
+#	The bcp rows are written once per target: their keys (and the keys
+#	of the users and terms they refer to) are those of the target.
+#
+# Environment:
+#
+#	FANOUT_TARGETS		space-separated name=server:database, e.g.
+#				"mgd=${PG_DBSERVER}:${PG_DBNAME} test=testdb:mgd_test"
+#				(passwords from the user's pgpass file)
+#	OUTPUTDIR, LOG_DIAG, LOG_ERROR	see straincreate.config/strainupdate.config
+#
+
+import sys
+import os
+import json
+import time
+import traceback
+from . import compresslib
+
+# Purpose: targets of a FANOUT_TARGETS value
+# Returns: list of (name, server, database)
+# Assumes: nothing
+# Effects: nothing
+# Throws: ValueError if an entry is not name=server:database or a name is repeated
+def parseTargets(
+    spec	# FANOUT_TARGETS (string)
+    ):
+
+    targets = []
+    names = set()
+
+    for entry in spec.split():
+        name, sep, location = entry.partition('=')
+        server, sep2, database = location.partition(':')
+        if sep == '' or sep2 == '' or name == '' or server == '' or database == '' \
+           or os.path.basename(name) != name:
+            raise ValueError('FANOUT_TARGETS entry must be name=server:database: %s' % (entry))
+        if name in names:
+            raise ValueError('FANOUT_TARGETS has %s twice' % (name))
+        names.add(name)
+        targets.append((name, server, database))
+
+    return targets
+
+# Purpose: log file name of a target
+# Returns: fileName with .<target> before its suffix
+#	(curatorstrainload.diag.log -> curatorstrainload.diag.<target>.log)
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def targetFileName(
+    fileName,	# LOG_DIAG or LOG_ERROR (string)
+    name	# target name (string)
+    ):
+
+    root, suffix = os.path.splitext(fileName)
+    return '%s.%s%s' % (root, name, suffix)
+
+# Purpose: runs the load of one target (in its own process)
+# Returns: status (dictionary)
+# Assumes: the process has no db connection yet
+# Effects: connects to the target; loads the file into it
+# Throws: nothing
+def runTarget(
+    target,		# (name, server, database)
+    loadName,		# 'create' or 'update' (string)
+    inputFileName,	# input file (string)
+    isProfiling,	# 1 = --profile
+    maxErrors,		# --max-errors; None = ERROR_BUDGET
+    maxCategoryErrors,	# --max-errors-per-category; None = ERROR_BUDGET_CATEGORY
+    isStaging		# 1 = --staging; None = VALIDATE_MODE
+    ):
+
+    from . import cli
+    from . import profilelib
+    from .dblib import db
+
+    name, server, database = target
+
+    outputDir = os.path.join(os.environ['OUTPUTDIR'], name)
+    os.environ['OUTPUTDIR'] = outputDir
+    os.environ['PG_DBSERVER'] = server
+    os.environ['PG_DBNAME'] = database
+
+    try:
+        if not os.path.isdir(outputDir):
+            os.makedirs(outputDir)
+
+        db.set_sqlServer(server)
+        db.set_sqlDatabase(database)
+
+        profilelib.configure(isProfiling)
+
+        loadClass = cli.loadClass(loadName)
+        curatorLoad = loadClass(inputFileName, 'load',
+            targetFileName(os.environ['LOG_DIAG'], name),
+            targetFileName(os.environ['LOG_ERROR'], name))
+        curatorLoad.loadName = '%s.%s' % (loadClass.loadName, name)
+        curatorLoad.maxErrors = maxErrors
+        curatorLoad.maxCategoryErrors = maxCategoryErrors
+        curatorLoad.isStaging = isStaging
+
+        status = curatorLoad.run()
+    except Exception as e:
+        traceback.print_exc()
+        return {'status' : 1, 'fatalErrors' : 0, 'message' : str(e)}
+
+    return {'status' : status, 'fatalErrors' : curatorLoad.hasFatalError, 'message' : ''}
+
+# Purpose: loads an input file into every FANOUT_TARGETS database at the same time
+# Returns: exit status: 0 if every target's load exited 0, else 1
+# Assumes: the environment is set by straincreate.config/strainupdate.config
+# Effects: forks one process per target; writes the status of each target to out
+# Throws: nothing
+def run(
+    loadName,		# 'create' or 'update' (string)
+    inputFileName,	# input file (string)
+    isProfiling = 0,	# 1 = --profile
+    maxErrors = None,		# --max-errors; None = ERROR_BUDGET
+    maxCategoryErrors = None,	# --max-errors-per-category; None = ERROR_BUDGET_CATEGORY
+    isStaging = None,		# 1 = --staging; None = VALIDATE_MODE
+    out = sys.stdout		# output file descriptor
+    ):
+
+    try:
+        targets = parseTargets(os.getenv('FANOUT_TARGETS', ''))
+    except ValueError as e:
+        out.write('fan-out: %s\n' % (e))
+        return 1
+
+    if len(targets) == 0:
+        out.write('fan-out: FANOUT_TARGETS is not set\n')
+        return 1
+
+    # the one read of the input file; the processes inherit it
+    try:
+        compresslib.preload(inputFileName)
+    except (OSError, IOError) as e:
+        out.write('fan-out: could not read %s: %s\n' % (inputFileName, e))
+        return 1
+
+    startTime = time.time()
+    out.write('fan-out: %s %s into %s\n' % (loadName, inputFileName,
+        ', '.join(['%s (%s:%s)' % t for t in targets])))
+    out.flush()
+    sys.stderr.flush()
+
+    children = {}	# pid -> (target, read end of its status pipe)
+
+    for target in targets:
+        r, w = os.pipe()
+        pid = os.fork()
+
+        if pid == 0:
+            os.close(r)
+            result = {'status' : 1, 'fatalErrors' : 0, 'message' : 'no status'}
+            try:
+                result = runTarget(target, loadName, inputFileName,
+                    isProfiling, maxErrors, maxCategoryErrors, isStaging)
+            finally:
+                with os.fdopen(w, 'w') as f:
+                    f.write(json.dumps(result))
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(0)
+
+        os.close(w)
+        children[pid] = (target, r)
+
+    exitStatus = 0
+
+    while len(children) > 0:
+        pid, waitStatus = os.wait()
+        if pid not in children:
+            continue
+        target, r = children.pop(pid)
+
+        with os.fdopen(r, 'r') as f:
+            data = f.read()
+        try:
+            result = json.loads(data)
+        except ValueError:
+            result = {'status' : 1, 'fatalErrors' : 0, 'message' : 'died (wait status %d)' % (waitStatus)}
+
+        name, server, database = target
+
+        if result['status'] != 0:
+            state = 'failed: status %s %s' % (result['status'], result['message'])
+            exitStatus = 1
+        elif result['fatalErrors'] > 0:
+            state = 'not loaded: %d fatal error(s)' % (result['fatalErrors'])
+        else:
+            state = 'loaded'
+
+        out.write('fan-out: %s (%s:%s): %s, %.1f s; see %s\n' % (name, server, database,
+            state.strip(), time.time() - startTime, targetFileName(os.environ['LOG_ERROR'], name)))
+        out.flush()
+
+    return exitStatus
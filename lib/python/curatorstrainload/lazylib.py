@@ -0,0 +1,50 @@
+#
+# Program: lazylib.py
+#
+# Purpose:
+#
+#	Lazy imports of the MGI python libraries (db, mgi_utils, loadlib,
+#	accessionlib).
+#
+#	Importing db reads the MGI configuration and sets up the database
+#	driver, which the CLI does not need to print usage, and other tools
+#	do not want at import time.  The modules of this package use
+#
+#		from .lazylib import mgi_utils
+#
+#	and the real module is imported on first attribute access.  db is
+#	used through dblib.py (from .dblib import db), which throttles its
+#	queries.
+#
+
+import importlib
+
+#
+# LazyModule
+#
+# Stand-in for a module that is imported the first time one of its
+# attributes is used.
+#
+class LazyModule:
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+
+        if self._module is None:
+            self.__dict__['_module'] = importlib.import_module(self._name)
+
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+db = LazyModule('db')
+mgi_utils = LazyModule('mgi_utils')
+loadlib = LazyModule('loadlib')
+accessionlib = LazyModule('accessionlib')
@@ -0,0 +1,246 @@
+#
+# Program: memorylib.py
+#
+# Purpose:
+#
+#	Memory-budget helpers for the strain create and update loads
+#
+#	LRUCache	bounded cache with least-recently-used eviction
+#			(dblib.py's query cache)
+#	SpillBuffer	text accumulator that spills to a temp file when over budget
+#	reportPhase	writes current/peak RSS (and tracemalloc top allocators)
+#			for a load phase to the diagnostics file
+#
+# Environment (see straincreate.config/strainupdate.config):
+#
+#	MEMORY_BUDGET_MB	RSS budget in MB; 0 = no budget (default)
+#	MEMORY_TRACE		1 = report tracemalloc top allocators per phase
+#	MEMORY_TRACE_TOP	number of allocators reported per phase
+#
+
+import os
+import resource
+import tempfile
+import tracemalloc
+from collections import OrderedDict
+
+budgetBytes = 0		# MEMORY_BUDGET_MB in bytes (0 = no budget)
+isTracing = 0		# MEMORY_TRACE
+traceTop = 10		# MEMORY_TRACE_TOP
+
+lastSnapshot = None	# tracemalloc snapshot taken at the end of the previous phase
+
+# Purpose: reads the memory configuration from the environment
+# Returns: nothing
+# Assumes: nothing
+# Effects: sets the module configuration; starts tracemalloc if MEMORY_TRACE = 1
+# Throws: nothing
+def configure():
+    global budgetBytes, isTracing, traceTop, lastSnapshot
+
+    budgetBytes = int(os.getenv('MEMORY_BUDGET_MB', '0')) * 1024 * 1024
+    isTracing = int(os.getenv('MEMORY_TRACE', '0'))
+    traceTop = int(os.getenv('MEMORY_TRACE_TOP', '10'))
+
+    if isTracing == 1 and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        lastSnapshot = tracemalloc.take_snapshot()
+
+# Purpose: current resident set size of this process
+# Returns: RSS in bytes
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def currentRSS():
+
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except:
+        return peakRSS()
+
+# Purpose: peak resident set size of this process
+# Returns: peak RSS in bytes
+# Assumes: Linux semantics (ru_maxrss in KB)
+# Effects: nothing
+# Throws: nothing
+def peakRSS():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+# Purpose: checks the process against the memory budget
+# Returns: 1 if a budget is set and the current RSS exceeds it, else 0
+# Assumes: configure() has been called
+# Effects: nothing
+# Throws: nothing
+def overBudget():
+
+    if budgetBytes > 0 and currentRSS() > budgetBytes:
+        return 1
+
+    return 0
+
+# Purpose: writes the memory usage of a load phase to the diagnostics file
+# Returns: nothing
+# Assumes: configure() has been called
+# Effects: writes to diagFile; resets the tracemalloc peak
+# Throws: nothing
+def reportPhase(
+    diagFile,	# diagnostics file descriptor
+    phase	# phase name (string)
+    ):
+
+    global lastSnapshot
+
+    if budgetBytes == 0 and isTracing == 0:
+        return
+
+    diagFile.write('Memory (%s): RSS %.1f MB, peak RSS %.1f MB, budget %s\n' \
+        % (phase, currentRSS() / 1048576.0, peakRSS() / 1048576.0,
+           '%d MB' % (budgetBytes / 1048576) if budgetBytes > 0 else 'none'))
+
+    if isTracing == 0:
+        return
+
+    current, peak = tracemalloc.get_traced_memory()
+    diagFile.write('Memory (%s): traced %.1f MB, traced peak %.1f MB\n' \
+        % (phase, current / 1048576.0, peak / 1048576.0))
+
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+
+    if lastSnapshot is not None:
+        stats = snapshot.compare_to(lastSnapshot, 'lineno')
+    else:
+        stats = snapshot.statistics('lineno')
+
+    for s in stats[:traceTop]:
+        diagFile.write('Memory (%s):   %s\n' % (phase, s))
+
+    lastSnapshot = snapshot
+    tracemalloc.reset_peak()
+
+#
+# LRUCache
+#
+# A dictionary that keeps at most maxSize entries, evicting the least
+# recently used entry first.  maxSize = 0 means unbounded (a plain dictionary).
+# Only use it for caches of database lookups, where a miss simply means
+# asking the database again; complete vocabularies must not be capped.
+#
+class LRUCache(OrderedDict):
+
+    def __init__(self, maxSize = 0):
+        OrderedDict.__init__(self)
+        self.maxSize = maxSize
+        self.evictions = 0
+
+    def __getitem__(self, key):
+        value = OrderedDict.__getitem__(self, key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        OrderedDict.__setitem__(self, key, value)
+        self.move_to_end(key)
+        if self.maxSize > 0 and len(self) > self.maxSize:
+            self.popitem(last = False)
+            self.evictions += 1
+
+#
+# SpillBuffer
+#
+# Accumulates text in memory (like a growing string) until either the buffer
+# grows past spillSize or the process goes over the memory budget; from then on
+# the text lives in an anonymous temp file.
+#
+# Without a memory budget the buffer never spills, and batches() returns the
+# whole text in one piece.
+#
+class SpillBuffer:
+
+    def __init__(self, spillSize = None):
+
+        if spillSize is None:
+            spillSize = budgetBytes // 4
+
+        self.spillSize = spillSize
+        self.size = 0
+        self.chunks = []
+        self.tempFile = None
+        self.writes = 0
+
+    def __len__(self):
+        return self.size
+
+    def write(self, text):
+
+        self.size += len(text)
+        self.writes += 1
+
+        if self.tempFile is not None:
+            self.tempFile.write(text)
+            return
+
+        self.chunks.append(text)
+
+        # checking the RSS costs a read of /proc; do it every 256 writes
+        if self.spillSize > 0 and \
+           (self.size > self.spillSize or (self.writes % 256 == 0 and overBudget())):
+            self.spill()
+
+    def spill(self):
+
+        if self.tempFile is not None:
+            return
+
+        self.tempFile = tempfile.TemporaryFile('w+')
+        self.tempFile.writelines(self.chunks)
+        self.chunks = []
+
+    def isSpilled(self):
+        return self.tempFile is not None
+
+    def lines(self):
+
+        if self.tempFile is None:
+            for line in ''.join(self.chunks).splitlines(True):
+                yield line
+            return
+
+        self.tempFile.flush()
+        self.tempFile.seek(0)
+        for line in self.tempFile:
+            yield line
+
+    def batches(self):
+        # whole lines, each batch at most spillSize characters once spilled
+
+        if self.tempFile is None:
+            if self.size > 0:
+                yield ''.join(self.chunks)
+            return
+
+        batch = []
+        batchSize = 0
+        for line in self.lines():
+            batch.append(line)
+            batchSize += len(line)
+            if batchSize >= self.spillSize:
+                yield ''.join(batch)
+                batch = []
+                batchSize = 0
+
+        if len(batch) > 0:
+            yield ''.join(batch)
+
+    def close(self):
+
+        if self.tempFile is not None:
+            self.tempFile.close()
+            self.tempFile = None
+
+        self.chunks = []
@@ -0,0 +1,380 @@
+#
+# Program: namelib.py
+#
+# Purpose:
+#
+#	Near-duplicate strain name index (straincreate preview; NAME_CHECK=1)
+#
+#	verifyStrain only finds an existing strain with exactly the same
+#	name.  This index also finds names that differ in case, spacing or
+#	<> superscript notation, or by a few characters:
+#
+#	normalize()	lower case; spaces and <> removed
+#			("B6.Cg-Foo<tm1>" and "b6.cg-foo tm1" are the same)
+#	trigrams	a name is similar to an existing strain name or strain
+#			synonym if the Jaccard similarity of their trigram
+#			sets is at least NAME_SIMILARITY
+#
+#	Lookups use prefix filtering: only the rarest trigrams of a new name
+#	are looked up in the inverted index, and the candidates they give are
+#	checked exactly (after a length filter), so a row takes a few
+#	milliseconds against all of PRB_Strain.
+#
+#	The index is saved in NAME_INDEX_DIR as JSON (the names only; the
+#	trigram postings are rebuilt when it is read, and a file that is not
+#	a valid index is ignored) and refreshed incrementally
+#	(strains and synonyms modified since the last refresh).  When the
+#	number of strains or synonyms no longer matches the database, their
+#	keys are read and the deleted ones dropped.  It is rebuilt after
+#	NAME_INDEX_MAX_AGE days.  The file is rewritten only when a refresh
+#	changed the index.  "curatorstrainload nameindex" refreshes it ahead
+#	of time.
+#
+#	load() keeps the index in memory (indexes), so the watch daemon and
+#	the QC server workers read the file once and only refresh it for
+#	each load.
+#
+# Environment:
+#
+#	NAME_CHECK		1 = warn about near-duplicate names in preview mode
+#	NAME_INDEX_DIR		directory of the saved index (default: LOGDIR)
+#	NAME_SIMILARITY		minimum trigram similarity (default 0.8)
+#	NAME_INDEX_MAX_AGE	days before the index is rebuilt (default 7)
+#
+
+import os
+import re
+import math
+import time
+import json
+import tempfile
+from . import dblib
+
+version = 3		# format of the saved index
+indexFileName = 'strainname.index.json'
+
+indexes = {}		# saved index file name -> NameIndex loaded by this process
+
+spaces = re.compile(r'[\s<>]+')
+
+# Purpose: normalized form of a strain name
+# Returns: string
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def normalize(
+    name	# strain name (string)
+    ):
+
+    return spaces.sub('', name.lower())
+
+# Purpose: trigrams of a normalized name
+# Returns: set of strings; names shorter than 3 are padded
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def trigrams(
+    norm	# normalized name (string)
+    ):
+
+    padded = '^' + norm + '$'
+    return set([padded[i:i + 3] for i in range(len(padded) - 2)])
+
+#
+# NameIndex
+#
+# entries: entry id -> (source, key, name, MGI ID, normalized name,
+#	number of trigrams), or None
+#	if the strain/synonym was renamed (its new name is a new entry)
+# where: (source, key) -> entry id
+# postings: trigram -> set of entry ids
+#
+class NameIndex:
+
+    def __init__(self):
+
+        self.version = version
+        self.built = 0			# time of the full build
+        self.refreshed = 0		# time of the last refresh
+        self.lastModified = None	# newest modification_date seen (string)
+        self.entries = []
+        self.where = {}
+        self.postings = {}
+
+    # Purpose: adds or replaces the name of a strain or synonym
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: updates entries, where and postings
+    # Throws: nothing
+    def add(
+        self,
+        source,		# 'strain' or 'synonym'
+        key,		# _Strain_key or _Synonym_key (integer)
+        name,		# name (string)
+        accID		# MGI ID of the strain (string)
+        ):
+
+        if (source, key) in self.where:
+            old = self.where[(source, key)]
+            for t in trigrams(self.entries[old][4]):
+                self.postings[t].discard(old)
+            self.entries[old] = None
+
+        norm = normalize(name)
+        grams = trigrams(norm)
+        entry = len(self.entries)
+        self.entries.append((source, key, name, accID, norm, len(grams)))
+        self.where[(source, key)] = entry
+
+        for t in grams:
+            self.postings.setdefault(t, set()).add(entry)
+
+    # Purpose: loads strains and synonyms modified after lastModified
+    # Returns: number of names loaded
+    # Assumes: db connection
+    # Effects: adds the names; sets lastModified
+    # Throws: nothing
+    def refresh(self):
+
+        since = ''
+        if self.lastModified is not None:
+            since = "and s.modification_date > '%s'" % (self.lastModified)
+
+        # the names are read a page at a time (see dblib.pages())
+        queries = (
+            ('strain', '''select s._Strain_key as key, s.strain as name, a.accID,
+                to_char(s.modification_date, 'YYYY-MM-DD HH24:MI:SS.US') as modified
+            from PRB_Strain s
+                left outer join ACC_Accession a on (a._Object_key = s._Strain_key
+                    and a._MGIType_key = 10 and a._LogicalDB_key = 1 and a.preferred = 1)
+            where s._Strain_key > 0 %s and {page}
+            ''' % (since), 's._Strain_key'),
+            ('synonym', '''select s._Synonym_key as key, s.synonym as name, a.accID,
+                to_char(s.modification_date, 'YYYY-MM-DD HH24:MI:SS.US') as modified
+            from MGI_Synonym s
+                left outer join ACC_Accession a on (a._Object_key = s._Object_key
+                    and a._MGIType_key = 10 and a._LogicalDB_key = 1 and a.preferred = 1)
+            where s._MGIType_key = 10 %s and {page}
+            ''' % (since), 's._Synonym_key'),
+            )
+
+        count = 0
+        lastModified = self.lastModified
+
+        for source, cmd, keyColumn in queries:
+            for r in dblib.pages(cmd, keyColumn, 'key'):
+                self.add(source, r['key'], r['name'], r['accID'])
+                if lastModified is None or r['modified'] > lastModified:
+                    lastModified = r['modified']
+                count += 1
+
+        self.lastModified = lastModified
+        self.refreshed = time.time()
+
+        return count
+
+    # Purpose: removes the name of a strain or synonym
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: updates entries, where and postings
+    # Throws: nothing
+    def remove(
+        self,
+        source,		# 'strain' or 'synonym'
+        key		# _Strain_key or _Synonym_key (integer)
+        ):
+
+        old = self.where.pop((source, key))
+        for t in trigrams(self.entries[old][4]):
+            self.postings[t].discard(old)
+        self.entries[old] = None
+
+    # Purpose: drops the strains and synonyms deleted from the database
+    # Returns: number of names removed
+    # Assumes: db connection; refresh() has been called
+    # Effects: reads the keys of a source only if its count differs
+    # Throws: nothing
+    def prune(self):
+
+        queries = (
+            ('strain', 'PRB_Strain s', 's._Strain_key', 's._Strain_key > 0'),
+            ('synonym', 'MGI_Synonym s', 's._Synonym_key', 's._MGIType_key = 10'),
+            )
+
+        removed = 0
+
+        for source, table, keyColumn, condition in queries:
+            keys = set([k for s, k in self.where if s == source])
+            results = dblib.db.sql('select count(*) as n from %s where %s' % (table, condition), 'auto')
+            if results[0]['n'] == len(keys):
+                continue
+
+            for r in dblib.pages('select %s as key from %s where %s and {page}'                     % (keyColumn, table, condition), keyColumn, 'key'):
+                keys.discard(r['key'])
+
+            for key in keys:
+                self.remove(source, key)
+                removed += 1
+
+        return removed
+
+    # Purpose: existing names similar to a new name
+    # Returns: list of (similarity, source, name, MGI ID), most similar first
+    # Assumes: nothing
+    # Effects: nothing
+    # Throws: nothing
+    def similar(
+        self,
+        name,			# new strain name (string)
+        threshold = 0.8,	# minimum Jaccard similarity (float)
+        limit = 3		# most similar names returned (integer)
+        ):
+
+        norm = normalize(name)
+        grams = trigrams(norm)
+
+        # prefix filter: a name with similarity >= threshold shares at
+        # least one of the (n - ceil(threshold * n) + 1) rarest trigrams
+        rarest = sorted(grams, key = lambda t: len(self.postings.get(t, ())))
+        prefix = rarest[:len(grams) - int(math.ceil(threshold * len(grams))) + 1]
+
+        candidates = set()
+        for t in prefix:
+            candidates.update(self.postings.get(t, ()))
+
+        # length filter: a similar name has between threshold * n and n / threshold trigrams
+        minSize = threshold * len(grams)
+        maxSize = len(grams) / threshold
+
+        matches = []
+        for c in candidates:
+            entry = self.entries[c]
+            if entry is None or entry[5] < minSize or entry[5] > maxSize:
+                continue
+            # an existing strain of the same name is verifyStrain's error; a synonym of it is a match
+            if entry[0] == 'strain' and entry[2] == name:
+                continue
+            other = trigrams(entry[4])
+            similarity = len(grams & other) / len(grams | other)
+            if similarity >= threshold:
+                matches.append((similarity, entry[0], entry[2], entry[3]))
+
+        matches.sort(key = lambda m: (-m[0], m[2]))
+
+        return matches[:limit]
+
+# Purpose: writes an index as JSON
+# Returns: nothing
+# Assumes: nothing
+# Effects: writes to f
+# Throws: IOError
+def save(
+    index,	# NameIndex
+    f		# output file descriptor (text)
+    ):
+
+    names = [list(e[:4]) for e in index.entries if e is not None]
+
+    json.dump({'version' : version, 'built' : index.built, 'refreshed' : index.refreshed,
+        'lastModified' : index.lastModified, 'names' : names}, f)
+
+# Purpose: reads an index written by save()
+# Returns: NameIndex
+# Assumes: nothing
+# Effects: nothing
+# Throws: ValueError if the file is not an index of this version
+def read(
+    f		# input file descriptor (text)
+    ):
+
+    data = json.load(f)
+
+    if not isinstance(data, dict) or data.get('version') != version:
+        raise ValueError('not a name index of version %d' % (version))
+
+    index = NameIndex()
+    index.built = float(data['built'])
+    index.refreshed = float(data['refreshed'])
+    index.lastModified = data['lastModified']
+    if index.lastModified is not None and not isinstance(index.lastModified, str):
+        raise ValueError('invalid lastModified')
+
+    for source, key, name, accID in data['names']:
+        if source not in ('strain', 'synonym') or not isinstance(key, int) or not isinstance(name, str) \
+           or not (accID is None or isinstance(accID, str)):
+            raise ValueError('invalid name entry')
+        index.add(source, key, name, accID)
+
+    return index
+
+# Purpose: the index, refreshed (or rebuilt) from the database
+# Returns: NameIndex
+# Assumes: db connection
+# Effects: reads the saved index the first time (see indexes);
+#	saves the index to NAME_INDEX_DIR if it changed and it can
+# Throws: nothing
+def load(
+    rebuild = 0		# 1 = rebuild from scratch
+    ):
+
+    indexDir = os.getenv('NAME_INDEX_DIR', os.getenv('LOGDIR', '.'))
+    maxAge = float(os.getenv('NAME_INDEX_MAX_AGE', '7')) * 86400
+    fileName = os.path.join(indexDir, indexFileName)
+
+    index = None
+
+    if rebuild == 0:
+        index = indexes.get(fileName)
+        if index is None:
+            try:
+                with open(fileName, 'r') as f:
+                    index = read(f)
+            except Exception:
+                index = None
+        if index is not None and time.time() - index.built > maxAge:
+            index = None
+
+    changed = 0
+    if index is None:
+        index = NameIndex()
+        index.built = time.time()
+        changed = 1
+
+    changed += index.refresh()
+    changed += index.prune()
+    indexes[fileName] = index
+
+    if changed == 0:
+        return index
+
+    # write a new file and rename it, so a concurrent QC run never reads half an index
+    tmpName = None
+    try:
+        fd, tmpName = tempfile.mkstemp(dir = indexDir, prefix = indexFileName + '.')
+        with os.fdopen(fd, 'w') as f:
+            save(index, f)
+        os.chmod(tmpName, 0o664)
+        os.rename(tmpName, fileName)
+    except (OSError, IOError):
+        if tmpName is not None and os.path.exists(tmpName):
+            os.remove(tmpName)
+
+    return index
+
+# Purpose: refreshes the saved index (curatorstrainload nameindex)
+# Returns: exit status
+# Assumes: db connection
+# Effects: writes the index; reports it to out
+# Throws: nothing
+def update(
+    rebuild,	# 1 = rebuild from scratch
+    out		# output file descriptor
+    ):
+
+    startTime = time.time()
+    index = load(rebuild)
+
+    out.write('name index: %d names, last modified %s, %.1f s\n' \
+        % (len(index.where), index.lastModified, time.time() - startTime))
+
+    return 0
@@ -0,0 +1,212 @@
+#
+# Program: profilelib.py
+#
+# Purpose:
+#
+#	Profiling switch for the strain create and update loads
+#
+#	When enabled, the load runs under cProfile (deterministic) and a
+#	wall-clock stack sampler; at the end of the run it writes to LOGDIR:
+#
+#	<load>.<date>.pstats	cProfile statistics (python -m pstats, snakeviz)
+#	<load>.<date>.collapsed	collapsed stacks ("a;b;c count"), the input
+#				format of flamegraph.pl and speedscope
+#
+#	and a breakdown of the run time into DB calls, file I/O and Python
+#	to the diagnostics file.
+#
+#	The profiler is enabled by either:
+#		--profile on the command line (curatorstrainload --profile ...)
+#		PROFILE=1 in straincreate.config/strainupdate.config
+#
+# Environment:
+#
+#	PROFILE			1 = profile the load
+#	PROFILE_INTERVAL_MS	stack sampling interval in milliseconds
+#	LOGDIR			where the profile files are written
+#
+
+import sys
+import os
+import time
+import threading
+import cProfile
+import pstats
+
+isProfiling = 0
+interval = 0.005	# PROFILE_INTERVAL_MS in seconds
+
+profiler = None		# cProfile.Profile
+samples = {}		# collapsed stack -> sample count
+wallTime = 0.0
+pstatsFileName = ''
+collapsedFileName = ''
+
+# Purpose: reads the profiling switch from the command line and environment
+# Returns: nothing
+# Assumes: nothing
+# Effects: sets isProfiling and interval
+# Throws: nothing
+def configure(
+    isEnabled = 0	# 1 = --profile was given
+    ):
+    global isProfiling, interval
+
+    isProfiling = isEnabled
+
+    if os.getenv('PROFILE', '0') == '1':
+        isProfiling = 1
+
+    interval = int(os.getenv('PROFILE_INTERVAL_MS', '5')) / 1000.0
+
+#
+# StackSampler
+#
+# Samples the stack of one thread every interval seconds from a background
+# thread.  Unlike a signal-based sampler this also sees time spent blocked in
+# C calls that release the GIL (database round-trips, os.system of bcpin.csh).
+#
+class StackSampler(threading.Thread):
+
+    def __init__(self, threadId, interval):
+        threading.Thread.__init__(self, daemon = True)
+        self.threadId = threadId
+        self.interval = interval
+        self.stopEvent = threading.Event()
+
+    def run(self):
+
+        while not self.stopEvent.wait(self.interval):
+            frame = sys._current_frames().get(self.threadId)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            if len(stack) > 0:
+                key = ';'.join(reversed(stack))
+                samples[key] = samples.get(key, 0) + 1
+
+    def stop(self):
+        self.stopEvent.set()
+        self.join()
+
+# Purpose: runs the load, under the profilers if profiling is enabled
+# Returns: nothing
+# Assumes: configure() has been called
+# Effects: clears the samples of a previous run; writes the .pstats and
+#	.collapsed files to LOGDIR
+# Throws: whatever main() throws (including LoadExit from exit())
+def run(
+    main,	# function that runs the load
+    loadName	# name used for the profile files (string)
+    ):
+
+    global profiler, wallTime
+
+    if isProfiling == 0:
+        main()
+        return
+
+    # one run per process, except in the watch daemon and the QC server
+    samples.clear()
+
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident(), interval)
+    startTime = time.time()
+    sampler.start()
+
+    try:
+        profiler.runcall(main)
+    finally:
+        sampler.stop()
+        wallTime = time.time() - startTime
+        writeFiles(loadName)
+
+# Purpose: writes the .pstats and .collapsed files
+# Returns: nothing
+# Assumes: run() has profiled the load
+# Effects: creates files in LOGDIR (or the current directory if LOGDIR is not writable)
+# Throws: nothing
+def writeFiles(
+    loadName	# name used for the profile files (string)
+    ):
+
+    global pstatsFileName, collapsedFileName
+
+    logDir = os.getenv('LOGDIR', '.')
+    if not os.access(logDir, os.W_OK):
+        logDir = '.'
+
+    prefix = os.path.join(logDir, '%s.%s' % (loadName, time.strftime('%Y%m%d.%H%M%S')))
+    pstatsFileName = prefix + '.pstats'
+    collapsedFileName = prefix + '.collapsed'
+
+    try:
+        profiler.dump_stats(pstatsFileName)
+        with open(collapsedFileName, 'w') as f:
+            for stack in sorted(samples):
+                f.write('%s %d\n' % (stack, samples[stack]))
+    except:
+        sys.stderr.write('Could not write profile files: %s\n' % (prefix))
+
+# Purpose: classifies a cProfile function entry
+# Returns: 'db', 'file I/O' or 'python'
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def category(
+    func	# pstats function key (filename, line, name)
+    ):
+
+    fileName, lineNum, funcName = func
+
+    # db.py and the postgres driver; os.system runs bcpin.csh
+    if os.path.basename(fileName) == 'db.py' \
+       or 'psycopg' in fileName or 'psycopg' in funcName \
+       or funcName == '<built-in method posix.system>':
+        return 'db'
+
+    if fileName == '~' and ('_io.' in funcName or funcName == '<built-in method io.open>'):
+        return 'file I/O'
+
+    return 'python'
+
+# Purpose: writes the DB / file I/O / Python breakdown to the diagnostics file
+# Returns: nothing
+# Assumes: run() has profiled the load
+# Effects: writes to diagFile
+# Throws: nothing
+def report(
+    diagFile	# diagnostics file descriptor
+    ):
+
+    if isProfiling == 0 or profiler is None:
+        return
+
+    stats = pstats.Stats(profiler)
+    totals = {'db' : 0.0, 'file I/O' : 0.0, 'python' : 0.0}
+    profiled = 0.0
+
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+
+        profiled += tt
+        name = category(func)
+
+        # everything below a db call counts as db: add the cumulative time
+        # of each edge that enters the db category from outside it
+        if name == 'db':
+            for caller, edge in callers.items():
+                if category(caller) != 'db':
+                    totals['db'] += edge[3]
+        elif name == 'file I/O':
+            totals['file I/O'] += tt
+
+    totals['python'] = max(profiled - totals['db'] - totals['file I/O'], 0.0)
+
+    diagFile.write('\nProfile: wall time %.3f s, profiled %.3f s\n' % (wallTime, profiled))
+    for name in ('db', 'file I/O', 'python'):
+        diagFile.write('Profile: %-8s %10.3f s %5.1f%%\n' \
+            % (name, totals[name], 100.0 * totals[name] / profiled if profiled > 0 else 0.0))
+    diagFile.write('Profile: %s\n' % (pstatsFileName))
+    diagFile.write('Profile: %s\n' % (collapsedFileName))
@@ -0,0 +1,530 @@
+#
+# Program: qcserver.py
+#
+# Purpose:
+#
+#	QC server for runStrainCreateQC/runStrainUpdateQC
+#	(curatorstrainload qcserver; see bin/curatorstrainqcd.sh)
+#
+#	A curator fixing a file runs the QC script many times, and each run
+#	sources the configs, starts python, connects to the database and
+#	loads the vocabulary lookups before the first row is checked.  The
+#	server does all of that once and answers preview requests over a
+#	Unix socket (QC_SOCKET):
+#
+#	request		{"load": "create"|"update", "inputFile": path,
+#			 "options": [--staging, --max-errors N, ...]}
+#	response	{"status": exit status, "report": the error file}
+#			or {"fallback": reason}: the client runs the QC itself
+#
+#	The server forks QC_WORKERS workers when it starts (a dead worker is
+#	replaced).  Each worker has its own database connection and its own
+#	warm lookups (straincreate's vocabularies; with NAME_CHECK=1, the
+#	name index, read once and refreshed for each request, see namelib.py)
+#	and runs one request at a time, so requests of several curators run
+#	at the same time without sharing a connection, a transaction or the
+#	module-level settings of a load.  Before each request the worker
+#	sets its environment to that of the load's config (read with sh
+#	when the server starts, and again when the config file changes) and
+#	ends its transaction afterwards.  On SIGTERM an idle worker exits at
+#	once and a busy one after answering its request.
+#
+#	A request is only run for the owner of the input file (the client's
+#	uid from SO_PEERCRED), checked on the file the server opens (not
+#	following a symlink) and reads into memory for the load: the error and diagnostics files are written
+#	next to the input file as the server's user.  The load writes them
+#	to a private directory; each is then copied to a new file next to
+#	the input (O_EXCL, O_NOFOLLOW) and renamed over the old report, and
+#	an old report that is a symlink, not a regular file or owned by
+#	another user is refused.  Otherwise, or if the directory is not
+#	writable, the client falls back to running the QC itself.
+#
+#	The socket is mode 0660, group QC_GROUP (the curators' group).
+#
+#	request() is the client (curatorstrainload qc); it also converts
+#	DOS line ends as the QC scripts' dos2unix did.
+#
+# Environment:
+#
+#	QC_SOCKET		socket path (see curatorstrain.config)
+#	QC_GROUP		group of the socket (default: the server's group)
+#	QC_WORKERS		worker processes (default 4)
+#	QC_CACHE_TTL		seconds before a worker reloads its vocabularies (default 3600)
+#	CURATORSTRAINLOAD	install directory (straincreate.config, strainupdate.config)
+#
+
+import sys
+import os
+import stat
+import json
+import time
+import errno
+import shutil
+import socket
+import struct
+import signal
+import tempfile
+from . import cli
+from . import compresslib
+
+fallbackStatus = 75	# exit status of request() when the client must run the QC itself
+
+# report files of a preview: suffix next to the input file -> suffix of the load's error file
+reportSuffixes = (('.error', ''), ('.diagnostics', None), ('.error.tsv', '.tsv'), ('.error.json', '.json'))
+
+isStopping = 0
+
+# Purpose: writes a message to stdout (curatorstrainqcd.sh sends it to the server log)
+# Returns: nothing
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def log(
+    message	# message (string)
+    ):
+
+    sys.stdout.write('%s [%d] %s\n' % (time.strftime('%Y-%m-%d %H:%M:%S'), os.getpid(), message))
+    sys.stdout.flush()
+
+# Purpose: converts DOS line ends of an input file in place (dos2unix)
+# Returns: nothing
+# Assumes: nothing
+# Effects: rewrites the file if it has \r\n line ends; compressed files are left alone
+# Throws: nothing
+def dos2unix(
+    fileName	# input file (string)
+    ):
+
+    if fileName.endswith('.gz') or fileName.endswith('.zst'):
+        return
+
+    try:
+        with open(fileName, 'rb') as f:
+            data = f.read()
+        if b'\r\n' in data:
+            with open(fileName, 'wb') as f:
+                f.write(data.replace(b'\r\n', b'\n'))
+    except (OSError, IOError):
+        pass
+
+# Purpose: asks the QC server to preview a file (curatorstrainload qc)
+# Returns: exit status of the QC, or fallbackStatus if the server cannot run it
+# Assumes: nothing
+# Effects: writes the error report to stdout
+# Throws: nothing
+def request(
+    load,	# 'create' or 'update' (string)
+    inputFile,	# input file (string)
+    options	# QC options (list of strings)
+    ):
+
+    socketPath = os.getenv('QC_SOCKET', '')
+    if socketPath == '':
+        return fallbackStatus
+
+    inputFile = os.path.abspath(inputFile)
+    dos2unix(inputFile)
+
+    try:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.connect(socketPath)
+        s.sendall((json.dumps({'load' : load, 'inputFile' : inputFile, 'options' : options}) + '\n').encode('utf-8'))
+        s.shutdown(socket.SHUT_WR)
+
+        data = []
+        while True:
+            chunk = s.recv(65536)
+            if len(chunk) == 0:
+                break
+            data.append(chunk)
+        s.close()
+
+        response = json.loads(b''.join(data).decode('utf-8'))
+    except (OSError, IOError, ValueError):
+        return fallbackStatus
+
+    if 'fallback' in response:
+        sys.stderr.write('QC server: %s\n' % (response['fallback']))
+        return fallbackStatus
+
+    sys.stdout.write(response['report'])
+    sys.stdout.flush()
+
+    return response['status']
+
+# Purpose: checks that a report file may be replaced for a user
+# Returns: None if it may, else the reason (string)
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def checkReport(
+    dirFd,	# file descriptor of the input file's directory
+    name,	# report file name in that directory (string)
+    uid		# requesting user's uid
+    ):
+
+    try:
+        st = os.lstat(name, dir_fd = dirFd)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return None
+        return '%s: %s' % (name, e)
+
+    if stat.S_ISLNK(st.st_mode):
+        return '%s is a symlink' % (name)
+
+    if not stat.S_ISREG(st.st_mode):
+        return '%s is not a regular file' % (name)
+
+    if st.st_uid != uid and st.st_uid != os.getuid():
+        return '%s is owned by another user' % (name)
+
+    return None
+
+# Purpose: puts a report file next to the input file
+# Returns: nothing
+# Assumes: checkReport() has accepted the name
+# Effects: copies the report to a new file in the directory and renames
+#	it over the old report (never follows a symlink)
+# Throws: OSError, IOError
+def installReport(
+    dirFd,		# file descriptor of the input file's directory
+    name,		# report file name in that directory (string)
+    uid,		# requesting user's uid
+    sourceFileName	# report written by the load (string)
+    ):
+
+    reason = checkReport(dirFd, name, uid)
+    if reason is not None:
+        raise IOError(reason)
+
+    tmpName = '.%s.%d.%s' % (name, os.getpid(), os.urandom(4).hex())
+    fd = os.open(tmpName, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o644, dir_fd = dirFd)
+
+    try:
+        with os.fdopen(fd, 'wb') as f, open(sourceFileName, 'rb') as source:
+            shutil.copyfileobj(source, f)
+        os.replace(tmpName, name, src_dir_fd = dirFd, dst_dir_fd = dirFd)
+    except:
+        try:
+            os.unlink(tmpName, dir_fd = dirFd)
+        except OSError:
+            pass
+        raise
+
+#
+# Worker
+#
+# State of a worker process: the load environments and the lookups'
+# age.
+#
+class Worker:
+
+    def __init__(self, configDir):
+
+        self.configDir = configDir
+        self.configs = {}	# load -> (config file mtime, environment)
+        self.cacheTTL = int(os.getenv('QC_CACHE_TTL', '3600'))
+        self.cacheTime = time.time()
+        self.baseEnv = dict(os.environ)
+
+    # Purpose: environment of a load (re-read if its config changed)
+    # Returns: dictionary
+    # Assumes: nothing
+    # Effects: may run sh
+    # Throws: OSError
+    def environment(
+        self,
+        load	# 'create' or 'update' (string)
+        ):
+
+        configFile = os.path.join(self.configDir, cli.configNames[load])
+        mtime = os.stat(configFile).st_mtime
+
+        if load not in self.configs or self.configs[load][0] != mtime:
+            self.configs[load] = (mtime, cli.readConfig(configFile))
+
+        return self.configs[load][1]
+
+    # Purpose: runs one preview request
+    # Returns: response (dictionary)
+    # Assumes: the db connection is open
+    # Effects: writes the error/diagnostics files next to the input file
+    # Throws: nothing
+    def run(
+        self,
+        request,	# request (dictionary)
+        uid		# client's uid
+        ):
+
+        load = request.get('load')
+        inputFile = request.get('inputFile', '')
+
+        if load not in cli.configNames or not os.path.isabs(inputFile):
+            return {'fallback' : 'invalid request'}
+
+        if not os.access(os.path.dirname(inputFile), os.W_OK):
+            return {'fallback' : 'no access to %s' % (os.path.dirname(inputFile))}
+
+        try:
+            dirFd = os.open(os.path.dirname(inputFile), os.O_RDONLY | os.O_DIRECTORY)
+        except OSError as e:
+            return {'fallback' : 'cannot open %s: %s' % (os.path.dirname(inputFile), e)}
+
+        try:
+            # the owner is checked on the file that was opened, and the load
+            # reads that file (compresslib.preloaded), so the path cannot be
+            # swapped for a symlink or another file in between
+            try:
+                fd = os.open(os.path.basename(inputFile), os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK,
+                    dir_fd = dirFd)
+            except OSError as e:
+                return {'fallback' : 'cannot read %s: %s' % (inputFile, e)}
+
+            with os.fdopen(fd, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if not stat.S_ISREG(st.st_mode):
+                    return {'fallback' : '%s is not a regular file' % (inputFile)}
+                if uid != os.getuid() and uid != st.st_uid:
+                    return {'fallback' : '%s is not owned by the requesting user' % (inputFile)}
+                try:
+                    compresslib.preloadFile(inputFile, f)
+                except Exception as e:
+                    return {'fallback' : 'cannot read %s: %s' % (inputFile, e)}
+
+            reportDir = tempfile.mkdtemp(prefix = 'curatorstrainqc.')
+
+            try:
+                return self.preview(request, uid, dirFd, reportDir)
+            finally:
+                shutil.rmtree(reportDir, ignore_errors = True)
+        finally:
+            compresslib.preloaded.pop(inputFile, None)
+            os.close(dirFd)
+
+    # Purpose: runs the load of a preview request and installs its reports
+    # Returns: response (dictionary)
+    # Assumes: run() has checked the request
+    # Effects: writes the error/diagnostics files next to the input file
+    # Throws: nothing
+    def preview(
+        self,
+        request,	# request (dictionary)
+        uid,		# client's uid
+        dirFd,		# file descriptor of the input file's directory
+        reportDir	# private directory of the load's reports (string)
+        ):
+
+        from . import profilelib
+        from . import straincreate
+        from .dblib import db
+
+        load = request['load']
+        inputFile = request['inputFile']
+        options = request.get('options', [])
+        baseName = os.path.basename(inputFile)
+
+        # reports of an earlier run that must not be replaced
+        for suffix, loadSuffix in reportSuffixes:
+            reason = checkReport(dirFd, baseName + suffix, uid)
+            if reason is not None:
+                return {'fallback' : 'cannot replace %s' % (reason)}
+
+        try:
+            args = cli.parser().parse_args(['preview', load, inputFile] + list(options))
+        except SystemExit:
+            return {'status' : 1, 'report' : 'Invalid options: %s\n' % (' '.join(options))}
+
+        # the load's config, and nothing left over from the previous request
+        try:
+            env = self.environment(load)
+        except Exception as e:
+            return {'fallback' : 'cannot read %s: %s' % (cli.configNames[load], e)}
+        os.environ.clear()
+        os.environ.update(self.baseEnv)
+        os.environ.update(env)
+
+        if time.time() - self.cacheTime > self.cacheTTL:
+            straincreate.clearCaches()
+            self.cacheTime = time.time()
+
+        maxErrors = args.max_errors
+        if args.fail_fast:
+            maxErrors = 1
+
+        startTime = time.time()
+
+        errorFileName = os.path.join(reportDir, 'report.error')
+        diagFileName = os.path.join(reportDir, 'report.diagnostics')
+
+        profilelib.configure(args.profile)
+        curatorLoad = cli.loadClass(load)(inputFile, 'preview', diagFileName, errorFileName)
+        curatorLoad.maxErrors = maxErrors
+        curatorLoad.maxCategoryErrors = args.max_errors_per_category
+        curatorLoad.isStaging = args.staging
+        curatorLoad.closeConnection = 0
+
+        try:
+            status = curatorLoad.run()
+            db.commit()
+        except Exception as e:
+            # start the next request on a new connection
+            log('%s %s: %s' % (load, inputFile, e))
+            db.useOneConnection(0)
+            db.useOneConnection(1)
+            return {'fallback' : str(e)}
+
+        # a load that ended early may have left its transaction open
+        if status != 0:
+            db.useOneConnection(0)
+            db.useOneConnection(1)
+
+        log('%s %s: status %s, %d fatal error(s), %.2f s' \
+            % (load, inputFile, status, curatorLoad.hasFatalError, time.time() - startTime))
+
+        try:
+            for suffix, loadSuffix in reportSuffixes:
+                if loadSuffix is None:
+                    sourceFileName = diagFileName
+                else:
+                    sourceFileName = errorFileName + loadSuffix
+                if os.path.exists(sourceFileName):
+                    installReport(dirFd, baseName + suffix, uid, sourceFileName)
+
+            with open(errorFileName, 'r') as f:
+                report = f.read()
+        except (OSError, IOError) as e:
+            return {'fallback' : str(e)}
+
+        return {'status' : status, 'report' : report}
+
+# Purpose: serves requests in a worker process until SIGTERM
+# Returns: never (exits the process)
+# Assumes: server is listening
+# Effects: handles requests
+# Throws: nothing
+def serve(
+    server,	# socketserver.UnixStreamServer
+    configDir	# directory of the load configs (string)
+    ):
+
+    import socketserver
+    from .dblib import db
+
+    worker = Worker(configDir)
+    state = {'busy' : 0, 'stopping' : 0}
+
+    # an idle worker exits at once; a busy one after its request
+    def stop(signum, frame):
+        if state['busy'] == 0:
+            os._exit(0)
+        state['stopping'] = 1
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+
+            state['busy'] = 1
+
+            creds = self.connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+            pid, uid, gid = struct.unpack('3i', creds)
+
+            try:
+                response = worker.run(json.loads(self.rfile.readline().decode('utf-8')), uid)
+            except ValueError:
+                response = {'fallback' : 'invalid request'}
+
+            try:
+                self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+                self.wfile.flush()
+            except (OSError, IOError):
+                pass
+
+            state['busy'] = 0
+            if state['stopping'] == 1:
+                db.useOneConnection(0)
+                os._exit(0)
+
+    server.RequestHandlerClass = Handler
+
+    db.useOneConnection(1)
+    log('worker ready')
+
+    try:
+        server.serve_forever()
+    finally:
+        db.useOneConnection(0)
+        os._exit(0)
+
+# Purpose: runs the QC server until SIGTERM/SIGINT (curatorstrainload qcserver)
+# Returns: exit status
+# Assumes: the environment is set by curatorstrain.config
+# Effects: listens on QC_SOCKET; forks the workers
+# Throws: nothing
+def main():
+    global isStopping
+
+    import socketserver
+
+    socketPath = os.environ['QC_SOCKET']
+    configDir = os.getenv('CURATORSTRAINLOAD', os.getcwd())
+    numWorkers = int(os.getenv('QC_WORKERS', '4'))
+
+    if os.path.exists(socketPath):
+        os.remove(socketPath)
+
+    # the handler is set by each worker
+    server = socketserver.UnixStreamServer(socketPath, socketserver.StreamRequestHandler)
+    os.chmod(socketPath, 0o660)
+    if os.getenv('QC_GROUP', '') != '':
+        import grp
+        os.chown(socketPath, -1, grp.getgrnam(os.environ['QC_GROUP']).gr_gid)
+
+    workers = set()
+
+    # the workers exit, which ends the os.wait() below
+    def stop(signum, frame):
+        global isStopping
+        isStopping = 1
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    log('listening on %s with %d workers' % (socketPath, numWorkers))
+
+    while isStopping == 0:
+
+        while len(workers) < numWorkers:
+            pid = os.fork()
+            if pid == 0:
+                serve(server, configDir)
+            workers.add(pid)
+
+        try:
+            pid, status = os.wait()
+            workers.discard(pid)
+            if isStopping == 0:
+                log('worker %d exited (status %d); restarting it' % (pid, status))
+        except OSError:
+            pass
+
+    for pid in list(workers):
+        try:
+            os.waitpid(pid, 0)
+        except OSError:
+            pass
+
+    server.server_close()
+    if os.path.exists(socketPath):
+        os.remove(socketPath)
+    log('stopped')
+
+    return 0
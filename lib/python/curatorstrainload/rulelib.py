@@ -0,0 +1,145 @@
+#
+# Program: rulelib.py
+#
+# Purpose:
+#
+#	Validation rule pipeline of the strain create and update loads
+#
+#	A load lists the checks of a row as rules (its "rules" attribute),
+#	each with a cost class:
+#
+#	local	checks of the row's own fields (0/1 flags, pipes in a note)
+#	lookup	in-memory lookups (vocabularies loaded once, the strains
+#		resolved before the rows are processed)
+#	query	a database query per row (a lookup in VALIDATE_MODE=staging)
+#
+#	Pipeline.run() runs the rules of a row cheapest class first, in the
+#	order the load lists them within a class.  Once the row has a fatal
+#	error, the remaining lookup and query rules are skipped: the row
+#	fails either way and the loads write nothing for it.
+#	RULE_SKIP_AFTER_ERROR=0 runs every rule of every row, so the error
+#	file lists all the problems of a row at once.
+#
+#	The calls, skips, fatal errors and time of each rule are written to
+#	the diagnostics file at the end of the run.
+#
+# Environment:
+#
+#	RULE_SKIP_AFTER_ERROR	1 (default) = skip the lookup/query rules of a
+#				row that already has a fatal error
+#
+
+import os
+import time
+
+local = 0
+lookup = 1
+query = 2
+
+costNames = {local : 'local', lookup : 'lookup', query : 'query'}
+
+isSkipAfterError = 1	# RULE_SKIP_AFTER_ERROR
+
+# Purpose: reads the rule configuration from the environment
+# Returns: nothing
+# Assumes: nothing
+# Effects: sets isSkipAfterError
+# Throws: nothing
+def configure():
+    global isSkipAfterError
+
+    isSkipAfterError = int(os.getenv('RULE_SKIP_AFTER_ERROR', '1'))
+
+#
+# Rule
+#
+# One check of a row and its counters.
+#
+class Rule:
+
+    def __init__(
+        self,
+        name,	# rule name, e.g. 'species' (string)
+        cost,	# local, lookup or query
+        check	# function(row); reports errors with load.error()
+        ):
+
+        self.name = name
+        self.cost = cost
+        self.check = check
+        self.calls = 0
+        self.skipped = 0
+        self.errors = 0		# fatal errors reported by the rule
+        self.seconds = 0.0
+
+#
+# Pipeline
+#
+# The rules of a load, cheapest first.
+#
+class Pipeline:
+
+    def __init__(
+        self,
+        load,	# CuratorLoad
+        rules	# (name, cost, method name) of the load's checks
+        ):
+
+        self.load = load
+        self.rules = []
+
+        for name, cost, method in rules:
+            self.rules.append(Rule(name, cost, getattr(load, method)))
+
+        # stable: the load's order within a cost class
+        self.rules.sort(key = lambda r: r.cost)
+
+    # Purpose: runs the rules of a row
+    # Returns: number of fatal errors of the row
+    # Assumes: the load's lineNum is the row's
+    # Effects: the rules fill in row and report its errors
+    # Throws: whatever a rule throws
+    def run(
+        self,
+        row	# fields of the row; the rules add the keys they look up (dictionary)
+        ):
+
+        load = self.load
+        rowErrors = load.hasFatalError
+
+        for rule in self.rules:
+
+            if isSkipAfterError == 1 and rule.cost != local and load.hasFatalError > rowErrors:
+                rule.skipped += 1
+                continue
+
+            errors = load.hasFatalError
+            startTime = time.time()
+            rule.check(row)
+            rule.seconds += time.time() - startTime
+            rule.calls += 1
+            rule.errors += load.hasFatalError - errors
+
+        return load.hasFatalError - rowErrors
+
+    # Purpose: writes the counters of the rules to the diagnostics file
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: writes to diagFile
+    # Throws: nothing
+    def report(
+        self,
+        diagFile	# diagnostics file descriptor
+        ):
+
+        if sum([r.calls + r.skipped for r in self.rules]) == 0:
+            return
+
+        diagFile.write('\nRules (RULE_SKIP_AFTER_ERROR=%d):\n' % (isSkipAfterError))
+        diagFile.write('%-24s %-6s %8s %8s %8s %10s %10s\n' \
+            % ('rule', 'cost', 'calls', 'skipped', 'errors', 'total ms', 'ms/call'))
+
+        for r in self.rules:
+            diagFile.write('%-24s %-6s %8d %8d %8d %10.1f %10.3f\n' \
+                % (r.name, costNames[r.cost], r.calls, r.skipped, r.errors,
+                   1000 * r.seconds, 1000 * r.seconds / r.calls if r.calls > 0 else 0.0))
@@ -0,0 +1,179 @@
+#
+# Program: schedulelib.py
+#
+# Purpose:
+#
+#	Decides whether the create and update loads can run at the same time
+#	(curatorstrainload schedule; see bin/curatorstrainload.sh)
+#
+#	Each input file is read once to find what it touches:
+#
+#	create	new strain names, allele IDs
+#	update	strain IDs, their current names (one query), new strain
+#		names, allele IDs
+#
+#	The loads can run at the same time if nothing intersects:
+#
+#	- a create name that is a new or current name in the update file
+#	  ("Strain Already Exists"/"Strain Name Already Exists" would depend
+#	  on which load runs first)
+#	- an allele in both files (strain/marker associations)
+#
+#	otherwise they run in order, create then update.
+#
+#	Running at the same time, both loads take PRB_Strain_Marker keys;
+#	they reserve their keys under an advisory lock (LOAD_CONCURRENT=1, see
+#	CuratorLoad.reserveKeys()) and never set the sequence back.
+#
+
+import os
+from .dblib import db
+from . import compresslib
+
+chunkSize = 1000	# strain IDs per query
+
+# Purpose: finds the published input file (plain, .gz or .zst)
+# Returns: path, or None
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def findInput(
+    fileName	# uncompressed input file name (string)
+    ):
+
+    for suffix in ('', '.gz', '.zst'):
+        if os.path.isfile(fileName + suffix):
+            return fileName + suffix
+
+    return None
+
+# Purpose: rows of an input file
+# Returns: generator of token lists (header and short rows skipped)
+# Assumes: nothing
+# Effects: reads the file
+# Throws: IOError
+def rows(
+    fileName,	# input file (string)
+    header,	# first field of the header row (string)
+    numFields	# fields of a valid row (integer)
+    ):
+
+    with compresslib.openInput(fileName) as f:
+        for line in f:
+            tokens = line.rstrip('\n').split('\t')
+            if len(tokens) < numFields or tokens[0] == header:
+                continue
+            yield tokens
+
+# Purpose: what a create file touches
+# Returns: (set of strain names, set of allele IDs)
+# Assumes: nothing
+# Effects: reads the file
+# Throws: IOError
+def touchedCreate(
+    fileName	# create input file (string)
+    ):
+
+    names = set()
+    alleles = set()
+
+    for tokens in rows(fileName, 'Strain ID', 14):
+        names.add(tokens[1])
+        if len(tokens[2]) > 0:
+            alleles.update(tokens[2].split('|'))
+
+    return names, alleles
+
+# Purpose: what an update file touches
+# Returns: (set of strain IDs, set of strain names, set of allele IDs)
+#	the names are the new names and the current names of the strain IDs
+# Assumes: db connection
+# Effects: reads the file; queries the current names
+# Throws: IOError
+def touchedUpdate(
+    fileName	# update input file (string)
+    ):
+
+    ids = set()
+    names = set()
+    alleles = set()
+
+    for tokens in rows(fileName, 'MGI:Strain ID', 6):
+        ids.add(tokens[0])
+        names.add(tokens[2])
+        if len(tokens[1]) > 0:
+            alleles.update(tokens[1].split('|'))
+
+    idList = sorted(ids)
+    for i in range(0, len(idList), chunkSize):
+        results = db.sql('''select s.strain
+            from ACC_Accession a, PRB_Strain s
+            where a._mgitype_key = 10
+            and a._logicaldb_key = 1
+            and a.accid in (%s)
+            and a._object_key = s._strain_key
+            ''' % (', '.join(["'%s'" % (x.replace("'", "''")) for x in idList[i:i + chunkSize]])), 'auto')
+        for r in results:
+            names.add(r['strain'])
+
+    return ids, names, alleles
+
+# Purpose: conflicts between a create and an update file
+# Returns: list of reasons (strings); empty if the loads can run at the same time
+# Assumes: db connection
+# Effects: reads the files
+# Throws: IOError
+def conflicts(
+    createFileName,	# create input file (string)
+    updateFileName	# update input file (string)
+    ):
+
+    createNames, createAlleles = touchedCreate(createFileName)
+    updateIds, updateNames, updateAlleles = touchedUpdate(updateFileName)
+
+    reasons = []
+
+    for name in sorted(createNames & updateNames):
+        reasons.append('strain name in both files: %s' % (name))
+
+    for alleleID in sorted(createAlleles & updateAlleles):
+        reasons.append('allele in both files: %s' % (alleleID))
+
+    return reasons
+
+# Purpose: decides how to run the create and update loads (curatorstrainload schedule)
+# Returns: 0 = concurrent, 1 = in order
+# Assumes: db connection
+# Effects: writes the decision and its reasons to stdout
+# Throws: nothing
+def schedule(
+    createFileName,	# create input file, without .gz/.zst (string)
+    updateFileName,	# update input file, without .gz/.zst (string)
+    out			# output file descriptor
+    ):
+
+    createFile = findInput(createFileName)
+    updateFile = findInput(updateFileName)
+
+    if createFile is None or updateFile is None:
+        out.write('schedule: concurrent (only one input file)\n')
+        return 0
+
+    try:
+        reasons = conflicts(createFile, updateFile)
+    except Exception as e:
+        out.write('schedule: in order (%s)\n' % (e))
+        return 1
+
+    if len(reasons) == 0:
+        out.write('schedule: concurrent (%s and %s touch different strains and alleles)\n' \
+            % (createFile, updateFile))
+        return 0
+
+    out.write('schedule: in order, create then update (%d conflicts)\n' % (len(reasons)))
+    for r in reasons[:20]:
+        out.write('    %s\n' % (r))
+    if len(reasons) > 20:
+        out.write('    ...\n')
+
+    return 1
@@ -0,0 +1,238 @@
+#
+# Program: staginglib.py
+#
+# Purpose:
+#
+#	Staging tables for set-based validation (VALIDATE_MODE=staging)
+#
+#	The parsed input file is copied into temporary tables and each check
+#	(strain exists, users, alleles, terms, ...) is one join against the
+#	staging table instead of one query per row.  The loads turn the
+#	results into lookups that their verify methods read while processFile
+#	reports the errors row by row, as in VALIDATE_MODE=row.
+#
+#	db.sql has no COPY, so the staging tables are filled with multi-row
+#	INSERTs of STAGING_BATCH_SIZE rows.  Temporary tables need the same
+#	connection for the whole run (db.useOneConnection(1)).
+#
+#	A check given its staging table runs over STAGING_PAGE_SIZE input
+#	rows at a time (its "row between {first} and {last}" condition), so a large file never brings
+#	back one large result.
+#
+# Environment:
+#
+#	VALIDATE_MODE		row (default) or staging
+#	STAGING_BATCH_SIZE	rows per INSERT (default 1000)
+#	STAGING_PAGE_SIZE	input rows per check query (default 10000)
+#
+
+import os
+import time
+from .dblib import db
+
+modes = ('row', 'staging')
+
+# Purpose: validation mode from the environment
+# Returns: 1 if VALIDATE_MODE=staging, else 0
+# Assumes: nothing
+# Effects: nothing
+# Throws: ValueError if VALIDATE_MODE is not row or staging
+def isStaging():
+
+    mode = os.getenv('VALIDATE_MODE', 'row')
+    if mode == '':
+        mode = 'row'
+    if mode not in modes:
+        raise ValueError('VALIDATE_MODE must be row or staging: %s' % (mode))
+
+    if mode == 'staging':
+        return 1
+
+    return 0
+
+# Purpose: SQL literal of a value
+# Returns: quoted string, or null
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def quote(
+    value	# value (string, integer or None)
+    ):
+
+    if value is None:
+        return 'null'
+
+    if isinstance(value, int):
+        return str(value)
+
+    return "'" + str(value).replace("'", "''") + "'"
+
+# Purpose: SQL expression of a staged text column as a number
+# Returns: the column cast to numeric if it is a number, else null
+#	(a key the row mode puts into its query unquoted: '01' = 1)
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def number(
+    column	# column, e.g. 's.externalLDB' (string)
+    ):
+
+    return "case when %s ~ '^ *[+-]?([0-9]+[.]?[0-9]*|[.][0-9]+) *$' then %s::numeric end" \
+        % (column, column)
+
+#
+# StagingTable
+#
+# A temporary table of text columns plus the input row number.
+#
+class StagingTable:
+
+    def __init__(
+        self,
+        name,		# table name (string)
+        columns		# text column names (tuple)
+        ):
+
+        self.name = name
+        self.columns = columns
+        self.count = 0
+        self.maxRow = 0
+        self.batchSize = int(os.getenv('STAGING_BATCH_SIZE', '1000'))
+        self.rows = []
+
+    # Purpose: creates the table
+    # Returns: nothing
+    # Assumes: db.useOneConnection(1)
+    # Effects: drops a table of the same name left by an earlier run
+    # Throws: nothing
+    def create(self):
+
+        db.sql('drop table if exists %s' % (self.name), None)
+        db.sql('create temporary table %s (row int, %s)' \
+            % (self.name, ', '.join(['%s text' % (c) for c in self.columns])), None)
+
+    # Purpose: adds a row
+    # Returns: nothing
+    # Assumes: create() has been called
+    # Effects: inserts STAGING_BATCH_SIZE rows at a time
+    # Throws: nothing
+    def add(
+        self,
+        row,		# input row number (integer)
+        values		# column values (tuple)
+        ):
+
+        self.rows.append('(%d, %s)' % (row, ', '.join([quote(v) for v in values])))
+        self.count += 1
+        self.maxRow = max(self.maxRow, row)
+
+        if len(self.rows) >= self.batchSize:
+            self.flush()
+
+    # Purpose: inserts the buffered rows
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: nothing
+    # Throws: nothing
+    def flush(self):
+
+        if len(self.rows) == 0:
+            return
+
+        db.sql('insert into %s (row, %s) values %s' \
+            % (self.name, ', '.join(self.columns), ',\n'.join(self.rows)), None)
+        self.rows = []
+
+    # Purpose: makes the table ready for the checks
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: inserts the remaining rows; indexes the row numbers
+    #	for the paged checks; analyzes the table
+    # Throws: nothing
+    def close(self):
+
+        self.flush()
+        db.sql('create index on %s (row)' % (self.name), None)
+        db.sql('analyze %s' % (self.name), None)
+
+    def drop(self):
+        db.sql('drop table if exists %s' % (self.name), None)
+
+#
+# Stage
+#
+# The staging tables of one load, and the count/timing of its checks
+# (written to the diagnostics file by report()).
+#
+class Stage:
+
+    def __init__(self):
+
+        self.tables = []
+        self.checks = []	# (check name, number of results, seconds)
+        self.startTime = time.time()
+        self.pageSize = int(os.getenv('STAGING_PAGE_SIZE', '10000'))
+
+    def table(self, name, columns):
+
+        t = StagingTable(name, columns)
+        t.create()
+        self.tables.append(t)
+        return t
+
+    # Purpose: runs one set-based check
+    # Returns: generator of the result rows; with a table, the rows of
+    #	each page, without the ones an earlier page returned
+    # Assumes: the staging tables are closed
+    # Effects: records the check for report() once the results are read
+    # Throws: nothing
+    def check(
+        self,
+        name,		# check name (string)
+        cmd,		# select statement (string)
+        table = None	# staging table to page over (StagingTable); cmd has a
+        		# "<alias>.row between {first} and {last}" condition
+        ):
+
+        t = time.time()
+        count = 0
+
+        if table is None:
+            for r in db.sql(cmd, 'auto'):
+                count += 1
+                yield r
+        else:
+            seen = set()
+            for first in range(1, table.maxRow + 1, self.pageSize):
+                last = first + self.pageSize - 1
+                page = cmd.replace('{first}', str(first)).replace('{last}', str(last))
+                for r in db.sql(page, 'auto'):
+                    key = tuple(r.values())
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    count += 1
+                    yield r
+
+        self.checks.append((name, count, time.time() - t))
+
+    # Purpose: drops the staging tables and reports the checks
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: writes to the diagnostics file
+    # Throws: nothing
+    def report(
+        self,
+        diagFile	# diagnostics file descriptor
+        ):
+
+        for t in self.tables:
+            t.drop()
+
+        diagFile.write('\nStaging validation: %s\n' \
+            % (', '.join(['%s %d rows' % (t.name, t.count) for t in self.tables])))
+
+        for name, count, seconds in self.checks:
+            diagFile.write('    %-24s %6d results %8.3f s\n' % (name, count, seconds))
+
+        diagFile.write('    %d queries, %.3f s\n\n' % (len(self.checks), time.time() - self.startTime))
@@ -0,0 +1,706 @@
+#
+# Program: straincreate.py
+#
+# Inputs:
+#
+#	A tab-delimited file in the format:
+#	field 1:  Strain id
+#	field 2:  Strain Name
+#	field 3:  MGI Allele ID (pipe-delimited)
+#	field 4:  Strain Type (ex. 'coisogenic', 'congenic', 'conplastic')
+#	field 5:  Strain Species (ex. 'laboratory mouse')
+#	field 6:  Standard (1/0)
+#	field 7:  Strain of Origin Note
+#	field 8:  External Logical DB key
+#	field 9:  External MGI Type key
+#	field 10: Strain Attributes (xxxxx|xxxxx) (ex. 'chromosome aberration', 'closed colony')
+#	field 11: Created By
+#	field 12: Mutant ES Cell line of Origin note
+#	field 13: Private (1/0)
+#	field 14: IMPC Colony Note
+#
+# Outputs:
+#
+#       5 BCP files:
+#
+#       PRB_Strain.bcp                  master Strain records
+#       PRB_Strain_Marker.bcp           master Strain records
+#       ACC_Accession.bcp               Accession records
+#       VOC_Annot.bcp
+#       MGI_Note                        strain of origin notes
+#
+#       Diagnostics file of all input parameters and SQL commands
+#       Error file
+#
+# History
+#
+# lec   07/12/2023
+#	- wts2-1198/fl2-410/Moving WTS2-686 to curator control
+#
+# lec	04/09/2014
+#	- TR11623/EMMA strains
+#
+# lec	03/26/2012
+#	- TR11015/Gensat
+#
+
+import os
+import time
+from .lazylib import accessionlib
+from .dblib import db
+from . import namelib
+from . import rulelib
+from . import staginglib
+from .curatorload import CuratorLoad
+
+strainTable = 'PRB_Strain'
+markerTable = 'PRB_Strain_Marker'
+accTable = 'ACC_Accession'
+annotTable = 'VOC_Annot'
+noteTable = 'MGI_Note'
+
+strainFileName = strainTable + '.bcp'
+markerFileName = markerTable + '.bcp'
+accFileName = accTable + '.bcp'
+annotFileName = annotTable + '.bcp'
+noteFileName = noteTable + '.bcp'
+
+isGeneticBackground = 0
+
+mgiTypeKey = 10		# ACC_MGIType._MGIType_key for Strains
+mgiPrefix = "MGI:"
+alleleTypeKey = 11	# ACC_MGIType._MGIType_key for Allele
+markerTypeKey = 2       # ACC_MGIType._MGIType_key for Marker
+mgiNoteObjectKey = 10   # MGI_Note._MGIType_key
+mgiStrainOriginTypeKey = 1011   # MGI_Note._NoteType_key
+mgiMutantOriginTypeKey = 1038   # MGI_Note._NoteType_key
+mgiIMPCColonyTypeKey = 1012	# MGI_Note._NoteType_key
+
+qualifierKey = 615427	# nomenclature
+
+# vocabulary lookups, shared by all loads in the process (kept warm by the
+# watch daemon; see clearCaches())
+strainTypesDict = {}    # dictionary of types for quick lookup
+speciesDict = {}      	# dictionary of species for quick lookup
+
+# Purpose: empties the vocabulary lookups
+# Returns: nothing
+# Assumes: nothing
+# Effects: the next verifySpecies/verifyStrainType reloads them from the database
+# Throws: nothing
+def clearCaches():
+    speciesDict.clear()
+    strainTypesDict.clear()
+
+#
+# StrainCreateLoad
+#
+# Creates new strains: PRB_Strain, its MGI and external accession ids,
+# strain/marker/allele associations, strain attributes and notes.
+#
+class StrainCreateLoad(CuratorLoad):
+
+    loadName = 'straincreate'
+
+    bcpTables = (
+        ('strainFile', strainTable, strainFileName),
+        ('markerFile', markerTable, markerFileName),
+        ('accFile', accTable, accFileName),
+        ('annotFile', annotTable, annotFileName),
+        ('noteFile', noteTable, noteFileName),
+        )
+
+    # row checks, cheapest class first (see rulelib.py); the query rules
+    # whose lookups repeat across rows (users, logical DBs) come first:
+    # they go through db.sql, so the query cache answers the repeats when
+    # QUERY_CACHE_SIZE is set (see dblib.py; it ships off)
+    rules = (
+        ('strain of origin note', rulelib.local, 'checkStrainOfOrigin'),
+        ('private', rulelib.local, 'checkPrivate'),
+        ('strain type', rulelib.lookup, 'checkStrainType'),
+        ('species', rulelib.lookup, 'checkSpecies'),
+        ('user', rulelib.query, 'checkUser'),
+        ('external info', rulelib.query, 'checkExternalInfo'),
+        ('strain', rulelib.query, 'checkStrain'),
+        ('alleles', rulelib.query, 'checkAlleles'),
+        ('strain attributes', rulelib.query, 'checkAnnotations'),
+        )
+
+    def __init__(self, inputFileName, mode, diagFileName = None, errorFileName = None):
+
+        CuratorLoad.__init__(self, inputFileName, mode, diagFileName, errorFileName)
+
+        self.strainKey = 0		# PRB_Strain._Strain_key
+        self.strainmarkerKey = 0	# PRB_Strain_Marker._StrainMarker_key
+        self.accKey = 0			# ACC_Accession._Accession_key
+        self.mgiKey = 0			# ACC_AccessionMax.maxNumericPart
+        self.annotKey = 0
+        self.noteKey = 0		# MGI_Note._Note_key
+
+        self.fileStrains = {}		# new strain -> first row that has it (VALIDATE_MODE=row)
+
+        # lookups from the staging tables (VALIDATE_MODE=staging; see stageInput())
+        self.stagedStrains = {}		# existing strain -> strain key
+        self.duplicateStrains = {}	# strain in the file more than once -> first row
+        self.stagedLDBs = set()		# valid External Logical DB keys
+        self.stagedMGITypes = set()	# valid External MGI Type keys
+        self.stagedAlleles = {}		# allele id -> (allele key, marker key)
+        self.stagedTerms = {}		# strain attribute -> term key
+
+        # near-duplicate names (preview, NAME_CHECK=1; see namelib.py)
+        self.nameIndex = None
+        self.nameSimilarity = 0.8
+        self.nameCheckCount = 0
+        self.nameCheckTime = 0.0
+
+    def init(self):
+
+        CuratorLoad.init(self)
+
+        if self.isSanityCheck == 1 and os.getenv('NAME_CHECK', '0') == '1':
+            startTime = time.time()
+            self.nameIndex = namelib.load()
+            self.nameSimilarity = float(os.getenv('NAME_SIMILARITY', '0.8'))
+            self.diagFile.write('Name index: %d names, loaded in %.2f s\n' \
+                % (len(self.nameIndex.where), time.time() - startTime))
+
+    # Purpose:  verify Species
+    # Returns:  Species Key if Species is valid, else 0
+    # Assumes:  nothing
+    # Effects:  verifies that the Species exists either in the Species dictionary or the database
+    #	writes to the error file if the Species is invalid
+    #	adds the Species and key to the Species dictionary if the Species is valid
+    # Throws:  nothing
+    def verifySpecies(
+        self,
+        species 	# Species (string)
+        ):
+
+        if len(speciesDict) == 0:
+            results = db.sql('select _Term_key, term from VOC_Term where _Vocab_key = 26', 'auto')
+
+            for r in results:
+                speciesDict[r['term']] = r['_Term_key']
+
+        if species in speciesDict:
+                speciesKey = speciesDict[species]
+        else:
+                self.error('Invalid Species', species, 'Invalid Species (row %d): %s\n' % (self.lineNum, species))
+                speciesKey = 0
+
+        return speciesKey
+
+    # Purpose:  verify Strain Type
+    # Returns:  Strain Type Key if Strain Type is valid, else 0
+    # Assumes:  nothing
+    # Effects:  verifies that the Strain Type exists either in the Strain Type dictionary or the database
+    #	writes to the error file if the Strain Type is invalid
+    #	adds the Strain Type and key to the Strain Type dictionary if the Strain Type is valid
+    # Throws:  nothing
+    def verifyStrainType(
+        self,
+        strainType 	# Strain Type (string)
+        ):
+
+        if len(strainTypesDict) == 0:
+            results = db.sql('select _Term_key, term from VOC_Term where _Vocab_key = 55', 'auto')
+
+            for r in results:
+                strainTypesDict[r['term']] = r['_Term_key']
+
+        if strainType in strainTypesDict:
+                strainTypeKey = strainTypesDict[strainType]
+        else:
+                self.error('Invalid Strain Type', strainType, 'Invalid Strain Type (row %d): %s\n' % (self.lineNum, strainType))
+                strainTypeKey = 0
+
+        return strainTypeKey
+
+    # Purpose:  verify Strain
+    # Returns:  Strain Key if Strain is valid, else 0
+    # Assumes:  nothing
+    # Effects:  verifies that the Strain does not exist in the database
+    #	and is not on an earlier row of the file
+    #	writes to the error file if the Strain is invalid
+    # Throws:  nothing
+    def verifyStrain(
+        self,
+        strain 	# Strain (string)
+        ):
+
+        if self.isStaging == 1:
+            strainExistKey = self.stagedStrains.get(strain, 0)
+            if strainExistKey != 0:
+                self.error('Strain Already Exists', strain, 'Strain Already Exists (row %d): %s\n' % (self.lineNum, strain))
+            elif self.duplicateStrains.get(strain, self.lineNum) != self.lineNum:
+                self.error('Duplicate Strain in file', strain, 'Duplicate Strain in file (row %d): %s (first at row %d)\n' \
+                    % (self.lineNum, strain, self.duplicateStrains[strain]))
+            return strainExistKey
+
+        results = db.sql('select _Strain_key, strain from PRB_Strain where strain = \'%s\'' % (strain), 'auto')
+
+        if len(results) > 0:
+                strainExistKey = results[-1]['_Strain_key']
+                self.error('Strain Already Exists', strain, 'Strain Already Exists (row %d): %s\n' % (self.lineNum, strain))
+        else:
+                strainExistKey = 0
+                if strain in self.fileStrains:
+                    self.error('Duplicate Strain in file', strain, 'Duplicate Strain in file (row %d): %s (first at row %d)\n' \
+                        % (self.lineNum, strain, self.fileStrains[strain]))
+                else:
+                    self.fileStrains[strain] = self.lineNum
+
+        return strainExistKey
+
+    # Purpose:  warns about existing strain names/synonyms similar to a new name
+    # Returns:  nothing
+    # Assumes:  the name is not an existing strain name (verifyStrain)
+    # Effects:  writes a warning per similar name (at most 3)
+    # Throws:  nothing
+    def checkSimilarNames(
+        self,
+        strain 	# Strain (string)
+        ):
+
+        if self.nameIndex is None:
+            return
+
+        startTime = time.time()
+        matches = self.nameIndex.similar(strain, self.nameSimilarity)
+        self.nameCheckTime += time.time() - startTime
+        self.nameCheckCount += 1
+
+        for similarity, source, name, accID in matches:
+            self.warning('Possible duplicate strain', strain,
+                'Warning: Possible duplicate strain (row %d): %s ~ %s %s (%s, similarity %.2f)\n' \
+                % (self.lineNum, strain, source, name, accID, similarity))
+
+    # Purpose:  verify External Logical DB key & MGI Type key
+    # Returns:  nothing
+    # Assumes:  nothing
+    # Effects:  verifies that the External Logical DB key & MGI Type key exist
+    #	writes to the error file if either key is invalid
+    # Throws:  nothing
+    def verifyExternalInfo(
+        self,
+        externalLDB, 	# External Logical DB key (string)
+        externalTypeKey	# External MGI Type key (string)
+        ):
+
+        if self.isStaging == 1:
+            isValidLDB = externalLDB in self.stagedLDBs
+            isValidMGIType = externalTypeKey in self.stagedMGITypes
+        else:
+            results = db.sql('select _logicaldb_key from ACC_LogicalDB where _logicaldb_key = %s' % (externalLDB), 'auto')
+            isValidLDB = len(results) > 0
+            results = db.sql('select _mgitype_key from ACC_MGIType where _mgitype_key = %s' % (externalTypeKey), 'auto')
+            isValidMGIType = len(results) > 0
+
+        if not isValidLDB:
+            self.error('Invalid External Logical DB key', externalLDB, 'Invalid External Logical DB key (row %d): %s\n' % (self.lineNum, externalLDB))
+
+        if not isValidMGIType:
+            self.error('Invalid External MGI Type key', externalTypeKey, 'Invalid External MGI Type key (row %d): %s\n' % (self.lineNum, externalTypeKey))
+
+    # Purpose:  verify Allele
+    # Returns:  Allele Key if the Allele ID is valid, else 0
+    # Assumes:  nothing
+    # Effects:  writes to the error file if the Allele ID is invalid
+    # Throws:  nothing
+    def verifyAllele(
+        self,
+        alleleID	# Allele ID (string)
+        ):
+
+        if self.isStaging == 1:
+            if alleleID in self.stagedAlleles:
+                return self.stagedAlleles[alleleID][0]
+        else:
+            results = db.sql('''
+                    select _Object_key from ACC_Accession where _mgitype_key = %s and accid = '%s'
+                    '''% (alleleTypeKey, alleleID),  'auto')
+            if len(results) > 0:
+                return results[0]['_Object_key']
+
+        self.error('Invalid Allele', alleleID, 'Invalid Allele (row %d): %s\n' % (self.lineNum, alleleID))
+        return 0
+
+    # Purpose:  marker of an Allele
+    # Returns:  Marker Key, or None
+    # Assumes:  the Allele Key is valid
+    # Effects:  nothing
+    # Throws:  nothing
+    def getMarker(
+        self,
+        alleleID,	# Allele ID (string)
+        alleleKey	# Allele Key (integer)
+        ):
+
+        if self.isStaging == 1:
+            return self.stagedAlleles[alleleID][1]
+
+        results = db.sql('select _Marker_key from ALL_Allele where _Allele_key = %s' % (alleleKey),  'auto')
+        return results[0]['_Marker_key']
+
+    # Purpose:  verify Strain Attribute
+    # Returns:  Term Key if the Strain Attribute is valid, else 0
+    # Assumes:  nothing
+    # Effects:  writes to the error file if the Strain Attribute is invalid
+    # Throws:  nothing
+    def verifyAnnotTerm(
+        self,
+        term		# Strain Attribute (string)
+        ):
+
+        if self.isStaging == 1:
+            if term in self.stagedTerms:
+                return self.stagedTerms[term]
+        else:
+            results = db.sql('''
+                    select _Term_key from VOC_Term where _vocab_key = 27 and term = '%s'
+                    '''% (term),  'auto')
+            if len(results) > 0:
+                return results[0]['_Term_key']
+
+        self.error('Invalid Strain Association Term', term, 'Invalid Strain Association Term (row %d): %s\n' % (self.lineNum, term))
+        return 0
+
+    #
+    # Rules of processFile() (see rules); each takes the row's fields and
+    # adds the keys it looks up to them
+    #
+
+    def checkStrainOfOrigin(self, row):
+
+        if row['sooNote'].find("|") >= 1:
+            self.error('Invalid Strain of Origin', None, 'Invalid Strain of Origin : pipes found ("|") (row %d): %s\n' % (self.lineNum, row['line']))
+
+    def checkPrivate(self, row):
+
+        if row['isPrivate'] not in ('0', '1'):
+            self.error('Private must be 0 or 1', row['isPrivate'], 'Private must be 0 or 1 (row %d): %s\n' % (self.lineNum, row['line']))
+
+    def checkStrainType(self, row):
+
+        row['strainTypeKey'] = self.verifyStrainType(row['strainType'])
+
+    def checkSpecies(self, row):
+
+        row['speciesKey'] = self.verifySpecies(row['species'])
+
+    def checkUser(self, row):
+
+        row['createdByKey'] = self.verifyUser(row['createdBy'])
+
+    def checkExternalInfo(self, row):
+
+        self.verifyExternalInfo(row['externalLDB'], row['externalTypeKey'])
+
+    def checkStrain(self, row):
+
+        if self.verifyStrain(row['name']) == 0:
+            self.checkSimilarNames(row['name'])
+
+    def checkAlleles(self, row):
+
+        row['alleles'] = []	# (allele id, allele key)
+
+        if len(row['alleleIDs']) > 0:
+            for a in row['alleleIDs'].split('|'):
+                alleleKey = self.verifyAllele(a)
+                if alleleKey != 0:
+                    row['alleles'].append((a, alleleKey))
+
+    def checkAnnotations(self, row):
+
+        row['annotTerms'] = []	# term keys
+
+        if len(row['annotations']) > 0:
+            for a in row['annotations'].split('|'):
+                annotTermKey = self.verifyAnnotTerm(a)
+                if annotTermKey != 0:
+                    row['annotTerms'].append(annotTermKey)
+
+    # Purpose:  copies the file into staging tables and runs the checks
+    #	of verifyStrain, verifyExternalInfo, verifyUser, verifyAllele
+    #	and verifyAnnotTerm as one query each
+    # Returns:  nothing
+    # Assumes:  VALIDATE_MODE=staging; see CuratorLoad.stageFile()
+    # Effects:  sets the staged lookups
+    # Throws:   nothing
+    def stageInput(self, stage):
+
+        strains = stage.table('curatorstrain_create', ('strain', 'externalLDB', 'externalTypeKey', 'createdBy'))
+        alleles = stage.table('curatorstrain_create_allele', ('accid',))
+        annots = stage.table('curatorstrain_create_annot', ('term',))
+
+        # the rows processFile() verifies
+        lineNum = 0
+        for line in self.inputFile:
+            lineNum = lineNum + 1
+            tokens = line[:-1].split('\t')
+            if line.find("\"") >= 1 or len(tokens) < 14 or tokens[0] == 'Strain ID':
+                continue
+            strains.add(lineNum, (tokens[1], tokens[7], tokens[8], tokens[10]))
+            if len(tokens[2]) > 0:
+                for a in tokens[2].split('|'):
+                    alleles.add(lineNum, (a,))
+            if len(tokens[9]) > 0:
+                for a in tokens[9].split('|'):
+                    annots.add(lineNum, (a,))
+
+        strains.close()
+        alleles.close()
+        annots.close()
+
+        for r in stage.check('strain exists', '''select distinct p.strain, p._Strain_key
+            from curatorstrain_create s, PRB_Strain p
+            where p.strain = s.strain
+            and s.row between {first} and {last}
+            ''', strains):
+            self.stagedStrains[r['strain']] = r['_Strain_key']
+
+        for r in stage.check('strain duplicate', '''select strain, min(row) as firstRow
+            from curatorstrain_create
+            group by strain having count(*) > 1
+            '''):
+            self.duplicateStrains[r['strain']] = r['firstRow']
+
+        # compared as numbers, as in verifyExternalInfo's row queries
+        for r in stage.check('logical db', '''select distinct s.externalLDB
+            from curatorstrain_create s, ACC_LogicalDB l
+            where l._logicaldb_key = %s
+            and s.row between {first} and {last}
+            ''' % (staginglib.number('s.externalLDB')), strains):
+            self.stagedLDBs.add(r['externalLDB'])
+
+        for r in stage.check('mgi type', '''select distinct s.externalTypeKey
+            from curatorstrain_create s, ACC_MGIType t
+            where t._mgitype_key = %s
+            and s.row between {first} and {last}
+            ''' % (staginglib.number('s.externalTypeKey')), strains):
+            self.stagedMGITypes.add(r['externalTypeKey'])
+
+        self.stageUsers(stage, strains, 'createdBy')
+
+        for r in stage.check('alleles', '''select distinct on (s.accid) s.accid, a._Object_key, aa._Marker_key
+            from curatorstrain_create_allele s
+                join ACC_Accession a on (a._mgitype_key = %s and a.accid = s.accid)
+                left outer join ALL_Allele aa on (aa._Allele_key = a._Object_key)
+            where s.row between {first} and {last}
+            ''' % (alleleTypeKey), alleles):
+            self.stagedAlleles[r['accid']] = (r['_Object_key'], r['_Marker_key'])
+
+        for r in stage.check('strain attributes', '''select distinct s.term, t._Term_key
+            from curatorstrain_create_annot s, VOC_Term t
+            where t._vocab_key = 27 and t.term = s.term
+            and s.row between {first} and {last}
+            ''', annots):
+            self.stagedTerms[r['term']] = r['_Term_key']
+
+    # Purpose:  sets primary key variables
+    # Returns:  nothing
+    # Assumes:  nothing
+    # Effects:  sets primary key variables
+    # Throws:   nothing
+    def setPrimaryKeys(self):
+
+        results = db.sql(''' select nextval('prb_strain_seq') as maxKey ''', 'auto')
+        self.strainKey = results[0]['maxKey']
+
+        # shared with strainupdate, which may run at the same time; one key per allele ID (field 3)
+        self.strainmarkerKey = self.reserveKeys('prb_strain_marker_seq', 2)
+
+        results = db.sql('select max(_Accession_key) + 1 as maxKey from ACC_Accession', 'auto')
+        self.accKey = results[0]['maxKey']
+
+        results = db.sql('select maxNumericPart + 1 as maxKey from ACC_AccessionMax where prefixPart = \'%s\'' % (mgiPrefix), 'auto')
+        self.mgiKey = results[0]['maxKey']
+
+        results = db.sql(''' select nextval('voc_annot_seq') as maxKey ''', 'auto')
+        self.annotKey = results[0]['maxKey']
+
+        results = db.sql(''' select nextval('mgi_note_seq') as maxKey ''', 'auto')
+        self.noteKey = results[0]['maxKey']
+
+    # Purpose:  processes data
+    # Returns:  nothing
+    # Assumes:  nothing
+    # Effects:  verifies and processes each line in the input file
+    # Throws:   nothing
+    def processFile(self):
+
+        cdate = self.cdate
+
+        # For each line in the input file
+
+        for line in self.inputFile:
+
+            # error budget (ERROR_BUDGET, ERROR_BUDGET_CATEGORY)
+            if self.isOverBudget() == 1:
+                break
+
+            self.lineNum = self.lineNum + 1
+            lineNum = self.lineNum
+
+            # Split the line into tokens
+            tokens = line[:-1].split('\t')
+
+            if line.find("\"") >= 1:
+                    self.error('Quotes in row', None, 'Quotes in row (row %d): %s\n' % (lineNum, line))
+                    continue
+
+            try:
+                id = tokens[0]
+                externalPrefix = id
+                externalNumeric = ''
+                (externalPrefix, externalNumeric) = accessionlib.split_accnum(id)
+                if externalNumeric == None:
+                    externalNumeric = ''
+                name = tokens[1]
+                alleleIDs = tokens[2]
+                strainType = tokens[3]
+                species = tokens[4]
+                isStandard = tokens[5]
+                sooNote = tokens[6]
+                externalLDB = tokens[7]
+                externalTypeKey = tokens[8]
+                annotations = tokens[9]
+                createdBy = tokens[10]
+                mutantNote = tokens[11]
+                isPrivate = tokens[12]
+                impcColonyNote = tokens[13]
+            except:
+                self.error('Invalid Line', None, 'Invalid Line (row %d): %s\n' % (lineNum, line))
+                continue
+
+            # skip header row
+            if id == 'Strain ID':
+                    continue
+
+            row = {'line' : line, 'name' : name, 'alleleIDs' : alleleIDs, 'strainType' : strainType,
+                'species' : species, 'sooNote' : sooNote, 'externalLDB' : externalLDB,
+                'externalTypeKey' : externalTypeKey, 'annotations' : annotations,
+                'createdBy' : createdBy, 'isPrivate' : isPrivate}
+
+            # local checks first; a row with a fatal error skips the lookups (see rulelib.py)
+            if self.pipeline.run(row) > 0:
+                continue
+
+            strainTypeKey = row['strainTypeKey']
+            speciesKey = row['speciesKey']
+            createdByKey = row['createdByKey']
+
+            # if sanity check only, skip/continue
+            if self.isSanityCheck == 1:
+                    continue
+
+            # if Allele found, resolve to Marker
+            for a, alleleKey in row['alleles']:
+
+                markerKey = self.getMarker(a, alleleKey)
+
+                # markerKey may be null
+                self.markerFile.writeRow((self.strainmarkerKey, self.strainKey, markerKey, alleleKey, qualifierKey,
+                        createdByKey, createdByKey, cdate, cdate))
+
+                self.strainmarkerKey = self.strainmarkerKey + 1
+
+            #
+            # Annotations
+            # _AnnotType_key = 1009
+            # _Qualifier_ke = 1614158
+            #
+            for annotTermKey in row['annotTerms']:
+
+                # strain annotation type
+                annotTypeKey = 1009
+
+                # this is a null qualifier key
+                annotQualifierKey = 1614158
+
+                self.annotFile.writeRow((self.annotKey, annotTypeKey, self.strainKey, annotTermKey, annotQualifierKey, cdate, cdate))
+                self.annotKey = self.annotKey + 1
+
+            # write to bcp files
+
+            self.strainFile.writeRow((self.strainKey, speciesKey, strainTypeKey, name, isStandard, isPrivate, isGeneticBackground,
+                    createdByKey, createdByKey, cdate, cdate))
+
+            # MGI Accession ID for all strain
+            # all private = 0 (false)
+            self.accFile.writeRow((self.accKey, mgiPrefix + str(self.mgiKey), mgiPrefix, self.mgiKey, 1, self.strainKey, mgiTypeKey,
+                    isPrivate, 1, createdByKey, createdByKey, cdate, cdate))
+            self.accKey = self.accKey + 1
+
+            # external accession id
+            # % (accKey, id, '', id, externalLDB, strainKey, externalTypeKey,
+            #for ids that contain prefix:numeric
+            self.accFile.writeRow((self.accKey, id, externalPrefix, externalNumeric, externalLDB, self.strainKey, externalTypeKey,
+                 0, 1, createdByKey, createdByKey, cdate, cdate))
+            self.accKey = self.accKey + 1
+
+            # storing data in MGI_Note
+            # Strain of Origin Note
+            if len(sooNote) > 0:
+                self.noteFile.writeRow((self.noteKey, self.strainKey, mgiNoteObjectKey, mgiStrainOriginTypeKey, sooNote,
+                       createdByKey, createdByKey, cdate, cdate))
+                self.noteKey = self.noteKey + 1
+
+            # storing data in MGI_Note
+            # Mutant Cell Line of Origin Note
+            if len(mutantNote) > 0:
+                self.noteFile.writeRow((self.noteKey, self.strainKey, mgiNoteObjectKey, mgiMutantOriginTypeKey, mutantNote,
+                       createdByKey, createdByKey, cdate, cdate))
+                self.noteKey = self.noteKey + 1
+
+            # storing data in MGI_Note
+            # IMPC Colony Note
+            if len(impcColonyNote) > 0:
+                self.noteFile.writeRow((self.noteKey, self.strainKey, mgiNoteObjectKey, mgiIMPCColonyTypeKey, impcColonyNote,
+                       createdByKey, createdByKey, cdate, cdate))
+                self.noteKey = self.noteKey + 1
+
+            self.mgiKey = self.mgiKey + 1
+            self.strainKey = self.strainKey + 1
+
+        #	end of "for line in self.inputFile:"
+
+        if self.nameCheckCount > 0:
+            self.diagFile.write('Name index: %d names checked, %.3f ms per name\n' \
+                % (self.nameCheckCount, 1000 * self.nameCheckTime / self.nameCheckCount))
+
+    # Purpose:  processes bcp files
+    # Returns:  nothing
+    # Assumes:  configuration env is set properly
+    # Effects:  BCPs the data into the database
+    # Throws:   nothing
+    def bcpFiles(self):
+
+        # do not process if running sanity check
+        if self.isSanityCheck == 1:
+            return
+
+        # do not process if errors are detected
+        if self.hasFatalError > 0:
+            self.errorFile.write("\nCannot process this file.  Sanity check failed\n")
+            return
+
+        db.commit()
+        self.closeOutput()
+
+        for attr, table, fileName in self.bcpTables:
+            self.loadTable(attr)
+
+        # update the AccessionMax value
+        db.sql('select * from ACC_setMax (%d)' % (self.lineNum), None)
+        db.commit()
+
+        # update the auto-sequences in one statement; prb_strain_marker_seq
+        # never goes back (keys reserved by strainupdate)
+        db.sql(''' select setval('prb_strain_seq', (select max(_Strain_key) from PRB_Strain)),
+            setval('prb_strain_marker_seq', greatest((select max(_StrainMarker_key) from PRB_Strain_Marker),
+                (select last_value from prb_strain_marker_seq))),
+            setval('voc_annot_seq', (select max(_Annot_key) from VOC_Annot)),
+            setval('mgi_note_seq', (select max(_Note_key) from MGI_Note)) ''', None)
+        db.commit()
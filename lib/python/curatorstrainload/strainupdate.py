@@ -0,0 +1,592 @@
+#
+# Program: strainupdate.py
+#
+# Inputs:
+#
+#	A tab-delimited file in the format:
+#       field 1: MGI:Strain ID
+#       field 2: MGI Allele ID : not required : pipe delimited
+#		if Private = No, then allele status must be Approved or Autoloaded
+#       field 3: Strain Name
+#       field 4: Standard (1/0)
+#       field 5: Private (1/0)
+#       field 6: Modified by
+#
+# Outputs:
+#
+#       2 BCP files:
+#
+#       PRB_Strain_Marker_update.bcp
+#       MGI_Synonym_update.bcp
+#
+#       Diagnostics file of all input parameters and SQL commands
+#       Error file
+#
+# History
+#
+# lec   07/12/2023
+#	- wts2-1198/fl2-410/Moving WTS2-686 to curator control
+#
+# lec	05/12/2023
+#	- wts2-902/flr-344/Strain Curator easy update load (part 1)
+#
+
+import time
+from .dblib import db
+from . import memorylib
+from . import compresslib
+from . import staginglib
+from . import rulelib
+from .curatorload import CuratorLoad
+
+markerTable = 'PRB_Strain_Marker'
+synonymTable = 'MGI_Synonym'
+markerFileName = markerTable + '_update.bcp'
+synonymFileName = synonymTable + '_update.bcp'
+
+mgiTypeKey = 10		# ACC_MGIType._MGIType_key for Strains
+alleleTypeKey = 11      # ACC_MGIType._MGIType_key for Allele
+markerTypeKey = 2       # ACC_MGIType._MGIType_key for Marker
+
+synonymTypeKey = 1001   # MGI_SynonymType._SynonymType_key
+qualifierKey = 615427	# nomenclature
+
+chunkSize = 1000	# strain IDs/names per query (resolveStrains)
+
+#
+# StrainUpdateLoad
+#
+# Updates existing strains: name (the old name becomes a synonym),
+# standard, private, and new strain/marker/allele associations.
+#
+# Before the rows are processed, resolveStrains() looks up all strain IDs
+# and new names of the file in a few chunked queries (stageInput() does
+# it with the staging tables) and checks the renames against each other:
+# two strains renamed to the same name, a strain renamed twice, and a
+# rename to the current name of a strain that is itself renamed in the
+# file (a swap or chain, which the row-by-row updates cannot apply).
+#
+class StrainUpdateLoad(CuratorLoad):
+
+    loadName = 'strainupdate'
+
+    bcpTables = (
+        ('markerFile', markerTable, markerFileName),
+        ('synonymFile', synonymTable, synonymFileName),
+        )
+
+    # row checks, cheapest class first (see rulelib.py); the strains and
+    # names are resolved before the rows are processed (resolveStrains())
+    rules = (
+        ('standard', rulelib.local, 'checkStandard'),
+        ('private', rulelib.local, 'checkPrivate'),
+        ('strain', rulelib.lookup, 'checkStrain'),
+        ('strain name', rulelib.lookup, 'checkStrainName'),
+        ('user', rulelib.query, 'checkUser'),
+        ('alleles', rulelib.query, 'checkAlleles'),
+        )
+
+    def __init__(self, inputFileName, mode, diagFileName = None, errorFileName = None):
+
+        CuratorLoad.__init__(self, inputFileName, mode, diagFileName, errorFileName)
+
+        self.updateSQL = ''		# update statements (memorylib.SpillBuffer once init() runs)
+
+        self.strainmarkerKey = 0	# PRB_Strain_Marker._StrainMarker_key
+        self.synonymKey = 0		# MGI_Synonym._Synonym_key
+        self.hasStrainMarker = 0
+        self.hasSynonym = 0
+
+        # lookups of resolveStrains() (or stageInput())
+        self.resolvedStrains = {}	# strain id -> strain rows (_strain_key, strain)
+        self.resolvedNames = {}		# strain name -> strain keys
+        self.nameConflicts = {}		# row -> (category, value, message, strain key) of resolveStrains()
+
+        # lookups from the staging tables (VALIDATE_MODE=staging; see stageInput())
+        self.stagedAlleles = {}		# allele id -> allele rows (as verifyAllele's query)
+        self.stagedStrainMarkers = set()	# existing (strain key, allele key)
+
+    def init(self):
+
+        CuratorLoad.init(self)
+        self.updateSQL = memorylib.SpillBuffer()
+
+    # Purpose:  verify Strain
+    # Returns:  Strain Key
+    # Assumes:  nothing
+    # Effects:  verifies that the Strain exists
+    #	writes to the error file if the Strain is invalid
+    # Throws:  nothing
+    def verifyStrain(
+        self,
+        strainID 	# Strain ID (string)
+        ):
+
+        strainKey = 0
+        oldName = ''
+
+        results = self.resolvedStrains.get(strainID, [])
+
+        for r in results:
+            strainKey = r['_strain_key']
+            oldName = r['strain']
+
+        if strainKey == 0:
+                self.error('Invalid Strain', strainID, 'Invalid Strain (row %d) %s\n' % (self.lineNum, strainID))
+
+        return strainKey, oldName
+
+    # Purpose:  verify Strain Name
+    # Returns:  Strain Key of the strain the name collides with, or 0
+    # Assumes:  resolveStrains() has been called
+    # Effects:  verifies that the Strain Name is/is not a duplicate ; already exists in database
+    #	or collides with another rename of the file
+    #	writes to the error file if the Strain is invalid
+    # Throws:  nothing
+    def verifyStrainName(
+        self,
+        strainKey,  # strain key (string)
+        name	    # name (string)
+        ):
+
+        # a collision with another row of the file
+        if self.lineNum in self.nameConflicts:
+            category, value, message, nameKey = self.nameConflicts[self.lineNum]
+            self.error(category, value, message)
+            return nameKey
+
+        nameKey = 0
+
+        for k in self.resolvedNames.get(name, []):
+            if k != strainKey:
+                nameKey = k
+
+        if nameKey != 0:
+                self.error('Strain Name Already Exists', name, 'Strain Name Already Exists (row %d) %s\n' % (self.lineNum, name))
+
+        return nameKey
+
+    # Purpose:  looks up all strain IDs and new names of the file and
+    #	checks the renames against each other
+    # Returns:  nothing
+    # Assumes:  db connection
+    # Effects:  sets resolvedStrains and resolvedNames (unless stageInput()
+    #	has), and nameConflicts; reads the input file
+    # Throws:   LoadExit if the input file cannot be read
+    def resolveStrains(self):
+
+        startTime = time.time()
+        queries = 0
+
+        rows = []	# (row, strain ID, new name)
+
+        try:
+            with compresslib.openInput(self.inputFileName) as f:
+                lineNum = 0
+                for line in f:
+                    lineNum = lineNum + 1
+                    tokens = line.rstrip('\n').split('\t')
+                    if len(tokens) < 6 or tokens[0] == 'MGI:Strain ID':
+                        continue
+                    rows.append((lineNum, tokens[0], tokens[2]))
+        except:
+            self.exit(1, 'Could not open file inputFileName: %s\n' % self.inputFileName)
+
+        # stageInput() has already looked them up
+        if self.isStaging == 0:
+
+            ids = sorted(set([r[1] for r in rows]))
+            for i in range(0, len(ids), chunkSize):
+                for r in db.sql('''select a.accid, s._strain_key, s.strain
+                    from ACC_Accession a, PRB_Strain s
+                    where a._mgitype_key = %s
+                    and a._logicaldb_key = 1
+                    and a.accid in (%s)
+                    and a._object_key = s._strain_key
+                    ''' % (mgiTypeKey, ', '.join([staginglib.quote(x) for x in ids[i:i + chunkSize]])), 'auto'):
+                    self.resolvedStrains.setdefault(r['accid'], []).append(r)
+                queries += 1
+
+            names = sorted(set([r[2] for r in rows]))
+            for i in range(0, len(names), chunkSize):
+                for r in db.sql('''select s._strain_key, s.strain
+                    from PRB_Strain s
+                    where s.strain in (%s)
+                    and s._strain_key != 0
+                    ''' % (', '.join([staginglib.quote(x) for x in names[i:i + chunkSize]])), 'auto'):
+                    self.resolvedNames.setdefault(r['strain'], []).append(r['_strain_key'])
+                queries += 1
+
+        # the strain and current name of each row (the last match, as verifyStrain)
+        current = {}	# strain ID -> (strain key, current name)
+        for strainID, results in self.resolvedStrains.items():
+            for r in results:
+                current[strainID] = (r['_strain_key'], r['strain'])
+
+        targets = {}	# new name -> (row, strain key) of the strains renamed to it
+        renames = {}	# strain key -> (row, new name) of its first rename
+        strainNames = {}	# strain key -> new names
+
+        for lineNum, strainID, name in rows:
+            if strainID not in current:
+                continue
+            strainKey, oldName = current[strainID]
+            strainNames.setdefault(strainKey, set()).add(name)
+            if name != oldName:
+                targets.setdefault(name, []).append((lineNum, strainKey))
+                if strainKey not in renames:
+                    renames[strainKey] = (lineNum, name)
+
+        for lineNum, strainID, name in rows:
+            if strainID not in current:
+                continue
+            strainKey, oldName = current[strainID]
+
+            # two rows give the same strain different names
+            if len(strainNames[strainKey]) > 1:
+                self.nameConflicts[lineNum] = ('Strain Renamed Twice', strainID,
+                    'Strain Renamed Twice (row %d) %s: %s\n' \
+                    % (lineNum, strainID, ', '.join(sorted(strainNames[strainKey]))), strainKey)
+                continue
+
+            # not a rename: verifyStrainName's check is enough
+            if name == oldName:
+                continue
+
+            # two strains are given the same name
+            others = [t for t in targets[name] if t[1] != strainKey]
+            if len(others) > 0:
+                self.nameConflicts[lineNum] = ('Duplicate Strain Name In File', name,
+                    'Duplicate Strain Name In File (row %d) %s: also row %d\n' \
+                    % (lineNum, name, others[0][0]), others[0][1])
+                continue
+
+            # the name belongs to a strain that is renamed on another row
+            for k in self.resolvedNames.get(name, []):
+                if k == strainKey or k not in renames:
+                    continue
+                otherLine, otherName = renames[k]
+                if otherName == oldName:
+                    category = 'Strain Name Swap'
+                else:
+                    category = 'Strain Name Chain'
+                self.nameConflicts[lineNum] = (category, name,
+                    '%s (row %d) %s: current name of the strain renamed on row %d; rename in separate files\n' \
+                    % (category, lineNum, name, otherLine), k)
+
+        self.diagFile.write('Resolved %d strain IDs, %d names of %d rows in %d queries, %.3f s; %d rename conflicts\n' \
+            % (len(current), len(self.resolvedNames), len(rows), queries, time.time() - startTime, len(self.nameConflicts)))
+
+    # Purpose:  verify Allele
+    # Returns:  Allele Key, Marker Key, Allele Status Key
+    # Assumes:  nothing
+    # Effects:  verifies that the Allele & Marker (can be null) exists
+    #	writes to the error file if the Allele is invalid
+    # Throws:  nothing
+    def verifyAllele(
+        self,
+        alleleID, 	# Allele ID (string)
+        strainID, 	# Strain ID (string)
+        strainKey       # Strain key (string)
+        ):
+
+        alleleKey = 0
+        markerKey = 0
+        alleleStatusKey = 0
+        alleleStatus = ""
+
+        if self.isStaging == 1:
+            results = self.stagedAlleles.get(alleleID, [])
+        else:
+            results = db.sql('''select s._allele_key, s._marker_key, s._allele_status_key, t.term
+            from ACC_Accession a, ALL_Allele s, VOC_Term t
+            where a._mgitype_key = 11
+            and a._logicaldb_key = 1
+            and a.accid = \'%s\'
+            and a._object_key = s._allele_key
+            and s._allele_status_key = t._term_key
+            and s._marker_key is not null
+            ''' % (alleleID), 'auto')
+
+        if len(results) == 0:
+            self.error('Invalid Allele', alleleID, 'Invalid Allele (row %d) %s\n' % (self.lineNum, alleleID))
+
+        for r in results:
+
+            # if allele exists and is already attached to this strain, then skip
+            if self.isStaging == 1:
+                isAttached = (strainKey, r['_allele_key']) in self.stagedStrainMarkers
+            else:
+                pmresults = db.sql('''select _strainmarker_key
+                    from PRB_Strain_Marker pm
+                    where pm._strain_key = %s
+                    and pm._allele_key = %s
+                    ''' % (strainKey, r['_allele_key']), 'auto')
+                isAttached = len(pmresults) > 0
+
+            if isAttached:
+                self.warning('This relationship already exists', '%s, %s' % (strainID, alleleID), 'Warning: This relationship already exists (row %d) Strain:%s, Allele:%s\n' % (self.lineNum, strainID, alleleID))
+            else:
+                alleleKey = r['_allele_key']
+                markerKey = r['_marker_key']
+                alleleStatusKey = r['_allele_status_key']
+                alleleStatus = r['term']
+
+        return alleleKey, markerKey, alleleStatusKey, alleleStatus
+
+    #
+    # Rules of processFile() (see rules); each takes the row's fields and
+    # adds the keys it looks up to them
+    #
+
+    def checkStandard(self, row):
+
+        if row['isStandard'] not in ('0','1'):
+            self.error('Invalid Is-Standard', row['isStandard'], 'Invalid Is-Standard (row %d) %s\n' % (self.lineNum, row['isStandard']))
+
+    def checkPrivate(self, row):
+
+        if row['isPrivate'] not in ('0','1'):
+            self.error('Invalid Is-Private', row['isPrivate'], 'Invalid Is-Privaite (row %d) %s\n' % (self.lineNum, row['isPrivate']))
+
+    def checkStrain(self, row):
+
+        row['strainKey'], row['oldName'] = self.verifyStrain(row['strainID'])
+
+    def checkStrainName(self, row):
+
+        row['nameKey'] = self.verifyStrainName(row.get('strainKey', 0), row['name'])
+
+    def checkUser(self, row):
+
+        row['modifiedByKey'] = self.verifyUser(row['modifiedBy'])
+
+    def checkAlleles(self, row):
+
+        row['alleles'] = []	# (allele key, marker key)
+
+        # already counted by verifyStrain, verifyStrainName, verifyUser
+        if row.get('strainKey', 0) == 0 or row.get('nameKey', 0) > 0 or row.get('modifiedByKey', 0) == 0:
+            return
+
+        if len(row['alleleIDs']) > 0:
+
+            allAlleles = row['alleleIDs'].split('|')
+
+            for a in allAlleles:
+                alleleKey, markerKey, alleleStatusKey, alleleStatus = self.verifyAllele(a, row['strainID'], row['strainKey'])
+
+                if alleleKey == 0:
+                    continue
+
+                # if Private = No, then allele status must be Approved or Autoloaded
+                if row['isPrivate'] == 0 and alleleStatusKey not in (847114,3983021):
+                    self.error('Invalid Allele ID/Private/Status', '%s, %s' % (a, alleleStatus), 'Invalid Allele ID/Private/Status (%d) %s,%s,%s\n' % (self.lineNum, a, row['isPrivate'], alleleStatus))
+                    continue
+
+                row['alleles'].append((alleleKey, markerKey))
+
+    # Purpose:  copies the file into staging tables and runs the checks
+    #	of verifyStrain, verifyStrainName, verifyUser and verifyAllele
+    #	as one query each
+    # Returns:  nothing
+    # Assumes:  VALIDATE_MODE=staging; see CuratorLoad.stageFile()
+    # Effects:  sets the staged and resolved lookups
+    # Throws:   nothing
+    def stageInput(self, stage):
+
+        strains = stage.table('curatorstrain_update', ('strainID', 'name', 'modifiedBy'))
+        alleles = stage.table('curatorstrain_update_allele', ('strainID', 'accid'))
+
+        # the rows processFile() verifies
+        lineNum = 0
+        for line in self.inputFile:
+            lineNum = lineNum + 1
+            tokens = line.rstrip('\n').split('\t')
+            if len(tokens) < 6 or tokens[0] == 'MGI:Strain ID':
+                continue
+            strains.add(lineNum, (tokens[0], tokens[2], tokens[5]))
+            if len(tokens[1]) > 0:
+                for a in tokens[1].split('|'):
+                    alleles.add(lineNum, (tokens[0], a))
+
+        strains.close()
+        alleles.close()
+
+        for r in stage.check('strains', '''select distinct a.accid, p._strain_key, p.strain
+            from curatorstrain_update s, ACC_Accession a, PRB_Strain p
+            where a._mgitype_key = %s
+            and a._logicaldb_key = 1
+            and a.accid = s.strainID
+            and a._object_key = p._strain_key
+            and s.row between {first} and {last}
+            ''' % (mgiTypeKey), strains):
+            self.resolvedStrains.setdefault(r['accid'], []).append(r)
+
+        for r in stage.check('strain names', '''select distinct p.strain, p._strain_key
+            from curatorstrain_update s, PRB_Strain p
+            where p.strain = s.name
+            and p._strain_key != 0
+            and s.row between {first} and {last}
+            ''', strains):
+            self.resolvedNames.setdefault(r['strain'], []).append(r['_strain_key'])
+
+        self.stageUsers(stage, strains, 'modifiedBy')
+
+        for r in stage.check('alleles', '''select distinct a.accid, s._allele_key, s._marker_key, s._allele_status_key, t.term
+            from curatorstrain_update_allele sa, ACC_Accession a, ALL_Allele s, VOC_Term t
+            where a._mgitype_key = %s
+            and a._logicaldb_key = 1
+            and a.accid = sa.accid
+            and a._object_key = s._allele_key
+            and s._allele_status_key = t._term_key
+            and s._marker_key is not null
+            and sa.row between {first} and {last}
+            ''' % (alleleTypeKey), alleles):
+            self.stagedAlleles.setdefault(r['accid'], []).append(r)
+
+        for r in stage.check('strain markers', '''select distinct pm._strain_key, pm._allele_key
+            from curatorstrain_update_allele sa, ACC_Accession sacc, ACC_Accession aacc, PRB_Strain_Marker pm
+            where sacc._mgitype_key = %s
+            and sacc._logicaldb_key = 1
+            and sacc.accid = sa.strainID
+            and aacc._mgitype_key = %s
+            and aacc._logicaldb_key = 1
+            and aacc.accid = sa.accid
+            and pm._strain_key = sacc._object_key
+            and pm._allele_key = aacc._object_key
+            and sa.row between {first} and {last}
+            ''' % (mgiTypeKey, alleleTypeKey), alleles):
+            self.stagedStrainMarkers.add((r['_strain_key'], r['_allele_key']))
+
+    # Purpose:  sets primary key variables
+    # Returns:  nothing
+    # Assumes:  nothing
+    # Effects:  sets primary key variables
+    # Throws:   nothing
+    def setPrimaryKeys(self):
+
+        # shared with straincreate, which may run at the same time; one key per allele ID (field 2)
+        self.strainmarkerKey = self.reserveKeys('prb_strain_marker_seq', 1)
+
+        results = db.sql(''' select nextval('mgi_synonym_seq') as maxKey ''', 'auto')
+        self.synonymKey = results[0]['maxKey']
+
+    # Purpose:  processes data
+    # Returns:  nothing
+    # Assumes:  nothing
+    # Effects:  verifies and processes each line in the input file
+    # Throws:   LoadExit if a line has too few fields
+    def processFile(self):
+
+        cdate = self.cdate
+
+        self.resolveStrains()
+
+        # For each line in the input file
+
+        for line in self.inputFile:
+
+            # error budget (ERROR_BUDGET, ERROR_BUDGET_CATEGORY)
+            if self.isOverBudget() == 1:
+                break
+
+            self.lineNum = self.lineNum + 1
+            lineNum = self.lineNum
+
+            # Split the line into tokens
+            tokens = line.rstrip('\n').split('\t')
+
+            try:
+                strainID = tokens[0]
+                alleleIDs = tokens[1]
+                name = tokens[2]
+                isStandard = tokens[3]
+                isPrivate = tokens[4]
+                modifiedBy = tokens[5]
+            except:
+                self.exit(1, 'Invalid Line (%d): %s\n' % (lineNum, line))
+
+            # skip header line
+            if strainID == 'MGI:Strain ID':
+                    continue
+
+            row = {'strainID' : strainID, 'alleleIDs' : alleleIDs, 'name' : name,
+                'isStandard' : isStandard, 'isPrivate' : isPrivate, 'modifiedBy' : modifiedBy}
+
+            # local checks first; a row with a fatal error skips the lookups (see rulelib.py)
+            if self.pipeline.run(row) > 0:
+                continue
+
+            strainKey = row['strainKey']
+            oldName = row['oldName']
+            modifiedByKey = row['modifiedByKey']
+
+            if self.isSanityCheck == 1:
+                    continue
+
+            # if no errors, process
+
+            for alleleKey, markerKey in row['alleles']:
+
+                self.markerFile.writeRow((self.strainmarkerKey, strainKey, markerKey, alleleKey, qualifierKey, modifiedByKey, modifiedByKey, cdate, cdate))
+
+                self.strainmarkerKey = self.strainmarkerKey + 1
+                self.hasStrainMarker = 1
+
+            self.updateSQL.write(
+            '''update PRB_Strain set strain = \'%s\', standard = %s, private = %s, _modifiedby_key = %s, modification_date = now() where _Strain_key = %s;\n''' \
+            % (name, isStandard, isPrivate, modifiedByKey, strainKey))
+
+            self.updateSQL.write(
+            '''update ACC_Accession set private = %s, _modifiedby_key = %s, modification_date = now() where _MGIType_key = 10 and _Object_key = %s;\n''' \
+            % (isPrivate, modifiedByKey, strainKey))
+
+            if name != oldName:
+                    # _Refs_key is null
+                    self.synonymFile.writeRow((self.synonymKey, strainKey, mgiTypeKey, synonymTypeKey, None, oldName, modifiedByKey, modifiedByKey, cdate, cdate))
+                    self.synonymKey = self.synonymKey + 1
+                    self.hasSynonym = 1
+
+        #	end of "for line in self.inputFile:"
+
+    # Purpose:  processes bcp files
+    # Returns:  nothing
+    # Assumes:  configuration env is set properly
+    # Effects:  BCPs the data into the database
+    # Throws:   nothing
+    def bcpFiles(self):
+
+        # do not process if running sanity check
+        if self.isSanityCheck == 1:
+            return
+
+        # do not process if errors are detected
+        if self.hasFatalError > 0:
+            self.errorFile.write("\nCannot process this file.  Sanity check failed\n")
+            return
+
+        db.commit()
+        self.closeOutput()
+
+        if self.hasStrainMarker == 1:
+            self.loadTable('markerFile')
+            # update prb_strain_marker_seq auto-sequence; never back (keys reserved by straincreate)
+            db.sql(''' select setval('prb_strain_marker_seq', greatest((select max(_StrainMarker_key) from PRB_Strain_Marker),
+                (select last_value from prb_strain_marker_seq))) ''', None)
+            db.commit()
+
+        if self.hasSynonym == 1:
+            self.loadTable('synonymFile')
+            # update mgi_synonym_seq auto-sequence
+            db.sql(''' select setval('mgi_synonym_seq', (select max(_Synonym_key) from MGI_Synonym)) ''', None)
+            db.commit()
+
+        # one statement batch unless the updates were spilled to disk (memory budget)
+        if len(self.updateSQL) > 0:
+            self.diagFile.write('running updateSQL...\n')
+            for batch in self.updateSQL.batches():
+                self.diagFile.write(batch)
+                db.sql(batch, None)
+            db.commit()
+            self.updateSQL.close()
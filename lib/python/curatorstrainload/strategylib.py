@@ -0,0 +1,365 @@
+#
+# Program: strategylib.py
+#
+# Purpose:
+#
+#	Load strategy of each bcp table of the strain create and update loads
+#
+#	LOAD_STRATEGY=bcp (default) loads every table with bcpin.csh, as
+#	before.  LOAD_STRATEGY=auto chooses by row count:
+#
+#	skip	no rows: nothing is run
+#	insert	up to LOAD_INSERT_MAX_ROWS rows: the rows are kept in memory
+#		and loaded with multi-row INSERTs on the load's own connection
+#		(no file, no process)
+#	copy	up to LOAD_COPY_MAX_ROWS rows: the bcp file is streamed to
+#		psql "\copy ... from pstdin" (one process, see copylib.copyin)
+#	bcp	more rows: bcpin.csh
+#
+#	A table's rows are buffered by Output until there are more than
+#	LOAD_INSERT_MAX_ROWS, then written to the bcp file; the strategy is
+#	chosen when the load closes its outputs, and the strategy and the
+#	reason are written to the diagnostics file.
+#
+#	The thresholds depend on the database server; "curatorstrainload
+#	benchmark" times the three strategies for a few batch sizes and
+#	prints the thresholds for the config.  auto is opt-in: run the
+#	benchmark on the production host and set the thresholds it prints
+#	before turning it on.
+#
+# Environment:
+#
+#	LOAD_STRATEGY		bcp (default), auto, insert or copy
+#	LOAD_INSERT_MAX_ROWS	largest table loaded with INSERTs (default 1000)
+#	LOAD_COPY_MAX_ROWS	largest table loaded with psql COPY; 0 = no limit
+#				(default 100000)
+#	LOAD_INSERT_BATCH	rows per INSERT statement (default 500)
+#
+
+import os
+import io
+import time
+from .dblib import db
+from . import compresslib
+from . import copylib
+from . import staginglib
+
+strategies = ('auto', 'insert', 'copy', 'bcp')
+
+strategy = 'bcp'	# LOAD_STRATEGY
+insertMaxRows = 1000	# LOAD_INSERT_MAX_ROWS
+copyMaxRows = 100000	# LOAD_COPY_MAX_ROWS
+insertBatch = 500	# LOAD_INSERT_BATCH
+
+benchmarkTable = 'curatorstrainload_benchmark'
+
+# Purpose: reads the load strategy configuration from the environment
+# Returns: nothing
+# Assumes: nothing
+# Effects: sets the module configuration
+# Throws: ValueError if LOAD_STRATEGY is not auto, insert, copy or bcp
+def configure():
+    global strategy, insertMaxRows, copyMaxRows, insertBatch
+
+    strategy = os.getenv('LOAD_STRATEGY', 'bcp')
+    if strategy == '':
+        strategy = 'bcp'
+    if strategy not in strategies:
+        raise ValueError('LOAD_STRATEGY must be auto, insert, copy or bcp: %s' % (strategy))
+
+    insertMaxRows = int(os.getenv('LOAD_INSERT_MAX_ROWS', '1000'))
+    copyMaxRows = int(os.getenv('LOAD_COPY_MAX_ROWS', '100000'))
+    insertBatch = int(os.getenv('LOAD_INSERT_BATCH', '500'))
+
+    # rows are only kept in memory if they may be inserted
+    if strategy in ('copy', 'bcp'):
+        insertMaxRows = 0
+
+# Purpose: chooses the strategy of a table
+# Returns: (strategy, reason)
+# Assumes: configure() has been called
+# Effects: nothing
+# Throws: nothing
+def choose(
+    count,	# rows of the table (integer)
+    isBuffered	# 1 if the rows are in memory (integer)
+    ):
+
+    # bcp runs bcpin.csh for every table, as before
+    if count == 0 and strategy != 'bcp':
+        return 'skip', 'no rows'
+
+    if strategy != 'auto':
+        if strategy == 'insert' and isBuffered == 0:
+            return 'copy', 'LOAD_STRATEGY=insert, but %d rows > LOAD_INSERT_MAX_ROWS %d' % (count, insertMaxRows)
+        return strategy, 'LOAD_STRATEGY=%s' % (strategy)
+
+    if isBuffered == 1:
+        return 'insert', '%d rows <= LOAD_INSERT_MAX_ROWS %d' % (count, insertMaxRows)
+
+    if copyMaxRows == 0 or count <= copyMaxRows:
+        return 'copy', '%d rows > LOAD_INSERT_MAX_ROWS %d, <= LOAD_COPY_MAX_ROWS %d' \
+            % (count, insertMaxRows, copyMaxRows)
+
+    return 'bcp', '%d rows > LOAD_COPY_MAX_ROWS %d' % (count, copyMaxRows)
+
+# Purpose: SQL literal of a bcp field
+# Returns: string; None and '' are null, as in the bcp files
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def literal(
+    value	# field value
+    ):
+
+    if value == '':
+        return 'null'
+
+    return staginglib.quote(value)
+
+# Purpose: loads rows with multi-row INSERTs
+# Returns: nothing
+# Assumes: the rows are in column order
+# Effects: inserts the rows on the current connection (not committed)
+# Throws: whatever db.sql throws
+def insert(
+    table,	# table name (string)
+    rows	# field values (list of tuples)
+    ):
+
+    for i in range(0, len(rows), insertBatch):
+        db.sql('insert into %s values\n%s' % (table, ',\n'.join(
+            ['(%s)' % (', '.join([literal(v) for v in r])) for r in rows[i:i + insertBatch]])), None)
+
+#
+# Output
+#
+# A bcp output whose rows stay in memory while the table may still be
+# loaded with INSERTs; the bcp file (copylib.openOutput) is only written
+# once there are more rows, or for the copy and bcp strategies.
+#
+class Output:
+
+    def __init__(
+        self,
+        fileName,	# uncompressed bcp file name (string)
+        table		# table name (string)
+        ):
+
+        self.fileName = fileName
+        self.table = table
+        self.count = 0
+        self.rows = []
+        self.file = None
+        self.strategy = None
+        self.reason = None
+
+        # a bcp file of an earlier run would otherwise be left next to the new ones
+        oldFileName = compresslib.outputFileName(fileName)
+        if os.path.isfile(oldFileName):
+            os.remove(oldFileName)
+
+        if insertMaxRows == 0:
+            self.spill()
+
+    def writeRow(
+        self,
+        fields		# field values (tuple), in column order
+        ):
+
+        self.count += 1
+
+        if self.file is not None:
+            self.file.writeRow(fields)
+            return
+
+        self.rows.append(fields)
+        if len(self.rows) > insertMaxRows:
+            self.spill()
+
+    # Purpose: writes the buffered rows to the bcp file
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: opens the bcp file; rows written later go to the file
+    # Throws: IOError; ValueError (binary column types)
+    def spill(self):
+
+        if self.file is not None:
+            return
+
+        self.file = copylib.openOutput(self.fileName, self.table)
+        for r in self.rows:
+            self.file.writeRow(r)
+        self.rows = None
+
+    # Purpose: chooses the strategy and closes the output
+    # Returns: nothing
+    # Assumes: nothing
+    # Effects: sets strategy and reason; writes the bcp file unless
+    #	the rows are inserted
+    # Throws: IOError
+    def close(self):
+
+        if self.strategy is not None:
+            return
+
+        self.strategy, self.reason = choose(self.count, 1 if self.file is None else 0)
+
+        if self.strategy in ('copy', 'bcp'):
+            self.spill()
+
+        if self.file is not None:
+            self.file.close()
+
+# Purpose: median of a list of timings
+# Returns: float
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def median(
+    values	# timings (list of floats)
+    ):
+
+    values = sorted(values)
+    return values[len(values) // 2]
+
+# Purpose: least-squares line through (rows, seconds) points
+# Returns: (fixed cost in seconds, cost per row in seconds)
+# Assumes: at least two different row counts
+# Effects: nothing
+# Throws: nothing
+def fit(
+    points	# (rows, seconds) (list)
+    ):
+
+    n = len(points)
+    mx = sum([p[0] for p in points]) / float(n)
+    my = sum([p[1] for p in points]) / float(n)
+    sxx = sum([(p[0] - mx) ** 2 for p in points])
+    sxy = sum([(p[0] - mx) * (p[1] - my) for p in points])
+
+    perRow = sxy / sxx
+    return my - perRow * mx, perRow
+
+# Purpose: row count above which the second of two strategies is cheaper
+# Returns: integer (0 if it is always cheaper), or None if it never is
+# Assumes: nothing
+# Effects: nothing
+# Throws: nothing
+def crossover(
+    first,	# (fixed cost, cost per row) of the strategy used below the threshold
+    second	# (fixed cost, cost per row) of the strategy used above it
+    ):
+
+    if first[1] <= second[1]:
+        if first[0] <= second[0]:
+            return None
+        return 0
+
+    return max(0, int((second[0] - first[0]) / (first[1] - second[1])))
+
+# Purpose: times the three strategies and suggests the thresholds
+#	(curatorstrainload benchmark)
+# Returns: exit status
+# Assumes: db connection; OUTPUTDIR and PG_DBUTILS are set (straincreate.config);
+#	the user may create a table in the current schema
+# Effects: creates, loads and drops benchmarkTable; writes bcp files to
+#	OUTPUTDIR; writes the timings and suggested settings to out
+# Throws: nothing
+def benchmark(
+    sizes,	# row counts (list of integers)
+    repeat,	# runs per size and strategy (integer)
+    out		# output file descriptor
+    ):
+    global insertMaxRows
+
+    compresslib.configure()
+    copylib.configure()
+    configure()
+    insertMaxRows = max(sizes)
+
+    outputDir = os.environ['OUTPUTDIR']
+    fileName = benchmarkTable + '.bcp'
+    bcpCommand = os.environ['PG_DBUTILS'] + '/bin/bcpin.csh'
+    server = db.get_sqlServer()
+    database = db.get_sqlDatabase()
+    log = io.StringIO()
+
+    db.sql('drop table if exists %s' % (benchmarkTable), None)
+    db.sql('''create table %s (_Key int, _Object_key int, name text, note text,
+        _CreatedBy_key int, creation_date timestamp)''' % (benchmarkTable), None)
+    db.commit()
+
+    timings = {'insert' : [], 'copy' : [], 'bcp' : []}
+
+    out.write('%8s %12s %12s %12s\n' % ('rows', 'insert', 'copy', 'bcp'))
+
+    try:
+        for size in sizes:
+            line = '%8d' % (size)
+
+            for name in ('insert', 'copy', 'bcp'):
+                runs = []
+                for i in range(repeat):
+                    db.sql('truncate table %s' % (benchmarkTable), None)
+                    db.commit()
+
+                    startTime = time.time()
+                    output = Output(os.path.join(outputDir, fileName), benchmarkTable)
+                    for key in range(size):
+                        output.writeRow((key, key, 'strain %d' % (key), 'note of strain %d' % (key),
+                            1001, '01/01/2020'))
+
+                    if name == 'insert':
+                        insert(benchmarkTable, output.rows)
+                        db.commit()
+                    else:
+                        output.spill()
+                        output.file.close()
+                        if name == 'copy' or copylib.bcpFormat == 'binary':
+                            status = copylib.copyin(server, database, benchmarkTable, outputDir, fileName, log)
+                        else:
+                            status = compresslib.bcpin(bcpCommand, server, database,
+                                benchmarkTable, outputDir, fileName, log)
+                        if status != 0:
+                            raise IOError('%s of %d rows failed' % (name, size))
+                    runs.append(time.time() - startTime)
+
+                timings[name].append((size, median(runs)))
+                line += ' %10.1fms' % (median(runs) * 1000)
+
+            out.write(line + '\n')
+            out.flush()
+
+    except (IOError, OSError) as e:
+        out.write('benchmark: %s\n' % (e))
+        return 1
+
+    finally:
+        db.sql('drop table if exists %s' % (benchmarkTable), None)
+        db.commit()
+        oldFileName = os.path.join(outputDir, compresslib.outputFileName(fileName))
+        if os.path.isfile(oldFileName):
+            os.remove(oldFileName)
+
+    if len(sizes) < 2:
+        return 0
+
+    costs = {}
+    out.write('\n')
+    for name in ('insert', 'copy', 'bcp'):
+        costs[name] = fit(timings[name])
+        out.write('%-6s %8.2f ms + %8.4f ms/row\n' % (name, costs[name][0] * 1000, costs[name][1] * 1000))
+
+    out.write('\nsuggested settings (straincreate.config, strainupdate.config):\n')
+    # INSERTs never slower: up to the largest size measured; bcp never faster: no limit
+    insertRows = crossover(costs['insert'], costs['copy'])
+    if insertRows is None:
+        insertRows = max(sizes)
+    copyRows = crossover(costs['copy'], costs['bcp'])
+    if copyRows is None:
+        copyRows = 0
+    out.write('LOAD_INSERT_MAX_ROWS=%d\n' % (insertRows))
+    out.write('LOAD_COPY_MAX_ROWS=%d\n' % (copyRows))
+
+    return 0